@@ -0,0 +1,115 @@
+# Micro-benchmark for sql_parser.extract_object_metadata against the previous regex-based implementation.
+# Also checks that statements which are not CREATEs, behind many leading comments or blanks, are rejected in linear
+# time (regression check for backtracking in the CREATE header regex); exits with status 1 if one is not.
+# Run from the repository root:  python benchmarks/bench_classifier.py [--body-lines N] [--repeat N]
+
+import os
+import re
+import sys
+import time
+import argparse
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils import sql_parser  # noqa: E402
+
+
+def legacy_extract_object_metadata(stmt: str) -> Optional[Dict[str, str]]:
+    # The regex classifier this module replaced, kept verbatim (compiled per call) as the baseline.
+    pattern = re.compile(r"""
+        ^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:SECURE\s+|TRANSIENT\s+|TEMPORARY\s+|EXTERNAL\s+)*
+        (?:(?P<prefix>MATERIALIZED|DYNAMIC)\s+)?
+        (?P<type>FILE\s+FORMAT|MASKING\s+POLICY|ROW\s+ACCESS\s+POLICY|DATABASE|SCHEMA|TABLE|VIEW|SEQUENCE|PIPE|TASK|STAGE|STREAM|FUNCTION|PROCEDURE|TAG)\s+
+        (?:IF\s+NOT\s+EXISTS\s+)?
+        (?P<name>(?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*)){0,2})
+        """, re.IGNORECASE | re.VERBOSE | re.DOTALL)
+    m = pattern.search(stmt)
+    if not m: return None
+    parts = sql_parser.split_qualified_name(m.group("name"))
+    db, schema, obj = ([None] * (3 - len(parts)) + parts)[-3:]
+    return {
+        "object_type": sql_parser.normalize_type(m.group("prefix"), m.group("type")),
+        "database": sql_parser.strip_identifier_quotes(db),
+        "schema": sql_parser.strip_identifier_quotes(schema),
+        "object_name": sql_parser.strip_identifier_quotes(obj),
+        "fully_qualified_name": ".".join([sql_parser.strip_identifier_quotes(p) for p in parts]),
+    }
+
+
+def build_statements(body_lines: int):
+    # A representative mix of short DDL, long procedure bodies and statements that are not CREATEs.
+    body = "\n".join(f"    var v{i} = snowflake.execute({{sqlText: 'SELECT {i}'}});" for i in range(body_lines))
+    return [
+        'create or replace TRANSIENT TABLE "APP"."CORE"."ORDERS" (ID NUMBER, NAME VARCHAR)',
+        "create or replace secure view CORE.V_ORDERS as select * from CORE.ORDERS",
+        "create or replace sequence CORE.SEQ_ORDERS start with 1 increment by 1",
+        f"CREATE OR REPLACE PROCEDURE CORE.LOAD_ORDERS() RETURNS VARCHAR LANGUAGE JAVASCRIPT AS $$\n{body}\n$$",
+        f"CREATE OR REPLACE FUNCTION CORE.F(X NUMBER) RETURNS NUMBER AS $$\n{body}\n$$",
+        "create or replace file format CORE.CSV_FMT type = csv field_delimiter = ','",
+        "CREATE STAGE \"APP\".\"CORE\".\"LANDING\"",
+        "ALTER TABLE CORE.ORDERS ADD COLUMN X INT",
+        f"-- not a create\nSELECT 1 FROM ({body})",
+    ]
+
+
+# Prefixes repeated before a statement that is not a CREATE; each once caused exponential backtracking.
+LEADING_PREFIXES = {"block comments": "/*a*/ ", "line comments": "-- a\n", "blanks": " "}
+LINEAR_SIZES = (2000, 4000)
+LINEAR_MAX_RATIO = 4.0      # Doubling the prefixes may at most quadruple the time (allows for timer noise)
+LINEAR_MAX_SECONDS = 0.5
+
+
+def check_linear_rejection() -> bool:
+    # Times the rejection of "<prefix> * n + ALTER TABLE X" at each size and prints one line per prefix.
+    ok = True
+    for label, prefix in LEADING_PREFIXES.items():
+        timings = []
+        for n in LINEAR_SIZES:
+            stmt = prefix * n + "ALTER TABLE X"
+            timings.append(time_it(sql_parser.extract_object_metadata, [stmt], 1))
+            if sql_parser.extract_object_metadata(stmt) is not None:
+                ok = False
+        ratio = timings[-1] / max(timings[0], 1e-6)
+        linear = ratio <= LINEAR_MAX_RATIO and timings[-1] <= LINEAR_MAX_SECONDS
+        ok = ok and linear
+        print(f"leading {label:<15}: " + ", ".join(f"n={n} {t * 1000:7.2f} ms" for n, t in zip(LINEAR_SIZES, timings))
+              + ("" if linear else "  NOT LINEAR"))
+    return ok
+
+
+def time_it(fn, statements, repeat: int) -> float:
+    # Returns the best-of-three wall time for classifying every statement `repeat` times.
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for stmt in statements:
+                fn(stmt)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the keyword-dispatch classifier with the legacy regex.")
+    parser.add_argument("--body-lines", type=int, default=2000, help="Lines in each generated procedure body.")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the statement mix per timing.")
+    args = parser.parse_args()
+
+    statements = build_statements(args.body_lines)
+    calls = len(statements) * args.repeat
+    legacy = time_it(legacy_extract_object_metadata, statements, args.repeat)
+    current = time_it(sql_parser.extract_object_metadata, statements, args.repeat)
+
+    print(f"statements: {len(statements)} (body lines: {args.body_lines}), calls per run: {calls}")
+    print(f"legacy regex      : {legacy * 1e6 / calls:9.2f} us/stmt")
+    print(f"keyword dispatch  : {current * 1e6 / calls:9.2f} us/stmt")
+    print(f"speedup           : {legacy / current:9.1f}x")
+
+    if not check_linear_rejection():
+        print("Rejecting statements with long leading comments or blanks is not linear; see CREATE_HEADER_REGEX.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
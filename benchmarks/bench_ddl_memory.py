@@ -0,0 +1,121 @@
+# Peak-memory benchmark of DDL retrieval + parsing: the in-memory path (the whole GET_DDL value as one string, plus
+# the pickled and unpickled copies st.cache_data made of it) against the spooled path (slices streamed to a temporary
+# file, then parsed from a memory map). Peaks are measured with tracemalloc, so memory-mapped file pages, which the
+# OS can drop at any time, are not counted. Everything runs offline on synthetic GET_DDL output.
+# Each path is measured for the fetch alone (until the DDL is ready for the parser) and for fetch + parse + ordering.
+# Run from the repository root:  python benchmarks/bench_ddl_memory.py [--sizes 10000,100000,300000] [--max-fetch-mb 16]
+# With --max-fetch-mb, exits with status 1 if the spooled fetch peak exceeds that ceiling at any size.
+
+import gc
+import os
+import sys
+import json
+import pickle
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils import ddl_spool, pipeline  # noqa: E402
+from utils.snowflake_queries import DDL_SLICE_CHARS, spool_ddl_rows  # noqa: E402
+from bench_pipeline import build_database_ddl, git_commit, RESULTS_DIR  # noqa: E402
+
+DEFAULT_SIZES = "10000,100000,300000"
+MB = 1024 * 1024
+
+
+def peak_mb(fn: Callable[[], object]) -> float:
+    # Peak traced allocation while fn runs, in MB; its result is dropped before returning.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    gc.collect()
+    return peak / MB
+
+
+def run_size(n_objects: int) -> Dict[str, object]:
+    db = "APP"
+    ddl_text, stage_ddls = build_database_ddl(n_objects, db)
+    ddl_mb = len(ddl_text.encode("utf-8")) / MB
+    # Stand-ins for the query results, built outside the measured region from a file, as the connector would
+    # build them from the network: one row holding the whole value, or one row per slice.
+    spool = ddl_spool.spool_chunks((ddl_text,))
+    del ddl_text
+
+    def fetch_whole() -> List[tuple]:
+        return [(spool.text(),)]
+
+    def fetch_slices():
+        for i, chunk in enumerate(spool.chunks()):
+            for j in range(0, len(chunk), DDL_SLICE_CHARS):
+                yield (i, chunk[j:j + DDL_SLICE_CHARS])
+
+    def in_memory_fetch():
+        text = str(fetch_whole()[0][0])
+        cached = pickle.dumps(text)          # st.cache_data stores the pickled return value...
+        return pickle.loads(cached), cached  # ...and hands each caller an unpickled copy
+
+    def in_memory():
+        text, cached = in_memory_fetch()
+        return pipeline.parse_and_order(text, stage_ddls, db, parallel=False, use_cache=False), cached
+
+    def spooled_fetch():
+        return spool_ddl_rows(fetch_slices())
+
+    def spooled():
+        fetched = spooled_fetch()
+        try:
+            return pipeline.parse_and_order(fetched, stage_ddls, db, parallel=False, use_cache=False)
+        finally:
+            fetched.close()
+
+    result = {"objects": n_objects, "ddl_mb": round(ddl_mb, 2)}
+    for name, fetch, total in (("in_memory", in_memory_fetch, in_memory), ("spooled", spooled_fetch, spooled)):
+        fetch_peak, peak = peak_mb(fetch), peak_mb(total)
+        result[name] = {"fetch_peak_mb": round(fetch_peak, 2), "peak_mb": round(peak, 2), "ratio": round(peak / ddl_mb, 3)}
+        print(f"  {name:<10} fetch peak {fetch_peak:8.1f} MB  total peak {peak:8.1f} MB  ({peak / ddl_mb:5.2f}x the DDL)")
+    spool.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of in-memory and spooled DDL retrieval.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated object counts.")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/ddl-memory-<commit>.json).")
+    parser.add_argument("--max-fetch-mb", type=float, help="Fail if the spooled fetch peak exceeds this many MB.")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"{size} objects")
+        report["results"][str(size)] = run_size(size)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"ddl-memory-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.max_fetch_mb is not None:
+        over = [size for size, r in report["results"].items() if r["spooled"]["fetch_peak_mb"] > args.max_fetch_mb]
+        if over:
+            print(f"Spooled fetch peak above {args.max_fetch_mb} MB for: {', '.join(over)} objects")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
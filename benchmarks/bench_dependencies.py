@@ -0,0 +1,213 @@
+# Benchmark for dependency resolution: the token-index resolver in utils.dependencies against the previous
+# regex scan over upper-cased DDL. Reports run time and the edges each one finds that the other does not.
+# Run from the repository root:  python benchmarks/bench_dependencies.py [--objects N] [--body-lines N] [--repeat N]
+
+import gc
+import os
+import re
+import sys
+import time
+import argparse
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils import dependencies, sql_parser  # noqa: E402
+from utils.sql_parser import ObjectRecord  # noqa: E402
+
+# The resolver this module replaced, kept verbatim as the baseline.
+ID = r'(?:\"[^\"]+\"|[A-Za-z_][A-Za-z0-9_\$]*)'
+QUAL_ID_REGEX = re.compile(rf'(?<!\w)({ID})\s*\.\s*({ID})(?:\s*\.\s*({ID}))?(?:\s*\.\s*({ID}))?(?!\w)')
+
+
+def legacy_find_qualified_references(ddl: str):
+    return QUAL_ID_REGEX.findall(ddl.upper())
+
+
+def legacy_order_objects_by_dependencies(objects: List[ObjectRecord], references=None) -> Tuple[List[ObjectRecord], Dict[str, Set[str]]]:
+    # Topologically sorts a list of Snowflake objects and returns the dependency graph.
+    # This function implements Kahn's algorithm for topological sorting.
+    # references optionally holds the precomputed find_qualified_references() of each object, in the same order.
+    
+    def u(x: Optional[str]) -> Optional[str]:
+        # Helper to normalize an identifier to uppercase and remove quotes.
+        if x is None: return None
+        x = x.strip()
+        if len(x) >= 2 and x[0] == x[-1] == '"':
+            x = x[1:-1].replace('""', '"')
+        return x.upper()
+
+    def canon_fqn(db: Optional[str], sch: Optional[str], obj: Optional[str]) -> Optional[str]:
+        # Creates a canonical, fully-qualified name string.
+        db_u, sch_u, obj_u = u(db), u(sch), u(obj)
+        if db_u and sch_u and obj_u: return f"{db_u}.{sch_u}.{obj_u}"
+        if sch_u and obj_u: return f"{sch_u}.{obj_u}"
+        return obj_u
+    
+    # --- 1. Pre-process and Index all objects ---
+    # Normalised name parts are kept alongside each record rather than copied into it.
+    objs: List[Tuple[ObjectRecord, Optional[str], Optional[str], Optional[str]]] = []  # (record, _DB, _SC, _OBJ)
+    for o in objects:
+        db, sch, obj = o.database or None, o.schema or None, o.object_name or None
+        o.canon_fqn = canon_fqn(db, sch, obj)
+        objs.append((o, u(db), u(sch), u(obj)))
+
+    by_fqn = {o.canon_fqn: o for o, _, _, _ in objs if o.canon_fqn}
+    db_of = {o.canon_fqn: db for o, db, _, _ in objs if o.canon_fqn}
+    by_schema_obj: Dict[str, List[ObjectRecord]] = defaultdict(list)
+    for o, _, sc, ob in objs:
+        if sc and ob:
+            by_schema_obj[f"{sc}.{ob}"].append(o)
+    
+    # --- 2. Build Dependency Graph ---
+    deps: Dict[str, Set[str]] = defaultdict(set)  # node -> {dependencies}
+    outs: Dict[str, Set[str]] = defaultdict(set)  # node -> {dependents}
+    nodes: Set[str] = {o.canon_fqn for o, _, _, _ in objs if o.canon_fqn}
+
+    for i, (o, o_db, o_sc, _) in enumerate(objs):
+        cur_fqn = o.canon_fqn
+        if not cur_fqn: continue
+        
+        o_deps: Set[str] = set()
+
+        # A. Find explicit dependencies via regex on DDL
+        refs = references[i] if references is not None else legacy_find_qualified_references(o.ddl)
+        for p1, p2, p3, p4 in refs:
+            target_fqn = None
+            if p4 and p4.upper() == "NEXTVAL":  # 4-part reference: DB.SCHEMA.OBJECT.NEXTVAL
+                cand_fqn = canon_fqn(p1, p2, p3)
+                if cand_fqn in by_fqn:
+                    target_fqn = cand_fqn
+            if p3 and p3.upper() != "NEXTVAL":  # 3-part reference: DB.SCHEMA.OBJECT
+                cand_fqn = canon_fqn(p1, p2, p3)
+                if cand_fqn in by_fqn:
+                    target_fqn = cand_fqn
+            else:  # 2-part reference: SCHEMA.OBJECT
+                key = f"{u(p1)}.{u(p2)}"
+                cands = by_schema_obj.get(key, [])
+                if len(cands) == 1:
+                    target_fqn = cands[0].canon_fqn
+                elif len(cands) > 1:
+                    same_db = [c for c in cands if db_of[c.canon_fqn] == o_db and o_db is not None]
+                    if len(same_db) == 1:
+                        target_fqn = same_db[0].canon_fqn
+
+            if target_fqn and target_fqn != cur_fqn:
+                o_deps.add(target_fqn)
+        
+        # B. Add implicit dependencies (e.g., table depends on its schema)
+        if o.object_type not in ["DATABASE", "SCHEMA"] and o_sc:
+            schema_fqn = canon_fqn(o_db, o_sc, o_sc)
+            if schema_fqn and schema_fqn in by_fqn and by_fqn[schema_fqn].object_type == 'SCHEMA':
+                o_deps.add(schema_fqn)
+        
+        if o.object_type != "DATABASE" and o_db:
+            db_fqn = canon_fqn(None, None, o_db)
+            if db_fqn and db_fqn in by_fqn and by_fqn[db_fqn].object_type == 'DATABASE':
+                o_deps.add(db_fqn)
+
+        deps[cur_fqn].update(o_deps)
+        for d in o_deps:
+            if d:
+                outs[d].add(cur_fqn)
+
+    # --- C. Kahn's Algorithm for Topological Sort ---
+    in_degree = {n: len(deps.get(n, set())) for n in nodes}
+    queue: deque[str] = deque([n for n, d in in_degree.items() if d == 0])
+    ordered = []
+
+    while queue:
+        n = queue.popleft()
+        if n in by_fqn:
+            ordered.append(by_fqn[n])
+        for m in outs.get(n, set()):
+            in_degree[m] -= 1
+            if in_degree[m] == 0:
+                queue.append(m)
+    
+    # --- 4. Finalize and Return ---
+    # Handle cycles by appending any remaining objects
+    seen_fqns = {o.canon_fqn for o in ordered}
+    remaining = [o for o, _, _, _ in objs if o.canon_fqn and o.canon_fqn not in seen_fqns]
+    result = ordered + remaining
+
+    # Re-index before returning
+    for i, o in enumerate(result):
+        o.index = i
+        
+    return result, deps
+
+
+def build_ddl(n_objects: int, body_lines: int = 20) -> str:
+    # Tables, sequences, views and procedures whose bodies, literals and comments mention other objects.
+    out = ["create or replace database APP;\ncreate or replace schema APP.CORE;\ncreate or replace schema APP.STG;\n"]
+    for i in range(n_objects // 4):
+        prev = max(0, i - 1)
+        body = "".join(f"  rs = snowflake.execute({{sqlText: 'SELECT {j} FROM APP.CORE.T{prev}'}}); // APP.CORE.V{i}\n" for j in range(body_lines))
+        out.append(
+            f"create or replace TABLE APP.CORE.T{i} (ID NUMBER default APP.CORE.SEQ{i}.NEXTVAL, "
+            f"NOTE VARCHAR default 'copied from APP.STG.T{i}');\n"
+            f"create or replace sequence APP.CORE.SEQ{i} start with 1;\n"
+            f"create or replace view APP.CORE.V{i} as\n  -- replaces APP.STG.V{i}\n"
+            f"  select t.* from APP.CORE.T{i} t join CORE.T{prev} p on t.ID = p.ID /* see APP.CORE.V{prev} */;\n"
+            f"CREATE OR REPLACE PROCEDURE APP.CORE.P{i}() RETURNS VARCHAR LANGUAGE JAVASCRIPT AS $$\n"
+            f"{body}  return rs.next() ? APP.CORE.T{prev}.name : '';\n$$;\n"
+        )
+    return "".join(out)
+
+
+def fresh_records(ddl: str) -> List[ObjectRecord]:
+    return sql_parser.parse_object_records((ddl,), "APP", {})
+
+
+def edge_set(deps) -> Set[Tuple[str, str]]:
+    return {(k, d) for k, vs in deps.items() for d in vs}
+
+
+def time_it(fn, ddl: str, repeat: int):
+    # Best wall time of `repeat` runs, each on freshly parsed records; returns (seconds, deps of the last run).
+    # The garbage collector is paused while timing, as timeit does, so that collections do not skew the comparison.
+    best, deps = float("inf"), None
+    for _ in range(repeat):
+        records = fresh_records(ddl)
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            deps = fn(records)[1]
+            best = min(best, time.perf_counter() - t0)
+        finally:
+            gc.enable()
+    return best, deps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the token-index dependency resolver with the legacy regex scan.")
+    parser.add_argument("--objects", type=int, default=40000, help="Approximate number of generated objects.")
+    parser.add_argument("--body-lines", type=int, default=20, help="Lines in each generated JavaScript procedure body.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per resolver (best is reported).")
+    parser.add_argument("--show", type=int, default=5, help="Differing edges to print per side.")
+    args = parser.parse_args()
+
+    ddl = build_ddl(args.objects, args.body_lines)
+    legacy_t, legacy_deps = time_it(legacy_order_objects_by_dependencies, ddl, args.repeat)
+    current_t, current_deps = time_it(dependencies.order_objects_by_dependencies, ddl, args.repeat)
+    legacy_edges, current_edges = edge_set(legacy_deps), edge_set(current_deps)
+    only_legacy = sorted(legacy_edges - current_edges)
+    only_current = sorted(current_edges - legacy_edges)
+
+    print(f"objects: {len(fresh_records(ddl))}, DDL chars: {len(ddl)}")
+    print(f"legacy regex scan : {legacy_t:8.3f} s, {len(legacy_edges)} edges")
+    print(f"token index       : {current_t:8.3f} s, {len(current_edges)} edges")
+    print(f"speedup           : {legacy_t / current_t:8.1f}x")
+    print(f"edges only in legacy (literals, comments, non-SQL bodies): {len(only_legacy)}")
+    for e in only_legacy[:args.show]:
+        print(f"    {e[0]} -> {e[1]}")
+    print(f"edges only in token index: {len(only_current)}")
+    for e in only_current[:args.show]:
+        print(f"    {e[0]} -> {e[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Benchmark of the cross-environment diff (utils.db_diff) on two synthetic databases, DEV and PROD, generated from the
+# same seed so that they hold the same objects; PROD then gets some changed and dropped objects, one new view, and
+# reformatted objects (comments and extra whitespace only, which the fingerprints must ignore).
+# Times fingerprinting each parsed database once, then the comparison itself, and checks the counts it reports.
+# Run from the repository root:  python benchmarks/bench_diff.py [--sizes 10000,30000] [--max-diff-ms 1000]
+# With --max-diff-ms, exits with status 1 if a comparison (fingerprints already computed) takes longer than that.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils import db_diff, pipeline, sql_parser  # noqa: E402
+from utils.sql_parser import ObjectRecord  # noqa: E402
+from bench_pipeline import build_database_ddl, git_commit, RESULTS_DIR  # noqa: E402
+
+DEFAULT_SIZES = "10000,30000"
+CHANGED, DROPPED, REFORMATTED = 50, 30, 500
+
+
+def parse(ddl_text: str, stage_ddls: str, db: str) -> List[ObjectRecord]:
+    objects = pipeline.parse_and_order(ddl_text, stage_ddls, db, use_cache=False)[0]
+    return [o for o in objects if o.object_type not in ("DATABASE", "SCHEMA")]
+
+
+def mutate(ddl_text: str, db: str, seed: int = 11) -> Tuple[str, Dict[str, int]]:
+    # Changes, drops and reformats randomly picked object statements, and adds one view. Returns the text and the
+    # counts the diff should report.
+    statements = sql_parser.split_sql_statements(ddl_text)
+    types = [(sql_parser.extract_object_metadata(s) or {}).get("object_type") for s in statements]
+    candidates = [i for i, t in enumerate(types) if t and t not in ("DATABASE", "SCHEMA")]
+    picked = random.Random(seed).sample(candidates, CHANGED + DROPPED + REFORMATTED)
+    changed, dropped = set(picked[:CHANGED]), set(picked[CHANGED:CHANGED + DROPPED])
+    reformatted = set(picked[CHANGED + DROPPED:])
+    out = []
+    for i, stmt in enumerate(statements):
+        if i in dropped: continue
+        if i in changed: stmt += "\nCOMMENT = 'changed in PROD'"
+        if i in reformatted: stmt = stmt.replace(" ", "   ", 3).replace("\n", "  -- reviewed\n\n", 1)
+        out.append(stmt)
+    out.append(f"create or replace view {db}.SCH_0000.ONLY_IN_PROD as select 1 as X")
+    return "".join(f"{s};\n" for s in out), {"added": 1, "removed": DROPPED, "changed": CHANGED}
+
+
+def run_size(n_objects: int) -> Dict[str, object]:
+    dev = parse(*build_database_ddl(n_objects, "DEV"), "DEV")
+    prod_ddl, prod_stages = build_database_ddl(n_objects, "PROD")
+    prod_ddl, expected = mutate(prod_ddl, "PROD")
+    prod = parse(prod_ddl, prod_stages, "PROD")
+
+    timings = {}
+    for name, objects in (("fingerprint_dev", dev), ("fingerprint_prod", prod)):
+        start = time.perf_counter()
+        db_diff.fingerprint_objects(objects)
+        timings[name] = time.perf_counter() - start
+    start = time.perf_counter()
+    diff = db_diff.diff_databases(prod, dev)  # What DEV would deploy to PROD: DEV's extra view is PROD's dropped ones
+    timings["diff"] = time.perf_counter() - start
+
+    counts = {"added": len(diff["added"]), "removed": len(diff["removed"]), "changed": len(diff["changed"])}
+    # Seen from DEV, PROD's dropped objects are additions and PROD's new view is a removal.
+    wanted = {"added": expected["removed"], "removed": expected["added"], "changed": expected["changed"]}
+    print(f"  {len(dev)} vs {len(prod)} objects: fingerprints {timings['fingerprint_dev'] * 1000:7.1f} + "
+          f"{timings['fingerprint_prod'] * 1000:7.1f} ms, diff {timings['diff'] * 1000:6.1f} ms, {counts}"
+          + ("" if counts == wanted else f"  MISMATCH, expected {wanted}"))
+    return {
+        "objects": n_objects, "counts": counts, "expected": wanted, "unchanged": diff["unchanged"],
+        **{f"{k}_ms": round(v * 1000, 2) for k, v in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time fingerprinting and diffing two parsed databases.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated object counts.")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/diff-<commit>.json).")
+    parser.add_argument("--max-diff-ms", type=float, help="Fail if a comparison takes longer than this many ms.")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"{size} objects")
+        report["results"][str(size)] = run_size(size)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"diff-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    failed = [size for size, r in report["results"].items() if r["counts"] != r["expected"]]
+    if args.max_diff_ms is not None:
+        failed += [size for size, r in report["results"].items() if r["diff_ms"] > args.max_diff_ms]
+    if failed:
+        print(f"Wrong counts or comparison slower than {args.max_diff_ms} ms for: {', '.join(sorted(set(failed)))} objects")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
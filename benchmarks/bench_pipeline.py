@@ -0,0 +1,224 @@
+# End-to-end benchmark of the parse -> order -> graph pipeline on synthetic GET_DDL output.
+# Times split_sql_statements, extract_object_metadata, remove_database_references, order_objects_by_dependencies and
+# create_dependency_graph_figure separately at each database size, records peak memory per phase, and writes the
+# results as JSON so runs can be compared across commits. Everything runs offline.
+# Run from the repository root:  python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000,500000] [--compare OLD.json]
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils import dependencies, sql_parser  # noqa: E402
+
+try:  # The graph phase needs the app's UI dependencies; the other phases are pure Python.
+    from utils import graph_utils  # noqa: E402
+except ImportError as e:
+    graph_utils, graph_import_error = None, str(e)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = "1000,10000,100000,500000"
+OBJECTS_PER_SCHEMA = 1000
+
+
+def build_database_ddl(n_objects: int, db: str = "APP", seed: int = 7) -> Tuple[str, str]:
+    # Synthetic GET_DDL('DATABASE') output plus SHOW STAGES DDL, as returned by snowflake_utils.get_database_ddl.
+    # Mix per schema: sequences used through .NEXTVAL, tables (some with quoted identifiers, some with '$' in their
+    # names), views reading tables and earlier views, JavaScript and SQL procedures with $$ bodies, file formats and stages.
+    rnd = random.Random(seed)
+    out = [f"create or replace database {db};\n"]
+    stages: List[str] = []
+    made = 0
+    for s in range(max(1, -(-n_objects // OBJECTS_PER_SCHEMA))):
+        schema = f"SCH_{s:04d}"
+        out.append(f"create or replace schema {db}.{schema};\n")
+        sequences: List[str] = []
+        tables: List[str] = []
+        views: List[str] = []
+        for i in range(min(OBJECTS_PER_SCHEMA, n_objects - made)):
+            kind = rnd.random()
+            if kind < 0.10:
+                out.append(f"create or replace sequence {db}.{schema}.SEQ_{i} start with 1 increment by 1 order;\n")
+                sequences.append(f"SEQ_{i}")
+            elif kind < 0.50:
+                r = rnd.random()
+                name = f'"Orders {i}"' if r < 0.1 else f"T_{i}$HIST" if r < 0.15 else f"T_{i}"
+                default = f" DEFAULT {db}.{schema}.{sequences[-1]}.NEXTVAL" if sequences else ""
+                out.append(
+                    f"create or replace TABLE {db}.{schema}.{name} (\n"
+                    f"\tID NUMBER(38,0) NOT NULL{default},\n"
+                    f"\t\"Customer Name\" VARCHAR(16777216),\n"
+                    f"\tAMOUNT NUMBER(12,2),\n"
+                    f"\tNOTE VARCHAR(200) DEFAULT 'moved from {db}.{schema}.OLD_{i}',\n"
+                    f"\tCREATED_AT TIMESTAMP_NTZ(9)\n);\n"
+                )
+                tables.append(name)
+            elif kind < 0.80:
+                sources = rnd.sample(tables, min(2, len(tables))) + rnd.sample(views, min(1, len(views)))
+                if not sources:
+                    continue
+                joins = "\n  join ".join(f"{db}.{schema}.{src} t{k} on t0.ID = t{k}.ID" for k, src in enumerate(sources[1:], 1))
+                out.append(
+                    f"create or replace view {db}.{schema}.V_{i}(ID, AMOUNT) as\n"
+                    f"-- derived from {schema}.LEGACY_{i}\n"
+                    f"select t0.ID, t0.AMOUNT from {db}.{schema}.{sources[0]} t0\n"
+                    + (f"  join {joins}\n" if joins else "") + ";\n"
+                )
+                views.append(f"V_{i}")
+            elif kind < 0.90:
+                target = rnd.choice(tables) if tables else "DUAL"
+                body = "\n".join(
+                    f"    var rs{k} = snowflake.execute({{sqlText: 'SELECT COUNT(*) FROM {db}.{schema}.{target}'}});"
+                    for k in range(rnd.randint(5, 40))
+                )
+                out.append(
+                    f"CREATE OR REPLACE PROCEDURE {db}.{schema}.LOAD_{i}(\"BATCH\" VARCHAR)\n"
+                    f"RETURNS VARCHAR(16777216)\nLANGUAGE JAVASCRIPT\nEXECUTE AS OWNER\nAS $$\n{body}\n    return 'ok';\n$$;\n"
+                )
+            elif kind < 0.95:
+                target = rnd.choice(tables) if tables else "DUAL"
+                out.append(
+                    f"CREATE OR REPLACE PROCEDURE {db}.{schema}.PURGE_{i}()\nRETURNS NUMBER(38,0)\nLANGUAGE SQL\nEXECUTE AS CALLER\n"
+                    f"AS $$\nBEGIN\n  DELETE FROM {db}.{schema}.{target} WHERE CREATED_AT < DATEADD(day, -30, CURRENT_DATE());\n"
+                    f"  RETURN SQLROWCOUNT;\nEND;\n$$;\n"
+                )
+            elif kind < 0.975:
+                out.append(f"create or replace file format {db}.{schema}.CSV_{i}\n\ttype = csv\n\tfield_delimiter = ';'\n\tskip_header = 1\n;\n")
+            else:
+                stages.append(f"CREATE OR REPLACE STAGE \"{db}\".\"{schema}\".\"LANDING_{i}\" URL = 's3://bucket/{schema.lower()}/{i}/';")
+            made += 1
+    return "".join(out), "\n".join(stages)
+
+
+def measure(fn: Callable[[], object], with_memory: bool) -> Tuple[float, Optional[float], object]:
+    # Times fn with the garbage collector paused, then (optionally) reruns it under tracemalloc for its peak allocation.
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - t0
+    finally:
+        gc.enable()
+    peak_mb = None
+    if with_memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    return seconds, peak_mb, result
+
+
+def run_size(n_objects: int, with_memory: bool, graph_limit: int) -> Dict[str, object]:
+    db = "APP"
+    ddl_text, stage_ddls = build_database_ddl(n_objects, db)
+    full_text = ddl_text + "\n" + stage_ddls
+    phases: Dict[str, Dict[str, Optional[float]]] = {}
+
+    def record(name: str, fn: Callable[[], object]) -> object:
+        seconds, peak_mb, result = measure(fn, with_memory)
+        phases[name] = {"seconds": round(seconds, 6), "peak_mb": None if peak_mb is None else round(peak_mb, 3)}
+        print(f"  {name:<32} {seconds:9.3f} s" + ("" if peak_mb is None else f"  peak {peak_mb:9.1f} MB"))
+        return result
+
+    statements = record("split_sql_statements", lambda: sql_parser.split_sql_statements(full_text))
+    record("extract_object_metadata", lambda: [sql_parser.extract_object_metadata(s) for s in statements])
+    record("remove_database_references", lambda: [sql_parser.remove_database_references(s, db) for s in statements])
+
+    # Parsing into records is not part of the timed phase; it only provides the input.
+    records_for_order = sql_parser.parse_object_records((ddl_text, stage_ddls), db, {db: None})
+    sorted_objects, deps, cycles = record("order_objects_by_dependencies", lambda: dependencies.order_objects_by_dependencies(records_for_order))
+    # View bodies are plain code, so any database reference left in them was missed by the rewriter.
+    leftover = sum(1 for o in records_for_order if o.object_type == "VIEW" and f"{db}." in o.ddl.upper())
+    print(f"  {'views with database references':<32} {leftover:9d}")
+
+    if graph_utils is None:
+        phases["create_dependency_graph_figure"] = {"skipped": f"graph dependencies not installed ({graph_import_error})"}
+        print(f"  {'create_dependency_graph_figure':<32} skipped: {graph_import_error}")
+    elif len(sorted_objects) > graph_limit:
+        phases["create_dependency_graph_figure"] = {"skipped": f"more than --graph-limit={graph_limit} objects"}
+        print(f"  {'create_dependency_graph_figure':<32} skipped: more than {graph_limit} objects")
+    else:
+        schemas = sorted({o.schema for o in sorted_objects if o.schema})
+        record("create_dependency_graph_figure", lambda: graph_utils.create_dependency_graph_figure(sorted_objects, deps, schemas))
+
+    return {
+        "objects": len(sorted_objects),
+        "statements": len(statements),
+        "ddl_chars": len(full_text),
+        "edges": sum(len(v) for v in deps.values()),
+        "cycles": len(cycles),
+        "leftover_database_references": leftover,
+        "phases": phases,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, object], baseline_path: str) -> None:
+    # Prints the time ratio (current / baseline) of every phase present in both runs.
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}): ratio > 1 is slower")
+    for size, result in current["results"].items():
+        old = baseline.get("results", {}).get(size)
+        if not old: continue
+        for name, phase in result["phases"].items():
+            before = old["phases"].get(name, {})
+            if "seconds" in phase and before.get("seconds"):
+                print(f"  {size:>8} {name:<32} {phase['seconds'] / before['seconds']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DDL parse/order/graph pipeline on synthetic databases.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated object counts.")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/pipeline-<commit>.json).")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass (halves the run time).")
+    parser.add_argument("--graph-limit", type=int, default=20000, help="Skip the graph phase above this many objects.")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"{size} objects")
+        report["results"][str(size)] = run_size(size, not args.no_memory, args.graph_limit)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+    if any(r["leftover_database_references"] for r in report["results"].values()):
+        print("Database references were left in view DDL; see leftover_database_references.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 # The main Streamlit application file.
 # Imports
+import os
+import sys
+import time
 import streamlit as st
 from datetime import datetime
 from collections import defaultdict
@@ -10,26 +13,51 @@ from snowflake.snowpark.context import get_active_session
 # Import utils
 import utils.snowflake_utils as sf
 import utils.sql_parser as sql_parser
-import utils.dependencies as dependencies
+import utils.pipeline as pipeline
 import utils.graph_utils as graph_utils
+import utils.reachability as reachability
 import utils.login_ui as login_ui
 import utils.chatbot as bot
+import utils.perf as perf
+import utils.incremental as incremental
+import utils.snapshot_store as snapshot_store
+import utils.db_diff as db_diff
+import utils.replay_session as replay_session
+import utils.metadata_cache as metadata_cache
+import utils.script_segments as script_segments
+import utils.selection as selection
 
 snowflake_logo_path = "assets/icons/snowflake-logo.svg"     # Sidebar Header Icon
 streamlit_logo_path = "assets/icons/streamlit-logo.svg"     # Main Page Icon
 about_file_path = "src/utils/about.md"                      # About/Help content
+fetch_modes = ["Whole database", "Per schema (parallel)", "Incremental (changes only)"]    # DDL extraction modes
+export_modes = ["Single .sql file", "Single .sql.gz file", "Per-object bundle (.zip)"]      # Script download formats
 models = ["llama3-8b", "mistral-7b", "llama3-70b-8192", "mixtral-8x7b-32768", "gemma-7b-it"]    # Cortex AI MOdels
+app_args = replay_session.parse_app_args(sys.argv[1:])     # --replay / --record flags (streamlit run src/app.py -- ...)
+offline_login = os.environ.get("SNOWDL_OFFLINE_LOGIN", "1") != "0"  # Offline snapshot browsing from the login screen
 
 # ----------------------------->
 # STATE MANAGEMENT
 # ----------------------------->
 
+# Returns the active Snowflake session, or the replay stand-in / recording wrapper selected by the app's flags.
+def get_app_session():
+    current = st.session_state.get('snowflake_session')
+    if app_args.replay:
+        if isinstance(current, replay_session.ReplaySession): return current
+        return replay_session.ReplaySession.load(app_args.replay, app_args.replay_latency, app_args.replay_jitter)
+    session = get_active_session()
+    if app_args.record:
+        if isinstance(current, replay_session.RecordingSession) and current.session is session: return current
+        return replay_session.RecordingSession(session, app_args.record)
+    return session
+
 # Initializes the session, checking for an active Snowflake connection.
 def initialize_session():
     st.query_params["sf"] = "None" if "sf" not in st.query_params else st.query_params["sf"]
     try:
         # Attempt to get an active Snowflake session.
-        st.session_state['snowflake_session'] = get_active_session()
+        st.session_state['snowflake_session'] = get_app_session()
         st.session_state['logged_in'] = True
         
         if st.query_params["sf"] == "None" or st.query_params["sf"] == "True":
@@ -37,27 +65,37 @@ def initialize_session():
         
         st.session_state['account'] = st.session_state['snowflake_session'].get_current_account().strip('"').upper()
         
-        st.session_state['user'] = sf.get_user() or str(st.session_state['snowflake_session'].get_current_user().strip('"'))
-        
         if "role_changed" not in st.session_state:
             st.session_state['role_changed'] = False
         
-        if 'role_list' not in st.session_state:
-            st.session_state['role_list'] = sf.list_roles(st.session_state['snowflake_session'].get_current_role().strip('"'))
+        # Everything missing from the session state is loaded with one batch of concurrent queries.
+        session = st.session_state['snowflake_session']
+        missing = [k for k, needed in (
+            ('user', 'user' not in st.session_state),
+            ('role_list', 'role_list' not in st.session_state),
+            ('wh_list', 'wh_list' not in st.session_state or st.session_state['role_changed']),
+            ('db_list', 'db_list' not in st.session_state or st.session_state['role_changed']),
+        ) if needed]
+        if missing:
+            with perf.span("load_session_listings", objects=len(missing)):
+                st.session_state.update(sf.load_session_listings(session.get_current_role(), session.get_current_warehouse() or "", missing))
+        st.session_state['user'] = st.session_state.get('user') or str(session.get_current_user().strip('"'))
+        
         if st.session_state['snowflake_session'].get_current_role().strip('"') not in st.session_state['role_list']:
             for r in st.session_state['role_list']:
                 try:
                     st.session_state['snowflake_session'].use_role(r)
                     st.toast(f'Selected role {st.session_state['snowflake_session'].get_current_role()} is not available. Switching to "{r}".', duration = "long")
                     st.session_state['role'] = r
+                    # The batch above ran under the previous role: list what the new one can see.
+                    st.session_state['wh_list'] = sf.list_warehouses(st.session_state['snowflake_session'].get_current_warehouse() or "")
+                    st.session_state['db_list'] = sf.list_databases()
                     break
                 except Exception:
                     continue
         else:
             st.session_state['role'] = st.session_state['snowflake_session'].get_current_role().strip('"')
         
-        if 'wh_list' not in st.session_state or st.session_state['role_changed']:
-            st.session_state['wh_list'] = sf.list_warehouses(st.session_state['snowflake_session'].get_current_warehouse().strip('"'))
         if st.session_state['snowflake_session'].get_current_warehouse().strip('"') not in st.session_state['wh_list']:
             for w in st.session_state['wh_list']:
                 try:
@@ -70,9 +108,6 @@ def initialize_session():
         else:
             st.session_state['warehouse'] = st.session_state['snowflake_session'].get_current_warehouse().strip('"')
         
-        if 'db_list' not in st.session_state or st.session_state['role_changed']:
-            st.session_state['db_list'] = sf.list_databases()
-        
         # Cortex AI Chatbot session state keys
         # Load configuration from a TOML file.
         if 'chat_messages' not in st.session_state:
@@ -88,7 +123,9 @@ def initialize_session():
         st.query_params["sf"] = "False"
     
     st.session_state['is_snowflake'] = st.query_params["sf"] == "True"
-    if st.session_state['is_snowflake']:
+    if app_args.replay:
+        st.session_state['session_type'] = "Replay"
+    elif st.session_state['is_snowflake']:
         st.session_state['session_type'] = "Snowsight"
     else:
         st.session_state['session_type'] = "External"
@@ -97,17 +134,11 @@ def initialize_session():
 
 # Initializes or re-initializes the Streamlit session state variables.
 def init_session_state():
-    if 'preserved_checkbox_states' in st.session_state:
-        # Restore checkbox states after a rerun.
-        for key, value in st.session_state.preserved_checkbox_states.items():
-            st.session_state[key] = value
-        del st.session_state.preserved_checkbox_states
-
     # Define and initialize default session state keys.
     keys_to_init = {
         "db_selected": None, "objects": [], "raw_objects_list": [],
-        "dependency_graph": {}, "grouped_objects": defaultdict(lambda: defaultdict(list)),
-        "search_query": "", "final_script_output": "", "script_source_keys": set(),
+        "dependency_graph": {}, "dependency_cycles": [], "reachability": None, "grouped_objects": defaultdict(lambda: defaultdict(list)),
+        "search_query": "", "script_segments": None, "db_ref_warnings": [], "selection": None,
         "selected_schemas": [],
     }
     for key, value in keys_to_init.items():
@@ -120,204 +151,183 @@ def reset_app_state():
         'snowflake_session', 'logged_in', 'is_snowflake', 'session_type', 
         'auth_method', 'password', 'key_option', 'key_content', 'key_file', 'is_loading', 
         'account', 'user', 'role', 'role_list', 'warehouse', 'wh_list', 'db_list', 'role_changed',
-        'chat_messages', 'cortex_models', 'selected_cortex_model',
-    }
+        'chat_messages', 'cortex_models', 'selected_cortex_model', 'fetch_mode', 'offline_mode', 'offline_scope', 'export_mode',
+    } | perf.PERF_STATE_KEYS
     keys_to_clear = [key for key in st.session_state.keys() if key not in account_keys]
     for key in keys_to_clear:
         del st.session_state[key]
         
-# Synchronizes the state of checkboxes for database objects.
-def sync_checkbox_state(db_key):
-    if not st.session_state.objects:
-        return
-
-    sch_keys = {o['sch_key'] for o in st.session_state.objects}
-    
-    source_key, source_value = None, None
-
-    # Determine which checkbox was changed by the user.
-    prev_global = st.session_state.get(f"__prev__{db_key}", False)
-    cur_global = st.session_state.get(db_key, False)
-    if cur_global != prev_global:
-        source_key, source_value = db_key, cur_global
-    
-    if not source_key:
-        for sk in sch_keys:
-            prev_group = st.session_state.get(f"__prev__{sk}", False)
-            cur_group = st.session_state.get(sk, False)
-            if cur_group != prev_group:
-                source_key, source_value = sk, cur_group
-                break
-
-    # Update child checkboxes based on the source change.
-    if source_key == db_key:
-        selected_schemas = [s for s, selected in st.session_state.get('schema_selection', {}).items() if selected]
-        keys_to_update = {o['obj_key'] for o in st.session_state.objects if o.get('schema', 'N/A') in selected_schemas}
-        for ok in keys_to_update:
-            st.session_state[ok] = source_value
-    
-    elif source_key in sch_keys:
-        child_keys = [o['obj_key'] for o in st.session_state.objects if o['sch_key'] == source_key]
-        for ck in child_keys:
-            st.session_state[ck] = source_value
+# Checkbox callbacks: they run before the rerun and update the selection model (see utils.selection), from which
+# every checkbox is rendered, so a toggle costs O(changed objects) instead of rescanning all objects per schema.
+def on_object_toggled(obj_key):
+    st.session_state.selection.set_key(obj_key, st.session_state[obj_key])
 
-    # Update parent checkboxes based on the state of their children.
-    for sk in sch_keys:
-        child_keys = [o['obj_key'] for o in st.session_state.objects if o['sch_key'] == sk]
-        if child_keys:
-            st.session_state[sk] = all(st.session_state.get(k, False) for k in child_keys)
+def on_schema_toggled(sch_key):
+    st.session_state.selection.set_schema(sch_key, st.session_state[sch_key])
 
+def on_database_toggled(db_key):
     selected_schemas = [s for s, selected in st.session_state.get('schema_selection', {}).items() if selected]
-    keys_for_global_check = {o['obj_key'] for o in st.session_state.objects if o.get('schema', 'N/A') in selected_schemas}
-    st.session_state[db_key] = all(st.session_state.get(k, False) for k in keys_for_global_check) if keys_for_global_check else False
+    st.session_state.selection.set_schemas(selected_schemas, st.session_state[db_key])
+
+# Renders a checkbox whose state comes from the selection model; only rendered checkboxes get a widget key written.
+def selection_checkbox(label, key, value, on_change, **kwargs):
+    if st.session_state.get(key) != value:
+        st.session_state[key] = value
+    st.checkbox(label, key=key, on_change=on_change, args=(key,), **kwargs)
 
-    # Store the current state for the next comparison.
-    st.session_state[f"__prev__{db_key}"] = st.session_state.get(db_key, False)
-    for sk in sch_keys:
-        st.session_state[f"__prev__{sk}"] = st.session_state.get(sk, False)
+# Ticks an object and everything it needs, directly or indirectly. Used as a button callback, before widgets render.
+def select_with_dependencies(obj_key):
+    model = st.session_state.selection
+    pos = model.position.get(obj_key) if model else None
+    if pos is None or st.session_state.reachability is None: return
+    target = model.objects[pos]
+    # The closure's names are mapped straight to positions, without scanning the database's objects.
+    selected = model.set_fqns(st.session_state.reachability.upstream(target.canon_fqn), True)
+    model.set(pos, True)
+    selected.add(pos)
+    st.toast(f":green[Selected **{target.object_name}** and {len(selected) - 1} objects it depends on.]")
 
 # ----------------------------->
 # DATA PROCESSING
 # ----------------------------->
 
-# Parses raw DDL text into a list of structured object metadata.
-def parse_ddl_statements(ddl_text, stage_ddls, selected_db):
-    raw_objects = []
-    full_ddl_text = (ddl_text or "") + (stage_ddls or "")
-    statements = sql_parser.split_sql_statements(full_ddl_text)
-    for idx, stmt in enumerate(statements):
-        # Remove database references from the create statement
-        cleaned_stmt = sql_parser.remove_database_references(stmt, selected_db)
-        meta: Optional[Dict[str, Any]] = sql_parser.extract_object_metadata(cleaned_stmt)
-        if meta:
-            # Augment metadata with additional details.
-            if not meta.get("database"): meta["database"] = selected_db
-            meta["ddl"] = cleaned_stmt.strip()
-            meta["index"] = idx
-            raw_objects.append(meta)
-    return raw_objects
-
 # Processes the selection of a database, fetching and parsing DDLs.
+@perf.timed
 def process_database_selection(selected_db):
-    if st.session_state.db_selected != selected_db:
+    # In per-schema mode only the schemas selected in the sidebar are fetched: a change of that selection fetches the
+    # schemas added to it and drops the removed ones (see update_fetched_schemas), keeping the loaded objects' selection.
+    per_schema = st.session_state.get('fetch_mode') == fetch_modes[1]
+    same_db = st.session_state.db_selected == selected_db
+    available_schemas, fetch_schemas = None, None
+    if per_schema:
+        available_schemas = sf.list_schemas(selected_db)
+        selection = st.session_state.get('schema_selection', {}) if same_db else {}
+        fetch_schemas = tuple(s for s in available_schemas if selection.get(s, True))
+    fetch_key = (selected_db, fetch_schemas)
+
+    if per_schema and same_db and st.session_state.get('fetched_schema_ddls') is not None \
+            and st.session_state.get('fetch_key') != fetch_key:
+        update_fetched_schemas(selected_db, fetch_schemas)
+        st.session_state.fetch_key = fetch_key
+    elif not same_db or st.session_state.get('fetch_key') != fetch_key:
+        schema_selection = st.session_state.get('schema_selection') if same_db and per_schema else None
         reset_app_state()
         init_session_state()
         st.session_state.db_selected = selected_db
+        st.session_state.fetch_key = fetch_key
+        st.session_state.available_schemas = available_schemas
+        if schema_selection is not None:
+            st.session_state.schema_selection = schema_selection
         with st.spinner(f"Extracting and parsing DDL for **{selected_db}**... This may take a moment."):
-            # Fetch DDLs from Snowflake.
-            ddl_text, stage_ddls = sf.get_database_ddl(selected_db)
+            # Fetch DDLs from Snowflake: one GET_DDL for the database, one per selected schema run concurrently,
+            # or only the objects changed since the stored snapshot of the database.
+            changes = {}
+            with perf.span("fetch_database_ddl", objects=len(fetch_schemas) if per_schema else None) as sp:
+                if per_schema:
+                    schema_ddls = sf.get_schema_ddls(selected_db, fetch_schemas)
+                    st.session_state.fetched_schema_ddls = schema_ddls
+                    ddl_text, stage_ddls = (None, None) if schema_ddls is None else sf.merge_schema_ddls(selected_db, fetch_schemas, schema_ddls)
+                elif st.session_state.get('fetch_mode') == fetch_modes[2]:
+                    scope = incremental.snapshot_scope(snapshot_scope(), selected_db)
+                    ddl_text, stage_ddls, changes = sf.get_database_ddl_incremental(selected_db, scope)
+                    sp.update(changes)
+                else:
+                    ddl_text, stage_ddls = sf.get_database_ddl(selected_db)
+                sp["bytes"] = len(ddl_text or "") + len(stage_ddls or "")
+            if changes.get("mode") == "incremental":
+                st.toast(f"Snapshot updated: {changes['changed']} object(s) re-fetched, {changes['dropped']} dropped.")
+            elif changes.get("mode") == "full":
+                st.toast(f"Full extraction ({changes['reason']}); the snapshot is saved for the next incremental one.")
+            if ddl_text is not None and not per_schema:
+                # Keep a version of every whole-database extraction for offline browsing.
+                with perf.span("save_snapshot_version", bytes=len(ddl_text)):
+                    snapshot_store.save_version(snapshot_scope(), selected_db, ddl_text, stage_ddls)
             if ddl_text is not None:
-                # Parse and process the fetched DDL statements.
-                raw_objects = parse_ddl_statements(ddl_text, stage_ddls, selected_db)
-                sorted_objects, deps = dependencies.order_objects_by_dependencies(raw_objects)
-                
-                st.session_state.raw_objects_list = sorted_objects
-                st.session_state.dependency_graph = deps
-
-                filtered_sorted_objects = [o for o in sorted_objects if o.get("object_type") not in ["DATABASE", "SCHEMA"]]
-                
-                clean_objects = [{k: v for k, v in o.items() if not k.startswith('_')} for o in filtered_sorted_objects]
-                
-                # Group objects by schema and type for display.
-                grouped = defaultdict(lambda: defaultdict(list))
-                for obj in clean_objects:
-                    db, sch, obj_name, obj_type = obj.get("database", ""), obj.get("schema", ""), obj.get("object_name", ""), obj.get("object_type", "UNKNOWN")
-                    obj['db_key'], obj['sch_key'], obj['obj_key'] = f"DB|{db}", f"SCH|{db}|{sch}", f"OBJ|{db}|{sch}|{obj_type}|{obj_name}"
-                    grouped[sch][obj_type].append(obj)
-
-                st.session_state.objects = clean_objects
-                st.session_state.grouped_objects = grouped
-                st.toast(f":green[Successfully parsed {len(clean_objects)} objects from '{selected_db}'.]", duration = "long")
-                
-
-# Checks for and warns about hardcoded database references in the DDL.
-def check_and_warn_db_references(selected_objects):
-    db_ref_warnings = []
+                load_parsed_database(selected_db, ddl_text, stage_ddls)
+
+# The (account, user, role) scope in which snapshot versions are saved, listed and opened: what the session's role
+# could extract, so a saved snapshot is never shown to another user or role of the same server. In offline mode it is
+# the scope picked when entering it, so no session is needed.
+def snapshot_scope():
+    if st.session_state.get('offline_mode'): return st.session_state['offline_scope']
+    return metadata_cache.session_scope(st.session_state['snowflake_session'])
+
+# Per-schema mode: applies a change of the schema selection to the loaded database. Only the added schemas are
+# fetched; the DDL of the others is reused, the removed ones are left out, and the merged text is parsed again.
+# Objects ticked in the schemas kept stay ticked. On a failed fetch, the loaded objects stay as they are.
+def update_fetched_schemas(selected_db, fetch_schemas):
+    fetched = st.session_state.fetched_schema_ddls
+    added = tuple(s for s in fetch_schemas if s not in fetched)
+    with st.spinner(f"Updating the schemas of **{selected_db}**..."):
+        with perf.span("fetch_database_ddl", objects=len(added)) as sp:
+            new = sf.get_schema_ddls(selected_db, added) if added else {}
+            if new is None: return
+            fetched = {s: new[s] if s in new else fetched[s] for s in fetch_schemas if s in new or s in fetched}
+            ddl_text, stage_ddls = sf.merge_schema_ddls(selected_db, fetch_schemas, fetched)
+            sp["bytes"] = len(ddl_text) + len(stage_ddls)
+        st.session_state.fetched_schema_ddls = fetched
+        model = st.session_state.selection
+        ticked = [o.obj_key for o in model.selected_objects()] if model else []
+        load_parsed_database(selected_db, ddl_text, stage_ddls)
+        for obj_key in ticked:
+            st.session_state.selection.set_key(obj_key, True)
+
+# Opens a saved snapshot version (offline mode) through the same parsing and grouping as a live extraction.
+def process_snapshot_selection(version):
+    fetch_key = ("snapshot", version["id"])
+    if st.session_state.get('fetch_key') != fetch_key:
+        reset_app_state()
+        init_session_state()
+        st.session_state.db_selected = version["database"]
+        st.session_state.fetch_key = fetch_key
+        with st.spinner(f"Loading snapshot of **{version['database']}**..."):
+            with perf.span("load_snapshot_version") as sp:
+                loaded = snapshot_store.load_version(version["id"], snapshot_scope())
+                sp["bytes"] = len(loaded[1]) if loaded else 0
+            if loaded is None:
+                st.error(f"Snapshot {version['id']} of '{version['database']}' could not be read.")
+                return
+            database, ddl_text, stage_ddls = loaded
+            load_parsed_database(database, ddl_text, stage_ddls)
+
+# Parses fetched (or stored) DDL, orders it by dependency and groups the objects for display.
+def load_parsed_database(selected_db, ddl_text, stage_ddls):
+    # Parse and process the fetched DDL statements.
+    # Large databases are parsed across a process pool; see pipeline.PARALLEL_THRESHOLD_CHARS.
+    with perf.span("parse_and_order", bytes=len(ddl_text) + len(stage_ddls or "")) as sp:
+        sorted_objects, deps, cycles = pipeline.parse_and_order(ddl_text, stage_ddls, selected_db)
+        sp["objects"] = len(sorted_objects)
+
+    st.session_state.raw_objects_list = sorted_objects
+    st.session_state.dependency_graph = deps
+    st.session_state.dependency_cycles = cycles
+    with perf.span("build_reachability_index", objects=len(sorted_objects)):
+        st.session_state.reachability = reachability.ReachabilityIndex(deps, (o.canon_fqn for o in sorted_objects))
+
+    # Both lists hold references to the same records, so filtering costs no copies.
+    clean_objects = [o for o in sorted_objects if o.object_type not in ["DATABASE", "SCHEMA"]]
+
+    # Group objects by schema and type for display.
+    with perf.span("group_objects", objects=len(clean_objects)):
+        grouped = defaultdict(lambda: defaultdict(list))
+        for obj in clean_objects:
+            db, sch, obj_name, obj_type = obj.database, obj.schema, obj.object_name, obj.object_type or "UNKNOWN"
+            obj.db_key, obj.sch_key, obj.obj_key = f"DB|{db}", f"SCH|{db}|{sch}", f"OBJ|{db}|{sch}|{obj_type}|{obj_name}"
+            grouped[sch][obj_type].append(obj)
+
+    st.session_state.objects = clean_objects
+    st.session_state.grouped_objects = grouped
+    st.session_state.selection = selection.SelectionModel(clean_objects)
+    st.toast(f":green[Successfully parsed {len(clean_objects)} objects from '{selected_db}'.]", duration = "long")
+    if cycles:
+        st.toast(f":orange[Found {len(cycles)} dependency cycle(s); objects in a cycle are scripted together.]", duration = "long")
+
+
+# Warns about hardcoded database references in the DDL.
+# The references are located when the script changes (see generate_and_display_script), not on every rerun.
+def check_and_warn_db_references():
+    db_ref_warnings = st.session_state.get('db_ref_warnings', [])
     db_name = st.session_state.db_selected
-    final_script_lines = st.session_state.final_script_output.split('\n')
-
-    # Iterate through selected objects to find references.
-    for obj in selected_objects:
-        ddl_with_semicolon = obj['ddl'] + ";"
-        if db_name.lower() in ddl_with_semicolon.lower():
-            obj_ddl_lines = ddl_with_semicolon.split('\n')
-            matches = []
-            
-            # Find the line numbers of the references.
-            for i, line in enumerate(obj_ddl_lines):
-                if db_name.lower() in line.lower():
-                    obj_line_number = i + 1
-                    final_line_number = None
-                    for j, fs_line in enumerate(final_script_lines):
-                        if line.strip() == fs_line.strip():
-                            is_match = True
-                            if i > 0 and j > 0 and obj_ddl_lines[i-1].strip() != final_script_lines[j-1].strip():
-                                is_match = False
-                            if i < len(obj_ddl_lines)-1 and j < len(final_script_lines)-1 and obj_ddl_lines[i+1].strip() != final_script_lines[j+1].strip():
-                                is_match = False
-                            if is_match:
-                                final_line_number = j + 1
-                                break
-                    matches.append({
-                        'ddl_line_number': obj_line_number,
-                        'script_line_number': final_line_number if final_line_number else 'Not found',
-                        'line_content': line.strip()
-                    })
-
-            # Build a code snippet to show the context of the reference.
-            snippet = ""
-            if matches:
-                matches.sort(key=lambda m: m['ddl_line_number'])
-                snippet_parts = []
-                current_block = []
-                last_end = -2
-                for match in matches:
-                    ddl_line = match['ddl_line_number'] - 1
-                    if ddl_line - last_end > 1 and current_block:
-                        snippet_parts.append(list(current_block))
-                        current_block = []
-                    start = max(0, ddl_line - 1)
-                    end = min(len(obj_ddl_lines), ddl_line + 2)
-                    for k in range(start, end):
-                        if k not in [item[0] for item in current_block]:
-                            for j, fs_line in enumerate(final_script_lines):
-                                if obj_ddl_lines[k].strip() == fs_line.strip():
-                                    is_context_match = True
-                                    if k > 0 and j > 0 and obj_ddl_lines[k-1].strip() != final_script_lines[j-1].strip():
-                                        is_context_match = False
-                                    if k < len(obj_ddl_lines) - 1 and j < len(final_script_lines) - 1 and obj_ddl_lines[k+1].strip() != final_script_lines[j+1].strip():
-                                        is_context_match = False
-                                    if is_context_match:
-                                        final_k = j + 1
-                                        break
-                            else:
-                                final_k = 'N/A'
-                            current_block.append((k, any(m['ddl_line_number'] - 1 == k for m in matches), final_k))
-                    last_end = end - 1
-                
-                if current_block:
-                    snippet_parts.append(list(current_block))
-                
-                if snippet_parts:
-                    snippet_lines = []
-                    for i, block in enumerate(snippet_parts):
-                        block_snippet = sql_parser.build_block_snippet(block, obj_ddl_lines, final_script_lines)
-                        snippet_lines.append(block_snippet)
-                        if i < len(snippet_parts) - 1:
-                            last_line = max(k for k, _, _ in block)
-                            next_start = min(k for k, _, _ in snippet_parts[i + 1])
-                            separator = "\n" if next_start - last_line <= 1 else "\n...\n"
-                            snippet_lines.append(separator)
-                    snippet = "".join(snippet_lines)
-            
-            # Collect warning information.
-            warning_info = {
-                "object_type": obj.get("object_type", "Object"),
-                "fully_qualified_name": obj.get("fully_qualified_name", "Unknown"),
-                "matches": matches,
-                "snippet": snippet
-            }
-            db_ref_warnings.append(warning_info)
 
     # Display warnings if any references were found.
     if db_ref_warnings:
@@ -331,45 +341,52 @@ def check_and_warn_db_references(selected_objects):
                     st.code(warning['snippet'], language='sql')
 
 # Generates the final SQL script and displays it in the UI.
+# The script is kept as per-object segments (see utils.script_segments): a selection change only adds or removes
+# the affected segments and shifts line numbers, instead of rebuilding the script and rescanning it.
 def generate_and_display_script(selected_objects):
-    current_script_keys = {o['obj_key'] for o in selected_objects}
     if 'include_schema_ddl' not in st.session_state:
         st.session_state.include_schema_ddl = False
+    segments = st.session_state.get('script_segments')
+    if segments is None or segments.objects is not st.session_state.objects:
+        segments = st.session_state.script_segments = script_segments.ScriptSegments(st.session_state.objects)
 
-    # Regenerate script only if selection or options change.
-    if (
-        current_script_keys != st.session_state.get('script_source_keys') or
-        st.session_state.include_schema_ddl != st.session_state.get('prev_include_schema_ddl')):
-        
-        base_script = ";\n\n".join([o['ddl'] for o in selected_objects]) + ";"
-        if st.session_state.include_schema_ddl:
-            # Optionally include CREATE SCHEMA statements.
-            distinct_schemas = sorted(list(set(o['schema'] for o in selected_objects if 'schema' in o)))
-            schema_ddls = [f'CREATE SCHEMA IF NOT EXISTS "{schema}";' for schema in distinct_schemas]
-            st.session_state.final_script_output = "\n".join(schema_ddls) + f"\n\n{base_script}"
-        else:
-            st.session_state.final_script_output = base_script
-
-        st.session_state.script_source_keys = current_script_keys
-        st.session_state.prev_include_schema_ddl = st.session_state.include_schema_ddl
+    # Update the segments only if selection or options change.
+    if segments.update({o.obj_key for o in selected_objects}, st.session_state.include_schema_ddl):
+        # Hardcoded database references, located per object and numbered with the segments' line offsets.
+        with perf.span("find_database_references", objects=len(selected_objects)):
+            st.session_state.db_ref_warnings = segments.reference_warnings(st.session_state.db_selected)
         
     # Check for and warn about hardcoded database references.
-    check_and_warn_db_references(selected_objects)
+    with perf.span("check_and_warn_db_references", objects=len(selected_objects)):
+        check_and_warn_db_references()
     
     st.checkbox("Include Schema DDL", key='include_schema_ddl', help="Adds `CREATE SCHEMA IF NOT EXISTS` statements for all the schemas in the selected objects.")
     
     # Display the generated script in a code block.
     code_container = st.container(height=400)
-    code_container.code(st.session_state.final_script_output, language='sql', line_numbers=True)
+    code_container.code(segments.text(), language='sql', line_numbers=True)
 
-    # Provide a download button for the script.
-    file_name = f"{st.session_state.db_selected}_DDL_Export_{datetime.now().strftime('%Y%m%d%H%M%S')}.sql"
+    # Provide a download button for the script (optionally gzip-compressed) or the per-object bundle, built from the segments.
+    export_mode = st.radio(
+        "Export as", export_modes, key='export_mode', horizontal=True,
+        help="The bundle holds one file per object (schema/type/name.sql) and a manifest.json with the deploy order, "
+             "a SHA-256 per file and deploy waves.",
+    )
+    file_name = f"{st.session_state.db_selected}_DDL_Export_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    if export_mode == export_modes[2]:
+        with perf.span("build_export_bundle", objects=len(segments)):
+            data = segments.bundle(st.session_state.dependency_graph, st.session_state.dependency_cycles, st.session_state.db_selected)
+        file_name, mime, label = f"{file_name}.zip", "application/zip", "**Download DDL as a per-object .zip bundle**"
+    elif export_mode == export_modes[1]:
+        data, file_name, mime, label = segments.gzip(), f"{file_name}.sql.gz", "application/gzip", "**Download DDL as a .sql.gz File**"
+    else:
+        data, file_name, mime, label = segments.text(), f"{file_name}.sql", "text/plain", "**Download DDL as a .sql File**"
     if st.download_button(
-        label="**Download DDL as a .sql File**",
+        label=label,
         icon=":material/download_2:",
-        data=st.session_state.final_script_output,
+        data=data,
         file_name=file_name,
-        mime="text/plain",
+        mime=mime,
         width="stretch"
     ):
         st.toast(f":green[Downloaded - **{file_name}**]", icon=":material/download_done:", duration=6)
@@ -398,6 +415,40 @@ def about_dialog():
 def session_dialog():
     st.write(st.session_state)
 
+# Defines a dialog with the phase timings of recent reruns, a JSON export and a one-rerun cProfile capture.
+@st.dialog("Performance", width="large")
+@st.fragment
+def performance_dialog():
+    runs = st.session_state.get('perf_runs', [])
+    if not runs:
+        st.info("No timings recorded yet.")
+    else:
+        last = runs[-1]
+        st.markdown(f"Last full rerun (**{last['started']}**): **{last['total_ms']:.0f} ms**")
+        st.dataframe(perf.span_rows(last), hide_index=True, width="stretch")
+        with st.expander(f"Earlier reruns ({len(runs) - 1})"):
+            st.dataframe(
+                [{"Started": r["started"], "Total ms": r["total_ms"], "Spans": len(r["spans"])} for r in reversed(runs[:-1])],
+                hide_index=True, width="stretch",
+            )
+    cache_info = metadata_cache.cache.info()
+    st.caption(
+        f"Metadata cache: {cache_info['entries']} entries, {cache_info['bytes'] / 1e6:.1f} MB · "
+        f"{cache_info['hits']} hits, {cache_info['stale_hits']} stale hits, {cache_info['misses']} misses, "
+        f"{cache_info['refreshes']} background refreshes, {cache_info['evictions']} evictions"
+    )
+    c1, c2 = st.columns(2)
+    c1.download_button(
+        ":material/download: Export timings as JSON", data=perf.export_json(),
+        file_name=f"snowdl_perf_{datetime.now().strftime('%Y%m%d%H%M%S')}.json", mime="application/json", width="stretch",
+    )
+    if c2.button(":material/speed: Profile the next rerun (cProfile)", width="stretch", help="Captures one full rerun with cProfile. Reopen this dialog to see the report."):
+        st.session_state['perf_profile_next'] = True
+        st.rerun()
+    if st.session_state.get('perf_profile_report'):
+        with st.expander("Last cProfile report (cumulative time)"):
+            st.code(st.session_state['perf_profile_report'], language=None)
+
 # Defines a dialog to change the current Snowflake role.
 @st.dialog("Select Role")
 @st.fragment
@@ -410,6 +461,8 @@ def change_role():
     )
     if st.button("Submit"):
         st.session_state['snowflake_session'].use_role(selected_role)
+        # Anything cached earlier for the new role may predate grant changes, so it is fetched again.
+        metadata_cache.cache.invalidate(*metadata_cache.session_scope(st.session_state['snowflake_session']))
         st.session_state['role'] = selected_role
         st.session_state['role_changed'] = True
         st.toast(f":material/info: Switching to Role - {selected_role}.", duration = 6)
@@ -448,11 +501,131 @@ def dependency_graph_dialog():
             )
             if html_content:
                 components.html(html_content, height=800, width=1500)
+        if st.session_state.dependency_cycles:
+            with st.expander(f":orange[:material/sync_problem: {len(st.session_state.dependency_cycles)} dependency cycle(s) detected]"):
+                for cycle in st.session_state.dependency_cycles:
+                    st.markdown(" → ".join(f"`{n}`" for n in cycle))
 
     if st.button("Close", key="close_graph_dialog"):
         st.rerun()
 
 
+# Loads, parses and fingerprints the database or snapshot to compare with, keeping the last one for the dialog's reruns.
+# source is ("database", name) or ("snapshot", version id). Returns (database name, objects), or None if it cannot be loaded.
+def load_comparison_objects(source):
+    cached = st.session_state.get('compare_loaded')
+    if cached and cached[0] == source:
+        return cached[1]
+    kind, ref = source
+    with st.spinner("Extracting and parsing the DDL to compare with..."):
+        with perf.span("load_comparison_ddl") as sp:
+            if kind == "database":
+                database, (ddl_text, stage_ddls) = ref, sf.get_database_ddl(ref)
+            else:
+                loaded = snapshot_store.load_version(ref, snapshot_scope())
+                if loaded is None:
+                    st.error(f"Snapshot {ref} could not be read.")
+                    return None
+                database, ddl_text, stage_ddls = loaded
+            sp["bytes"] = len(ddl_text or "") + len(stage_ddls or "")
+        if ddl_text is None: return None
+        with perf.span("parse_and_order", bytes=len(ddl_text) + len(stage_ddls or "")) as sp:
+            objects = [o for o in pipeline.parse_and_order(ddl_text, stage_ddls, database)[0] if o.object_type not in ["DATABASE", "SCHEMA"]]
+            sp["objects"] = len(objects)
+        with perf.span("fingerprint_objects", objects=len(objects)):
+            db_diff.fingerprint_objects(objects)
+    st.session_state.compare_loaded = (source, (database, objects))
+    return database, objects
+
+# Defines a dialog comparing the loaded database with another database or a saved snapshot (e.g. DEV against PROD).
+# Objects are compared by normalized DDL fingerprint only; text diffs are built for the changed objects on demand.
+@st.dialog(":rainbow[:material/compare_arrows: Compare Databases]", width="large")
+@st.fragment
+def compare_dialog():
+    current = st.session_state.db_selected
+    sources = {}
+    if not st.session_state.get('offline_mode'):
+        for db in st.session_state.get('db_list', []):
+            if db != current: sources[f"Database: {db}"] = ("database", db)
+    for v in snapshot_store.list_versions(snapshot_scope()):
+        taken = datetime.fromtimestamp(v["taken_at"]).strftime("%Y-%m-%d %H:%M")
+        sources[f"Snapshot: {v['database']} · {taken} · {v['account']} (#{v['id']})"] = ("snapshot", v["id"])
+    choice = st.selectbox(
+        f"Compare **{current}** with", list(sources), index=None, key='compare_source',
+        placeholder="Pick a database or a saved snapshot...",
+    )
+    loaded = load_comparison_objects(sources[choice]) if choice else None
+    if loaded:
+        other_db, base = loaded
+        with perf.span("fingerprint_objects", objects=len(st.session_state.objects)):
+            db_diff.fingerprint_objects(st.session_state.objects)
+        start = time.perf_counter()
+        with perf.span("diff_databases", objects=len(base) + len(st.session_state.objects)):
+            diff = db_diff.diff_databases(base, st.session_state.objects)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.info(f"Compared **{len(st.session_state.objects)}** objects in **{current}** with **{len(base)}** in **{other_db}** in {elapsed_ms:.0f} ms. "
+                "Comments, layout and references to each object's own database are ignored.")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric(f"Only in {current}", len(diff["added"]))
+        c2.metric(f"Only in {other_db}", len(diff["removed"]))
+        c3.metric("Changed", len(diff["changed"]))
+        c4.metric("Unchanged", diff["unchanged"])
+
+        t1, t2, t3 = st.tabs(["Changed", f"Only in {current}", f"Only in {other_db}"])
+        with t1:
+            if diff["changed"]:
+                pair = st.selectbox(
+                    "Object", diff["changed"], key='compare_changed_object',
+                    format_func=lambda p: f"{p[1].object_type}: {p[1].fully_qualified_name}",
+                )
+                st.code(db_diff.ddl_text_diff(*pair), language='diff')
+            else:
+                st.success("No object differs.")
+        for tab, objects in ((t2, diff["added"]), (t3, diff["removed"])):
+            with tab:
+                st.dataframe([{"Schema": o.schema, "Type": o.object_type, "Object": o.object_name} for o in objects], hide_index=True, width="stretch")
+
+        changed = db_diff.changed_objects(diff, st.session_state.objects)
+        if changed:
+            st.download_button(
+                f"**Download script of the {len(changed)} objects added or changed in {current}**",
+                icon=":material/download_2:", data=pipeline.build_script(changed, st.session_state.get('include_schema_ddl', False)),
+                file_name=f"{current}_vs_{other_db}_changes_{datetime.now().strftime('%Y%m%d%H%M%S')}.sql", mime="text/plain", width="stretch",
+                help=f"Objects only in {other_db} are not dropped by the script.",
+            )
+
+    if st.button("Close", key="close_compare_dialog"):
+        st.rerun()
+
+# Defines a dialog listing everything that depends on an object, i.e. what breaks if it is dropped or changed.
+@st.dialog(":rainbow[:material/crisis_alert: Impact Analysis]", width="large")
+@st.fragment
+def impact_dialog(obj_key):
+    model = st.session_state.selection
+    pos = model.position.get(obj_key) if model else None
+    target = model.objects[pos] if pos is not None else None
+    if target is None or st.session_state.reachability is None:
+        st.warning("The selected object is no longer available.")
+    else:
+        index = st.session_state.reachability
+        impacted = index.downstream(target.canon_fqn)
+        needed = index.upstream(target.canon_fqn)
+        st.info(f"**{len(impacted)}** objects depend on **{target.fully_qualified_name}** directly or indirectly. It depends on **{len(needed)}** objects itself.")
+        cycle = index.cycle_of(target.canon_fqn)
+        if cycle:
+            st.warning(f"**{target.object_name}** is part of a dependency cycle with: {', '.join(sorted(cycle))}", icon=":material/sync_problem:")
+        # The dependents' names are mapped straight to positions (in dependency order), without scanning every object.
+        positions = sorted(pos for fqn in impacted for pos in model.fqn_positions.get(fqn, ()))
+        rows = [
+            {"Schema": o.schema, "Type": o.object_type, "Object": o.object_name}
+            for o in (model.objects[pos] for pos in positions)
+        ]
+        if rows:
+            st.dataframe(rows, hide_index=True, width="stretch")
+
+    if st.button("Close", key="close_impact_dialog"):
+        st.rerun()
+
 # ----------------------------->
 # UI RENDERING
 # ----------------------------->
@@ -494,19 +667,23 @@ def setup_page():
     # "About" button in the top right corner.
     col1, col2 = st.columns([9, 1])
     with col2:
-        col2_a, col2_b, col2_c= st.columns(3)
+        col2_a, col2_b, col2_p, col2_c= st.columns(4)
         with col2_a:
             if st.button("", icon=":material/info:", help="About!", key="about_section", type="tertiary"):
                 about_dialog()
         with col2_b:
             if st.button("", icon=":material/network_intelligence:", help="Session States", key="session_states", type="tertiary"):
                 session_dialog()
+        with col2_p:
+            if st.button("", icon=":material/speed:", help="Performance", key="performance_button", type="tertiary"):
+                performance_dialog()
         with col2_c:
             if st.button("", icon=":material/refresh:", help="Refresh Page", key="refresh_button", type="tertiary"):
                 st.session_state['db_selector'] = "— Select a database —"
                 st.rerun()
             
 # Renders the header section of the sidebar with session info.
+@perf.timed
 def render_sidebar_header():
     col1, col2 = st.columns([5, 2])
     with col1:
@@ -533,6 +710,8 @@ def render_sidebar_header():
         if not st.session_state['is_snowflake']:
             if st.button("**:material/logout: Log Out**", key="logout_btn"):
                 with st.spinner("Logging out..."):
+                    account, user, _ = metadata_cache.session_scope(st.session_state['snowflake_session'])
+                    metadata_cache.cache.invalidate(account, user)
                     st.session_state['snowflake_session'].close()
                     st.toast("Logged out!", icon=":material/logout:", duration = "long")
                     st.cache_data.clear()
@@ -540,6 +719,7 @@ def render_sidebar_header():
                     st.rerun()
 
 # Renders the database selection dropdown in the sidebar.
+@perf.timed
 def render_db_selector():
     db_options = ["— Select a database —"] + st.session_state['db_list']
     return st.selectbox(
@@ -548,9 +728,11 @@ def render_db_selector():
     )
 
 # Renders the schema selection grid in the sidebar.
+@perf.timed
 def render_schema_selector():
     st.markdown(f":orange[**{sql_parser.get_material_icon('SCHEMA')} Select Schemas**]")
-    all_schemas = sorted(st.session_state.grouped_objects.keys())
+    # In per-schema extraction mode every schema of the database is listed, fetched or not.
+    all_schemas = st.session_state.get('available_schemas') or sorted(st.session_state.grouped_objects.keys())
 
     # Initialize schema selection state if not present.
     if 'schema_selection' not in st.session_state or set(st.session_state.schema_selection.keys()) != set(all_schemas):
@@ -585,11 +767,12 @@ def render_schema_selector():
     st.session_state.selected_schemas = [s for s, selected in st.session_state.schema_selection.items() if selected]
 
 # Renders the section for generating and downloading the SQL script.
+@perf.timed
 def render_script_generation_section():
     st.markdown("---")
     st.header("Generated SQL Script")
 
-    selected_objects = [o for o in st.session_state.objects if st.session_state.get(o['obj_key'])]
+    selected_objects = st.session_state.selection.selected_objects()
 
     if not selected_objects:
         st.info("Select objects in the main page to generate the script.")
@@ -598,19 +781,32 @@ def render_script_generation_section():
     st.success(f"{len(selected_objects)} objects selected. Scroll down to download the SQL script.")
     
     # Generate and display the final SQL script.
-    generate_and_display_script(selected_objects)            
+    with perf.span("generate_and_display_script", objects=len(selected_objects)) as sp:
+        generate_and_display_script(selected_objects)
+        sp["bytes"] = len(st.session_state.script_segments.text())            
             
 # Renders the sidebar components.
+@perf.timed
 def render_sidebar():
     with st.sidebar:
+        if st.session_state.get('offline_mode'):
+            render_offline_sidebar()
+            return
         render_sidebar_header()
+        render_offline_entry()
         st.markdown("---")
         selected_db = render_db_selector()
+        st.radio(
+            f":orange[**:material/cloud_download: Extraction**]", fetch_modes, key='fetch_mode', horizontal=True,
+            help="Per schema runs one GET_DDL per selected schema concurrently, and fetches only the schemas selected below. "
+                 "Incremental re-fetches only the objects created, altered or dropped since the last extraction of the database.",
+        )
         if selected_db and selected_db != "— Select a database —":
             # Process selection and render subsequent UI elements.
             process_database_selection(selected_db)
-            if st.session_state.objects:
+            if st.session_state.objects or st.session_state.get('available_schemas'):
                 render_schema_selector()
+            if st.session_state.objects:
                 render_script_generation_section()
         else:
             # Reset state if no database is selected.
@@ -618,14 +814,77 @@ def render_sidebar():
             init_session_state()
             
 
+# Sidebar of the offline mode: the saved snapshot versions of the session's scope instead of live databases.
+# Nothing is queried from Snowflake beyond the session's identity.
+def render_offline_sidebar():
+    col1, col2 = st.columns([5, 2])
+    with col1:
+        st.html("<div><span style='color: #29B5E8; font-weight: bold;'>Local snapshots<br>(Offline)</span></div>")
+    with col2:
+        if st.button("**:material/logout: Exit**", key="offline_exit_btn", help="Leave offline mode."):
+            reset_app_state()
+            st.session_state['offline_mode'] = False
+            st.session_state.pop('offline_scope', None)
+            st.rerun()
+    st.markdown("---")
+
+    versions = snapshot_store.list_versions(snapshot_scope())
+    labels = {"— Select a snapshot —": None}
+    for v in versions:
+        taken = datetime.fromtimestamp(v["taken_at"]).strftime("%Y-%m-%d %H:%M")
+        labels[f"{v['database']} · {taken} · {v['account']} (#{v['id']})"] = v
+    choice = st.selectbox(f":orange[**:material/history: Snapshot**]", list(labels), index=0, key='snapshot_selector')
+    stats = snapshot_store.store_stats(snapshot_scope())
+    st.caption(f"{stats['versions']} version(s) for role {snapshot_scope()[2]}; the local store holds "
+               f"{stats['statements']:,} distinct statements, {stats['bytes'] / (1024 * 1024):.1f} MB on disk.")
+    if labels[choice] is not None:
+        process_snapshot_selection(labels[choice])
+        if st.session_state.objects:
+            render_schema_selector()
+            render_script_generation_section()
+    else:
+        reset_app_state()
+        init_session_state()
+
+# Enters offline mode, browsing the saved snapshots of one (account, user, role) scope.
+def enter_offline_mode(scope):
+    reset_app_state()
+    st.session_state['offline_mode'] = True
+    st.session_state['offline_scope'] = scope
+    st.rerun()
+
+# Offers offline browsing of the saved snapshots of the session's scope, when there are any (sidebar, logged in).
+def render_offline_entry():
+    scope = snapshot_scope()
+    if not snapshot_store.list_versions(scope): return
+    if st.button(":material/history: **Browse local snapshots**", width="stretch",
+                 help="Open a previously extracted database from local history, without querying Snowflake."):
+        enter_offline_mode(scope)
+
+# Offers offline browsing on the login screen, with no Snowflake session: the user picks one of the (account, user,
+# role) scopes that saved snapshots on this machine, and only that scope's snapshots are listed.
+# Disabled with SNOWDL_OFFLINE_LOGIN=0, e.g. on a server shared by several users.
+def render_offline_login_entry():
+    if not offline_login: return
+    scopes = snapshot_store.list_scopes()
+    if not scopes: return
+    l, c, r = st.columns([2, 2.2, 2])
+    with c:
+        labels = {f"{user} · {role} · {account}": (account, user, role) for account, user, role in scopes}
+        choice = st.selectbox(":material/history: Local snapshots of", list(labels), key='offline_scope_selector')
+        if st.button(":material/history: **Browse local snapshots offline**", use_container_width=True,
+                     help="Open a previously extracted database from local history, without logging in."):
+            enter_offline_mode(labels[choice])
+
 # Renders an expander for a single schema, containing its objects.
+@perf.timed
 def render_schema_expander(schema, search_term):
     types_dict = st.session_state.grouped_objects.get(schema, {})
     filtered_types = defaultdict(list)
     schema_object_count = 0
     # Filter objects based on the search term.
     for obj_type, obj_list in types_dict.items():
-        filtered_list = [o for o in obj_list if search_term in o['object_name'].lower()]
+        filtered_list = [o for o in obj_list if search_term in o.object_name.lower()]
         if filtered_list:
             filtered_types[obj_type] = filtered_list
             schema_object_count += len(filtered_list)
@@ -636,7 +895,25 @@ def render_schema_expander(schema, search_term):
     schema_expanded = False if st.session_state.expand_all_toggle is None else st.session_state.expand_all_toggle
     with st.expander(f"Schema: :red[**{schema}**] ({schema_object_count} objects)", expanded=schema_expanded):
         sch_key = f"SCH|{st.session_state.db_selected}|{schema}"
-        st.checkbox(f"Select all in **{schema}**", key=sch_key, help=f"Toggles all objects in the {schema} schema.")
+        model = st.session_state.selection
+        selection_checkbox(f"Select all in **{schema}**", sch_key, model.schema_selected(sch_key), on_schema_toggled,
+                           help=f"Toggles all objects in the {schema} schema.")
+
+        # Dependency-aware actions on one object of the schema.
+        visible = {o.obj_key: o for obj_list in filtered_types.values() for o in obj_list}
+        a1, a2, a3 = st.columns([4, 3, 2])
+        target_key = a1.selectbox(
+            "Object", list(visible), index=None, key=f"ACT|{sch_key}", label_visibility="collapsed",
+            format_func=lambda k: f"{visible[k].object_type}: {visible[k].object_name}", placeholder="Pick an object for dependency actions...",
+        )
+        a2.button(
+            ":material/account_tree: Select with all dependencies", key=f"ACT_DEPS|{sch_key}", width="stretch",
+            disabled=target_key is None, on_click=select_with_dependencies, args=(target_key,),
+            help="Selects the object and everything it needs, across schemas.",
+        )
+        if a3.button(":material/crisis_alert: Show impact", key=f"ACT_IMPACT|{sch_key}", width="stretch",
+                     disabled=target_key is None, help="Lists every object that depends on the object."):
+            impact_dialog(target_key)
         st.markdown("---")
 
         # Sort object types for consistent display order.
@@ -652,17 +929,21 @@ def render_schema_expander(schema, search_term):
             obj_type_expanded = False if st.session_state.expand_all_toggle is None else st.session_state.expand_all_toggle
             with st.expander(f"{sql_parser.get_material_icon(obj_type)} {obj_type.upper()}S ({len(obj_list)})", expanded=obj_type_expanded):
                 for obj in obj_list:
-                    st.checkbox(obj['object_name'], key=obj['obj_key'])
+                    selection_checkbox(obj.object_name, obj.obj_key, model.is_selected(obj.obj_key), on_object_toggled)
 
 
 # Renders the area for displaying and selecting database objects.
+@perf.timed
 def render_object_display_area():
-    col1, col2 = st.columns([3, 2])
+    col1, col2, col3 = st.columns([4, 3, 2])
     with col1:
         st.markdown(f"### :orange[:material/data_table: Objects in **{st.session_state.db_selected}**]")
     with col2:
         if st.button(":rainbow[:material/graph_4: Dependency Graph]", width="stretch", help="Show the dependency graph for database objects."):
             dependency_graph_dialog()
+    with col3:
+        if st.button(":material/compare_arrows: Compare", width="stretch", help="Compare the objects with another database or a saved snapshot."):
+            compare_dialog()
 
     # "Expand/Collapse All" button for object sections.
     if 'expand_all_toggle' not in st.session_state:
@@ -671,7 +952,6 @@ def render_object_display_area():
     exp_col_bttn_title = ":material/expand_all: Expand All" if st.session_state.expand_all_toggle is not True else ":material/collapse_all: Collapse All"
     c1, c2, c3 = st.columns(3)
     if c3.button(exp_col_bttn_title, type="tertiary", width="stretch", help=f"{exp_col_bttn_title} schema and object type sections."):
-        st.session_state.preserved_checkbox_states = {o['obj_key']: st.session_state.get(o['obj_key'], False) for o in st.session_state.objects}
         st.session_state.expand_all_toggle = st.session_state.expand_all_toggle is not True
         st.rerun()
 
@@ -679,7 +959,10 @@ def render_object_display_area():
     with c1:
         st.text_input("Search objects by name", key="search_query", placeholder="e.g., my_table, my_view, ...")
     with c2:
-        st.checkbox(f"**Select all objects in {st.session_state.db_selected}**", key=f"DB|{st.session_state.db_selected}", help="Toggles every object in the database.")
+        db_key = f"DB|{st.session_state.db_selected}"
+        selection_checkbox(f"**Select all objects in {st.session_state.db_selected}**", db_key,
+                           st.session_state.selection.all_selected(st.session_state.selected_schemas), on_database_toggled,
+                           help="Toggles every object in the database.")
         
     search_term = st.session_state.search_query.lower()
 
@@ -692,6 +975,7 @@ def render_object_display_area():
         render_schema_expander(schema, search_term)
 
 # Renders the main content area of the application.
+@perf.timed
 def render_main_area():
     co1, co2 = st.columns([5, 3])
     with co1:
@@ -706,8 +990,9 @@ def render_main_area():
             st.image(streamlit_logo_path, caption=st.__version__, width=40)
         with h2:
             st.write("")
-            # AI Chatbot feature.
-            bot.main()
+            # AI Chatbot feature (needs a live session for Cortex).
+            if not st.session_state.get('offline_mode'):
+                bot.main()
     st.markdown("---")
 
     # Display object details or a prompt to select a database.
@@ -723,30 +1008,34 @@ def render_main_area():
 # The main function that runs the Streamlit application.
 def main():
     
-    setup_page()
-    
-    # Initialize session state if not already done.
-    initialize_session()
-    
-    # Main application logic for logged-in users.
-    if st.session_state['logged_in']:
-        init_session_state()
-        
-        # Synchronize checkbox states if a database is selected.
-        if st.session_state.db_selected and st.session_state.db_selected != "— Select a database —":
-            db_key = f"DB|{st.session_state.db_selected}"
-            sync_checkbox_state(db_key)
+    # Time every phase of this rerun (and profile it, if requested from the Performance dialog).
+    perf.start_run()
+    profiler = perf.start_profile()
+    try:
+        setup_page()
         
-        # Render the main UI components.
-        render_sidebar()
-        render_main_area()
+        # Initialize session state if not already done.
+        with perf.span("initialize_session"):
+            initialize_session()
         
-    else:
-        # Show login form for external sessions.
-        if not st.session_state['is_snowflake']:
-            login_ui.show_login_form()
+        # Main application logic for logged-in users.
+        if st.session_state['logged_in'] or st.session_state.get('offline_mode'):
+            init_session_state()
+            
+            # Render the main UI components.
+            render_sidebar()
+            render_main_area()
+            
         else:
-            st.error("Unexpected state: Running in Snowflake but not logged in.")
+            # Show login form for external sessions.
+            if not st.session_state['is_snowflake']:
+                login_ui.show_login_form()
+                render_offline_login_entry()
+            else:
+                st.error("Unexpected state: Running in Snowflake but not logged in.")
+    finally:
+        perf.stop_profile(profiler)
+        perf.finish_run()
 
 # Entry point of the script.
 if __name__ == "__main__":
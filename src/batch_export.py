@@ -0,0 +1,184 @@
+# Headless batch exporter: extracts many databases without the Streamlit UI.
+# For every database it writes <out>/<DB>.sql (the objects in dependency order, as the app's download) and
+# <out>/<DB>.objects.json (type, name and dependencies of each object), plus <out>/index.json with per-database timings.
+# With --bundle, <out>/<DB>.zip also holds one file per object and a manifest (see utils.export_bundle).
+# GET_DDL runs as async queries on one session, fetched by --jobs worker threads; each database is parsed
+# as soon as its DDL arrives, while the others are still being extracted.
+#
+# Run from the repository root:
+#   python src/batch_export.py --connection nightly --pattern 'SALES_*' --pattern 'HR' --out exports/
+# Without --connection, the session is configured from SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER, SNOWFLAKE_PASSWORD or
+# SNOWFLAKE_PRIVATE_KEY_FILE (or SNOWFLAKE_AUTHENTICATOR), SNOWFLAKE_ROLE and SNOWFLAKE_WAREHOUSE.
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import utils.pipeline as pipeline
+import utils.export_bundle as export_bundle
+import utils.ddl_spool as ddl_spool
+import utils.snapshot_store as snapshot_store
+import utils.metadata_cache as metadata_cache
+from utils.snowflake_queries import DATABASES_QUERY, database_ddl_queries, databases_from_rows, spool_ddl_rows, stages_from_rows
+
+DEFAULT_JOBS = 4
+POLL_SECONDS = 0.2
+
+def create_session(connection: Optional[str]):
+    # A Snowpark session from a named connection (connections.toml) or from SNOWFLAKE_* environment variables.
+    from snowflake.snowpark import Session
+    if connection:
+        return Session.builder.config("connection_name", connection).create()
+    env = os.environ
+    params = {k: env[f"SNOWFLAKE_{k.upper()}"] for k in ("account", "user", "role", "warehouse", "password", "authenticator")
+              if env.get(f"SNOWFLAKE_{k.upper()}")}
+    key_file = env.get("SNOWFLAKE_PRIVATE_KEY_FILE")
+    if key_file:
+        from cryptography.hazmat.primitives import serialization as crypto_serialization
+        from cryptography.hazmat.backends import default_backend as crypto_default_backend
+        with open(key_file, "rb") as f:
+            passphrase = env.get("SNOWFLAKE_PRIVATE_KEY_PASSPHRASE")
+            params["private_key"] = crypto_serialization.load_pem_private_key(
+                f.read(), password=passphrase.encode() if passphrase else None, backend=crypto_default_backend()
+            ).private_bytes(
+                encoding=crypto_serialization.Encoding.DER,
+                format=crypto_serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=crypto_serialization.NoEncryption(),
+            )
+    return Session.builder.configs(params).create()
+
+def select_databases(session, names: List[str], patterns: List[str]) -> List[str]:
+    # Explicit names are kept as given; glob patterns are matched case-insensitively against SHOW DATABASES.
+    selected = list(dict.fromkeys(names))
+    if patterns:
+        for db in databases_from_rows(session.sql(DATABASES_QUERY).collect()):
+            if db not in selected and any(fnmatch.fnmatchcase(db.upper(), p.upper()) for p in patterns):
+                selected.append(db)
+    return selected
+
+def safe_file_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+def export_database(db: str, ddl_text: ddl_spool.SpooledText, stage_ddls: str, out_dir: str, include_schema_ddl: bool,
+                    use_cache: bool, bundle: bool = False) -> Dict[str, object]:
+    # Parses, orders and writes one database; returns its entry for index.json.
+    t0 = time.perf_counter()
+    sorted_objects, deps, cycles = pipeline.parse_and_order(ddl_text, stage_ddls, db, use_cache=use_cache)
+    objects = [o for o in sorted_objects if o.object_type not in ["DATABASE", "SCHEMA"]]
+    t1 = time.perf_counter()
+
+    base = safe_file_name(db)
+    script = pipeline.build_script(objects, include_schema_ddl) if objects else ""
+    with open(os.path.join(out_dir, f"{base}.sql"), "w", encoding="utf-8") as f:
+        f.write(script)
+    index = [
+        {"index": i, "type": o.object_type, "schema": o.schema, "name": o.object_name, "fqn": o.canon_fqn,
+         "depends_on": sorted(deps.get(o.canon_fqn, ()))}
+        for i, o in enumerate(objects)
+    ]
+    with open(os.path.join(out_dir, f"{base}.objects.json"), "w", encoding="utf-8") as f:
+        json.dump({"database": db, "cycles": cycles, "objects": index}, f, indent=1)
+    if bundle:
+        with open(os.path.join(out_dir, f"{base}.zip"), "wb") as f:
+            f.write(export_bundle.build_bundle(objects, deps, cycles, db))
+    t2 = time.perf_counter()
+    return {
+        "database": db, "sql": f"{base}.sql", "objects_json": f"{base}.objects.json", "bundle": f"{base}.zip" if bundle else None,
+        "objects": len(objects),
+        "cycles": len(cycles), "ddl_chars": len(ddl_text) + len(stage_ddls),
+        "seconds": {"parse": round(t1 - t0, 3), "write": round(t2 - t1, 3)},
+    }
+
+def fetch_database(session, db: str):
+    # Runs in a worker: submits both queries of one database, waits for them and spools the DDL. The fetch time is
+    # taken here, when the last row has arrived, so it does not include the wait for the main thread to get to it.
+    started = time.perf_counter()
+    jobs = [session.sql(q).collect_nowait() for q in database_ddl_queries(db)]
+    while not all(j.is_done() for j in jobs):
+        time.sleep(POLL_SECONDS)
+    # The DDL is streamed to a spool file, so only the parsed objects of one database are ever held at once.
+    ddl_text = spool_ddl_rows(jobs[0].result("row_iterator"))
+    try:
+        stage_ddls = stages_from_rows(jobs[1].result())
+    except Exception:
+        ddl_text.close()
+        raise
+    return ddl_text, stage_ddls, time.perf_counter() - started
+
+def run(session, databases: List[str], args) -> List[Dict[str, object]]:
+    # Keeps up to args.jobs databases extracting at once and exports each one, in the main thread, as soon as its
+    # fetch is done; the workers meanwhile fetch the next databases.
+    scope = metadata_cache.session_scope(session) if args.save_snapshots else None
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix="batch-fetch") as pool:
+        futures = {pool.submit(fetch_database, session, db): db for db in databases}
+        for future in as_completed(futures):
+            db = futures[future]
+            try:
+                ddl_text, stage_ddls, fetch_seconds = future.result()
+            except Exception as e:
+                results.append({"database": db, "error": str(e)})
+                print(f"{db:<40} FAILED to fetch: {e}", flush=True)
+                continue
+            try:
+                if args.save_snapshots:
+                    snapshot_store.save_version(scope, db, ddl_text, stage_ddls)
+                entry = export_database(db, ddl_text, stage_ddls, args.out, args.include_schema_ddl, args.cache, args.bundle)
+                entry["seconds"] = {"fetch": round(fetch_seconds, 3), **entry["seconds"]}
+                t = entry["seconds"]
+                print(f"{db:<40} fetch {t['fetch']:8.2f}s  parse {t['parse']:7.2f}s  write {t['write']:6.2f}s  "
+                      f"{entry['objects']:>7} objects", flush=True)
+            except Exception as e:
+                entry = {"database": db, "error": str(e)}
+                print(f"{db:<40} FAILED: {e}", flush=True)
+            finally:
+                ddl_text.close()
+            results.append(entry)
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export the ordered DDL of many Snowflake databases without the UI.")
+    parser.add_argument("databases", nargs="*", help="Database names to export.")
+    parser.add_argument("--pattern", action="append", default=[], help="Glob matched against SHOW DATABASES (repeatable).")
+    parser.add_argument("--out", default="exports", help="Output directory (default: exports).")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help=f"Databases extracted at once (default: {DEFAULT_JOBS}).")
+    parser.add_argument("--connection", help="Connection name from connections.toml (default: SNOWFLAKE_* variables).")
+    parser.add_argument("--include-schema-ddl", action="store_true", help="Prepend CREATE SCHEMA IF NOT EXISTS statements.")
+    parser.add_argument("--cache", action="store_true", help="Use the on-disk parse cache (helps when DDL rarely changes).")
+    parser.add_argument("--bundle", action="store_true", help="Also write <DB>.zip with one file per object and a manifest.")
+    parser.add_argument("--save-snapshots", action="store_true", help="Also save each extraction to the local snapshot store.")
+    args = parser.parse_args()
+    if not args.databases and not args.pattern:
+        parser.error("give database names and/or --pattern")
+    args.jobs = max(1, args.jobs)
+    os.makedirs(args.out, exist_ok=True)
+
+    started = time.perf_counter()
+    session = create_session(args.connection)
+    try:
+        databases = select_databases(session, args.databases, args.pattern)
+        print(f"Exporting {len(databases)} database(s) to {args.out} with {args.jobs} in flight", flush=True)
+        results = run(session, databases, args)
+    finally:
+        session.close()
+
+    failed = [r["database"] for r in results if "error" in r]
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "databases": sorted(results, key=lambda r: databases.index(r["database"])),
+        "failed": failed,
+    }
+    with open(os.path.join(args.out, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Done in {report['total_seconds']:.1f}s: {len(results) - len(failed)} exported, {len(failed)} failed", flush=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
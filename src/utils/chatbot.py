@@ -79,7 +79,7 @@ def get_relevant_session_context():
             for t in st.session_state['grouped_objects'][s].keys():
                 grp += f"""{t}(s) in {s} schema - """
                 for o in st.session_state['grouped_objects'][s][t]:
-                    grp += f"""{o['object_name']}, """
+                    grp += f"""{o.object_name}, """
                 grp += """.
                 """
             grp += """
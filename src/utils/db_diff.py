@@ -0,0 +1,74 @@
+# Cross-environment comparison of two parsed databases or snapshots (e.g. DEV against PROD) by DDL fingerprint.
+# Objects are matched by type, schema and name, and compared only through sql_parser.object_fingerprint, which
+# ignores comments, layout and references to the object's own database; DDL text is only read to show the diff of
+# an object whose fingerprint differs, or to script the changed objects (pipeline.build_script over changed_objects).
+
+import difflib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import utils.sql_parser as sql_parser
+from utils.sql_parser import ObjectRecord
+
+# (type, schema, name), case-insensitive: the same object in both databases, whatever the database is called.
+ObjectIdentity = Tuple[str, str, str]
+
+def object_identity(o: ObjectRecord) -> ObjectIdentity:
+    return o.object_type, (o.schema or "").upper(), o.object_name.upper()
+
+def fingerprint_objects(objects: List[ObjectRecord]) -> None:
+    # Computes the fingerprints not computed yet, so that diff_databases only compares digests.
+    for o in objects:
+        sql_parser.object_fingerprint(o)
+
+def diff_databases(base: List[ObjectRecord], other: List[ObjectRecord]) -> Dict[str, object]:
+    # Compares other against base. Returns a dict with:
+    #   added: objects only in other, removed: objects only in base, changed: (base, other) pairs whose fingerprints
+    #   differ, each in its database's (dependency) order, and unchanged: the number of matching objects.
+    # Same-named objects (function and procedure overloads) are paired by fingerprint first, then in order.
+    by_identity: Dict[ObjectIdentity, List[ObjectRecord]] = defaultdict(list)
+    for o in base:
+        by_identity[object_identity(o)].append(o)
+    added: List[ObjectRecord] = []
+    changed: List[Tuple[ObjectRecord, ObjectRecord]] = []
+    matched = set()  # ids of the base records paired with an object of other
+    unchanged = 0
+    unpaired: List[Tuple[ObjectRecord, List[ObjectRecord]]] = []
+    for o in other:
+        candidates = by_identity.get(object_identity(o))
+        if not candidates:
+            added.append(o)
+            continue
+        fingerprint = sql_parser.object_fingerprint(o)
+        same = next((b for b in candidates if id(b) not in matched and sql_parser.object_fingerprint(b) == fingerprint), None)
+        if same is not None:
+            matched.add(id(same))
+            unchanged += 1
+        else:
+            unpaired.append((o, candidates))
+    for o, candidates in unpaired:
+        old = next((b for b in candidates if id(b) not in matched), None)
+        if old is None:
+            added.append(o)
+        else:
+            matched.add(id(old))
+            changed.append((old, o))
+    if unpaired:
+        position = {id(o): i for i, o in enumerate(other)}
+        added.sort(key=lambda o: position[id(o)])
+        changed.sort(key=lambda pair: position[id(pair[1])])
+    removed = [b for b in base if id(b) not in matched]
+    return {"added": added, "removed": removed, "changed": changed, "unchanged": unchanged}
+
+def ddl_text_diff(old: ObjectRecord, new: ObjectRecord, context: int = 3) -> str:
+    # Unified diff of two versions of an object, labelled with their databases.
+    return "\n".join(difflib.unified_diff(
+        (old.ddl + ";").splitlines(), (new.ddl + ";").splitlines(),
+        fromfile=f"{old.database}.{old.fully_qualified_name}", tofile=f"{new.database}.{new.fully_qualified_name}",
+        n=context, lineterm="",
+    ))
+
+def changed_objects(diff: Dict[str, object], other: List[ObjectRecord]) -> List[ObjectRecord]:
+    # The added and changed objects of other (the compared database, as passed to diff_databases), in its order.
+    keep = {id(o) for o in diff["added"]} | {id(new) for _, new in diff["changed"]}
+    return [o for o in other if id(o) in keep]
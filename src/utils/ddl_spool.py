@@ -0,0 +1,69 @@
+# Disk-backed DDL text for very large databases.
+# GET_DDL output is fetched as a series of slices, written to a temporary file as the rows stream in, and read back
+# through a memory map in bounded chunks by the streaming parser (sql_parser.iter_sql_statements). The process then
+# never holds the whole text as one Python string, nor the copies that str(...), caching or pickling it would add.
+
+import os
+import mmap
+import codecs
+import tempfile
+import weakref
+from typing import Iterable, Iterator, Optional, Union
+
+SPOOL_DIR = os.environ.get("SNOWDL_SPOOL_DIR") or None  # None: the system temporary directory
+READ_BYTES = 1 << 20    # Bytes decoded at a time when reading a spool back
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class SpooledText:
+    # Text held in a file: len() is its length in characters and chunks() yields it back as str pieces of at most
+    # READ_BYTES bytes each. The file is removed by close(), or once the object is garbage collected.
+
+    def __init__(self, path: str, chars: int, size: int):
+        self.path, self.chars, self.size = path, chars, size
+        self.finalizer = weakref.finalize(self, remove_file, path)
+
+    def __len__(self) -> int:
+        return self.chars
+
+    def __repr__(self) -> str:
+        return f"SpooledText({self.path}, chars={self.chars}, bytes={self.size})"
+
+    def chunks(self) -> Iterator[str]:
+        if not self.size: return
+        decoder = codecs.getincrementaldecoder("utf-8")("surrogatepass")  # A chunk may end inside a character
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(0, self.size, READ_BYTES):
+                chunk = decoder.decode(mm[i:i + READ_BYTES], i + READ_BYTES >= self.size)
+                if chunk: yield chunk
+
+    def text(self) -> str:
+        # The whole text as one string, for callers that cannot stream it.
+        return "".join(self.chunks())
+
+    def close(self) -> None:
+        self.finalizer()
+
+def spool_chunks(chunks: Iterable[str], directory: Optional[str] = None) -> SpooledText:
+    # Writes the chunks to a new temporary file as they arrive, keeping none of them.
+    fd, path = tempfile.mkstemp(prefix="snowdl_ddl_", suffix=".sql", dir=directory or SPOOL_DIR)
+    chars = size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                data = chunk.encode("utf-8", "surrogatepass")
+                f.write(data)
+                chars, size = chars + len(chunk), size + len(data)
+    except BaseException:
+        remove_file(path)
+        raise
+    return SpooledText(path, chars, size)
+
+def text_chunks(text: Union[str, SpooledText, None]) -> Iterable[str]:
+    # Streams a spooled text, or returns a plain string as its only chunk.
+    if isinstance(text, SpooledText): return text.chunks()
+    return (text or "",)
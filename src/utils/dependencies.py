@@ -2,13 +2,76 @@
 
 import re
 from collections import defaultdict, deque
-from typing import List, Dict, Set, Optional, Tuple
+from functools import lru_cache
+from typing import List, Dict, Set, Optional, Sequence, Tuple
 
+import utils.reachability as reachability
+from utils.sql_parser import ObjectRecord, scan_token_end
 
-def order_objects_by_dependencies(objects: List[Dict]) -> Tuple[List[Dict], Dict[str, Set[str]]]:
-    # Topologically sorts a list of Snowflake objects and returns the dependency graph.
-    # This function implements Kahn's algorithm for topological sorting.
+# One identifier part, quoted ("My ""Obj""") or unquoted (MY_OBJ$1).
+NAME_PART = r'"(?:[^"]|"")+"|[A-Za-z_][A-Za-z0-9_$]*'
+NAME_PART_REGEX = re.compile(NAME_PART)
+
+# One token of a DDL for the dependency scanner. Comments, string literals, quoted identifiers, plain identifiers
+# and numbers are each consumed whole, so a name is never read from inside a literal, a comment or a longer token;
+# only a dotted run of 2-4 identifier parts is captured, as a candidate reference.
+DEPENDENCY_TOKEN_REGEX = re.compile(rf"""
+    --[^\n]*
+    |/\*[^*]*\*+(?:[^/*][^*]*\*+)*/
+    |'[^'\\]*(?:(?:''|\\.)[^'\\]*)*'
+    |((?:{NAME_PART})(?:\s*\.\s*(?:{NAME_PART})){{1,3}})
+    |"[^"]*(?:""[^"]*)*"
+    |[A-Za-z_][A-Za-z0-9_$]*
+    |[0-9][\w$]*
+    """, re.VERBOSE | re.DOTALL)
+
+# Opening tag of a dollar-quoted routine body ('$' inside an identifier such as T$$ is not one).
+DOLLAR_QUOTE_REGEX = re.compile(r"(?<![\w$])\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+
+# Routines whose body is not SQL; names inside such a body cannot be creation-time dependencies.
+FOREIGN_LANGUAGE_REGEX = re.compile(r"\bLANGUAGE\s+(?:JAVASCRIPT|PYTHON|JAVA|SCALA)\b", re.IGNORECASE)
+
+# Object types emitted first when several objects are ready at once; types not listed come after them.
+DEFAULT_TYPE_PRIORITY = ("DATABASE", "SCHEMA", "SEQUENCE", "FILE FORMAT", "TABLE", "DYNAMIC TABLE", "VIEW", "MATERIALIZED VIEW")
+
+# One qualified identifier found in a DDL: its 2-4 parts, unquoted and upper-cased.
+Reference = Tuple[str, ...]
+
+
+@lru_cache(maxsize=65536)
+def reference_parts(chain: str) -> Reference:
+    # Splits a dotted identifier run into normalised parts. The same names recur across thousands of DDLs, so this is cached.
+    return tuple(
+        p[1:-1].replace('""', '"').upper() if p[0] == '"' else p.upper()
+        for p in NAME_PART_REGEX.findall(chain)
+    )
+
+
+def find_qualified_references(ddl: str, start: int = 0, end: Optional[int] = None) -> List[Reference]:
+    # Tokenizes ddl[start:end] once and returns the qualified identifiers outside literals and comments.
+    # A dollar-quoted body is read as SQL unless the routine declares a JavaScript/Python/Java/Scala LANGUAGE.
+    # Depends on nothing but the DDL text, so it can run ahead of (or apart from) order_objects_by_dependencies.
+    end = len(ddl) if end is None else end
+    spans = [(start, end)]
+    dollar = ddl.find("$", start, end)
+    body = DOLLAR_QUOTE_REGEX.search(ddl, dollar, end) if dollar >= 0 else None
+    if body and FOREIGN_LANGUAGE_REGEX.search(ddl, start, body.start()):
+        close = scan_token_end(ddl, body.end(), body.group())[0]
+        spans = [(start, body.start())] + ([(close, end)] if 0 <= close <= end else [])
+    findall = DEPENDENCY_TOKEN_REGEX.findall
+    return [reference_parts(chain) for a, b in spans for chain in findall(ddl, a, b) if chain]
+
+
+def order_objects_by_dependencies(objects: List[ObjectRecord], references: Optional[List[List[Reference]]] = None,
+                                  type_priority: Sequence[str] = DEFAULT_TYPE_PRIORITY) -> Tuple[List[ObjectRecord], Dict[str, Set[str]], List[List[str]]]:
+    # Topologically sorts a list of Snowflake objects and returns (sorted objects, dependency graph, cycles).
+    # Cycles are found with Tarjan's algorithm and reported as lists of canonical names; the condensed graph is then
+    # ordered with Kahn's algorithm, preferring object types earlier in type_priority whenever several are ready.
+    # The order is deterministic: the same DDL always yields the same script.
+    # references optionally holds the precomputed find_qualified_references() of each object, in the same order.
     
+    # Both helpers are memoised: database and schema names repeat across every object of the database.
+    @lru_cache(maxsize=None)
     def u(x: Optional[str]) -> Optional[str]:
         # Helper to normalize an identifier to uppercase and remove quotes.
         if x is None: return None
@@ -17,6 +80,7 @@ def order_objects_by_dependencies(objects: List[Dict]) -> Tuple[List[Dict], Dict
             x = x[1:-1].replace('""', '"')
         return x.upper()
 
+    @lru_cache(maxsize=None)
     def canon_fqn(db: Optional[str], sch: Optional[str], obj: Optional[str]) -> Optional[str]:
         # Creates a canonical, fully-qualified name string.
         db_u, sch_u, obj_u = u(db), u(sch), u(obj)
@@ -24,102 +88,117 @@ def order_objects_by_dependencies(objects: List[Dict]) -> Tuple[List[Dict], Dict
         if sch_u and obj_u: return f"{sch_u}.{obj_u}"
         return obj_u
     
-    # Regex to find qualified identifiers like DB.SCHEMA.OBJ or SCHEMA.OBJ
-    # It correctly handles quoted parts.
-    ID = r'(?:\"[^\"]+\"|[A-Za-z_][A-Za-z0-9_\$]*)'
-    QUAL_ID_REGEX = re.compile(rf'(?<!\w)({ID})\s*\.\s*({ID})(?:\s*\.\s*({ID}))?(?:\s*\.\s*({ID}))?(?!\w)')
-    
     # --- 1. Pre-process and Index all objects ---
-    objs = []
+    # Normalised name parts are kept alongside each record rather than copied into it.
+    objs: List[Tuple[ObjectRecord, Optional[str], Optional[str], Optional[str]]] = []  # (record, _DB, _SC, _OBJ)
     for o in objects:
-        db = o.get("database") or None
-        sch = o.get("schema") or None
-        obj = o.get("object_name") or None
-        ddl = o.get("ddl") or ""
-        fqn = canon_fqn(db, sch, obj)
-        objs.append({**o, "_CANON_FQN": fqn, "_DB": u(db), "_SC": u(sch), "_OBJ": u(obj), "_DDL_UPPER": ddl.upper()})
-
-    by_fqn = {o["_CANON_FQN"]: o for o in objs if o["_CANON_FQN"]}
-    by_schema_obj: Dict[str, List[Dict]] = defaultdict(list)
-    for o in objs:
-        if o["_SC"] and o["_OBJ"]:
-            by_schema_obj[f"{o['_SC']}.{o['_OBJ']}"].append(o)
-    
+        db, sch, obj = o.database or None, o.schema or None, o.object_name or None
+        o.canon_fqn = canon_fqn(db, sch, obj)
+        objs.append((o, u(db), u(sch), u(obj)))
+
+    # Hash indexes keyed by normalised name parts, so a reference resolves with one lookup and no string building.
+    by_fqn = {o.canon_fqn: o for o, _, _, _ in objs if o.canon_fqn}
+    db_of = {o.canon_fqn: db for o, db, _, _ in objs if o.canon_fqn}
+    by_parts: Dict[Tuple[str, str, str], str] = {}
+    by_schema_obj: Dict[Tuple[str, str], List[ObjectRecord]] = defaultdict(list)
+    for o, db, sc, ob in objs:
+        if sc and ob:
+            by_schema_obj[(sc, ob)].append(o)
+            if db and o.canon_fqn: by_parts[(db, sc, ob)] = o.canon_fqn
+
+    def resolve(parts: Reference, o_db: Optional[str]) -> Optional[str]:
+        # Maps one reference to the canonical name of a known object, or None.
+        if len(parts) >= 3 and parts[2] != "NEXTVAL":  # DB.SCHEMA.OBJECT (also DB.SCHEMA.SEQ.NEXTVAL)
+            return by_parts.get(parts[:3])
+        cands = by_schema_obj.get(parts[:2])  # SCHEMA.OBJECT (also SCHEMA.SEQ.NEXTVAL)
+        if not cands: return None
+        if len(cands) == 1: return cands[0].canon_fqn
+        if o_db is None: return None
+        same_db = [c for c in cands if db_of[c.canon_fqn] == o_db]
+        return same_db[0].canon_fqn if len(same_db) == 1 else None
+
     # --- 2. Build Dependency Graph ---
     deps: Dict[str, Set[str]] = defaultdict(set)  # node -> {dependencies}
-    outs: Dict[str, Set[str]] = defaultdict(set)  # node -> {dependents}
-    nodes: Set[str] = {o["_CANON_FQN"] for o in objs if o["_CANON_FQN"]}
 
-    for o in objs:
-        cur_fqn = o["_CANON_FQN"]
+    for i, (o, o_db, o_sc, _) in enumerate(objs):
+        cur_fqn = o.canon_fqn
         if not cur_fqn: continue
         
         o_deps: Set[str] = set()
 
-        # A. Find explicit dependencies via regex on DDL
-        for m in QUAL_ID_REGEX.finditer(o["_DDL_UPPER"]):
-            p1, p2, p3, p4 = m.groups()
-            target_fqn = None
-            if p4 and p4.upper() == "NEXTVAL":  # 4-part reference: DB.SCHEMA.OBJECT.NEXTVAL
-                cand_fqn = canon_fqn(p1, p2, p3)
-                if cand_fqn in by_fqn:
-                    target_fqn = cand_fqn
-            if p3 and p3.upper() != "NEXTVAL":  # 3-part reference: DB.SCHEMA.OBJECT
-                cand_fqn = canon_fqn(p1, p2, p3)
-                if cand_fqn in by_fqn:
-                    target_fqn = cand_fqn
-            else:  # 2-part reference: SCHEMA.OBJECT
-                key = f"{u(p1)}.{u(p2)}"
-                cands = by_schema_obj.get(key, [])
-                if len(cands) == 1:
-                    target_fqn = cands[0]["_CANON_FQN"]
-                elif len(cands) > 1:
-                    same_db = [c for c in cands if c["_DB"] == o["_DB"] and c["_DB"] is not None]
-                    if len(same_db) == 1:
-                        target_fqn = same_db[0]["_CANON_FQN"]
-
+        # A. Find explicit dependencies from the identifier tokens of the DDL
+        refs = references[i] if references is not None else find_qualified_references(o.source, o.start, o.end)
+        for parts in set(refs):
+            target_fqn = resolve(parts, o_db)
             if target_fqn and target_fqn != cur_fqn:
                 o_deps.add(target_fqn)
         
         # B. Add implicit dependencies (e.g., table depends on its schema)
-        if o["object_type"] not in ["DATABASE", "SCHEMA"] and o["_SC"]:
-            schema_fqn = canon_fqn(o["_DB"], o["_SC"], o["_SC"])
-            if schema_fqn and schema_fqn in by_fqn and by_fqn[schema_fqn]['object_type'] == 'SCHEMA':
+        if o.object_type not in ["DATABASE", "SCHEMA"] and o_sc:
+            schema_fqn = canon_fqn(o_db, o_sc, o_sc)
+            if schema_fqn and schema_fqn in by_fqn and by_fqn[schema_fqn].object_type == 'SCHEMA':
                 o_deps.add(schema_fqn)
         
-        if o["object_type"] != "DATABASE" and o["_DB"]:
-            db_fqn = canon_fqn(None, None, o["_DB"])
-            if db_fqn and db_fqn in by_fqn and by_fqn[db_fqn]['object_type'] == 'DATABASE':
+        if o.object_type != "DATABASE" and o_db:
+            db_fqn = canon_fqn(None, None, o_db)
+            if db_fqn and db_fqn in by_fqn and by_fqn[db_fqn].object_type == 'DATABASE':
                 o_deps.add(db_fqn)
 
         deps[cur_fqn].update(o_deps)
-        for d in o_deps:
-            if d:
-                outs[d].add(cur_fqn)
-
-    # --- C. Kahn's Algorithm for Topological Sort ---
-    in_degree = {n: len(deps.get(n, set())) for n in nodes}
-    queue: deque[str] = deque([n for n, d in in_degree.items() if d == 0])
-    ordered = []
-
-    while queue:
-        n = queue.popleft()
-        if n in by_fqn:
-            ordered.append(by_fqn[n])
-        for m in outs.get(n, set()):
-            in_degree[m] -= 1
-            if in_degree[m] == 0:
-                queue.append(m)
-    
-    # --- 4. Finalize and Return ---
-    # Handle cycles by appending any remaining objects
-    seen_fqns = {o["_CANON_FQN"] for o in ordered}
-    remaining = [o for o in objs if o["_CANON_FQN"] and o["_CANON_FQN"] not in seen_fqns]
-    result = ordered + remaining
 
+    # --- 3. Tarjan SCCs, then a priority-bucketed Kahn pass over the condensed graph ---
+    # Nodes are numbered in statement order and every tie is broken by that order, so the output does not depend on
+    # set iteration (hash) order. Each bucket is a FIFO per priority level, which keeps the pass O(V+E).
+    rank = {t: i for i, t in enumerate(type_priority)}
+    names = list(by_fqn)
+    node_id = {n: i for i, n in enumerate(names)}
+    node_rank = [rank.get(by_fqn[n].object_type, len(rank)) for n in names]
+    edges = [(node_id[a], node_id[b]) for a in names for b in deps.get(a, ())]
+    offsets, targets = reachability.build_csr(len(names), edges)
+    comp_of, n_comps = reachability.strongly_connected_components(len(names), offsets, targets)
+
+    members: List[List[int]] = [[] for _ in range(n_comps)]
+    for v in range(len(names)):
+        members[comp_of[v]].append(v)
+    comp_rank = [node_rank[m[0]] if len(m) == 1 else min(node_rank[v] for v in m) for m in members]
+    pending = [0] * n_comps                                   # unresolved dependency components
+    dependents: List[List[int]] = [[] for _ in range(n_comps)]
+    comp_edges: Set[Tuple[int, int]] = set()
+    for a, b in edges:
+        ca, cb = comp_of[a], comp_of[b]
+        if ca != cb and (ca, cb) not in comp_edges:
+            comp_edges.add((ca, cb))
+            pending[ca] += 1
+            dependents[cb].append(ca)
+
+    buckets: List[deque[int]] = [deque() for _ in range(len(rank) + 1)]
+    queued = bytearray(n_comps)
+    for v in range(len(names)):
+        c = comp_of[v]
+        if not pending[c] and not queued[c]:
+            queued[c] = 1
+            buckets[comp_rank[c]].append(c)
+
+    ordered: List[ObjectRecord] = []
+    cycles: List[List[str]] = []
+    while True:
+        bucket = next((b for b in buckets if b), None)
+        if bucket is None: break
+        c = bucket.popleft()
+        group = members[c]
+        if len(group) > 1:  # Objects in a cycle are emitted together, where the cycle as a whole fits
+            group.sort(key=lambda v: (node_rank[v], v))
+            cycles.append([names[v] for v in group])
+        for v in group:
+            ordered.append(by_fqn[names[v]])
+        for d in dependents[c]:
+            pending[d] -= 1
+            if not pending[d]:
+                buckets[comp_rank[d]].append(d)
+
+    # --- 4. Finalize and Return ---
     # Re-index before returning
-    for i, o in enumerate(result):
-        o["index"] = i
+    for i, o in enumerate(ordered):
+        o.index = i
         
-    return result, deps
-
+    return ordered, deps, cycles
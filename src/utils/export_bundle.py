@@ -0,0 +1,125 @@
+# Per-object export bundle: one file per object in a schema/type/name.sql layout plus manifest.json, packed into a zip.
+# The manifest lists the objects in dependency (deploy) order with each file's path, SHA-256 and deploy wave: objects of
+# one wave only depend on objects of earlier waves (the members of a dependency cycle share a wave), so a wave can be
+# deployed in parallel. Files are deflated across a thread pool (zlib releases the GIL) and written with a minimal
+# zip writer, as zipfile cannot add already-compressed data.
+
+import os
+import re
+import json
+import time
+import zlib
+import struct
+import hashlib
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from utils.sql_parser import ObjectRecord
+
+COMPRESS_LEVEL = 6
+COMPRESS_WORKERS = min(8, os.cpu_count() or 1)
+MANIFEST_NAME = "manifest.json"
+UNSAFE_PATH_CHARS = re.compile(r'[^\w.$ -]+')
+
+def path_part(name: str) -> str:
+    # A file or directory name for an identifier: quotes dropped, anything unsafe on common file systems replaced.
+    part = UNSAFE_PATH_CHARS.sub("_", name.strip().strip('"')).strip(" .")
+    return part or "_"
+
+def object_paths(objects: Sequence[ObjectRecord]) -> List[str]:
+    # schema/type/name.sql per object; names that collide (overloads, names equal but for case) get a ~2, ~3... suffix.
+    paths: List[str] = []
+    used: Set[str] = set()
+    for o in objects:
+        base = f"{path_part(o.schema or '_')}/{path_part((o.object_type or 'object').lower().replace(' ', '_'))}/{path_part(o.object_name)}"
+        path, n = f"{base}.sql", 1
+        while path.lower() in used:
+            n += 1
+            path = f"{base}~{n}.sql"
+        used.add(path.lower())
+        paths.append(path)
+    return paths
+
+def deploy_waves(objects: Sequence[ObjectRecord], deps: Dict[str, Set[str]], cycles: List[List[str]]) -> List[int]:
+    # Wave of each object (objects in dependency order): 1 + the highest wave among the bundled objects it depends on.
+    # The members of a cycle get the same wave, from the dependencies of the cycle as a whole.
+    cycle_of = {fqn: i for i, cycle in enumerate(cycles) for fqn in cycle}
+    wave: Dict[str, int] = {}
+    bundled = {o.canon_fqn for o in objects}
+    for o in objects:
+        fqn = o.canon_fqn
+        if fqn in wave: continue
+        group = [m for m in cycles[cycle_of[fqn]] if m in bundled] if fqn in cycle_of else [fqn]
+        members = set(group)
+        w = 1 + max((wave.get(d, 0) for m in group for d in deps.get(m, ()) if d not in members), default=0)
+        for m in group:
+            wave[m] = w
+    return [wave[o.canon_fqn] for o in objects]
+
+def dos_datetime(timestamp: float) -> Tuple[int, int]:
+    t = time.localtime(timestamp)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def deflate(data: bytes) -> Tuple[bytes, int]:
+    # Raw deflate stream and CRC-32 of one file (both release the GIL, so files compress in parallel).
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data)
+
+def write_zip(files: List[Tuple[str, bytes]], workers: int = COMPRESS_WORKERS) -> bytes:
+    # Zip archive of (path, content) pairs, deflated across a thread pool. ZIP64 end records are added for more than
+    # 65535 files; archives are limited to 4 GB.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        compressed = list(pool.map(deflate, (data for _, data in files)))
+    time_, date_ = dos_datetime(time.time())
+    out: List[bytes] = []
+    central: List[bytes] = []
+    offset = 0
+    for (path, data), (packed, crc) in zip(files, compressed):
+        name = path.encode("utf-8")
+        if offset > 0xFFFFFFFF or len(data) > 0xFFFFFFFF:
+            raise ValueError("Export bundle exceeds 4 GB")
+        # Flag 0x0800: UTF-8 file names; made by 0x0314: Unix, so the 0644 file mode is kept
+        header = struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, 0x0800, 8, time_, date_, crc, len(packed), len(data), len(name), 0)
+        central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 0x0314, 20, 0x0800, 8, time_, date_, crc,
+                                   len(packed), len(data), len(name), 0, 0, 0, 0, 0o100644 << 16, offset) + name)
+        out += (header, name, packed)
+        offset += len(header) + len(name) + len(packed)
+    cd = b"".join(central)
+    count = len(files)
+    if count > 0xFFFF:
+        out.append(cd)
+        out.append(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, len(cd), offset))
+        out.append(struct.pack("<IIQI", 0x07064B50, 0, offset + len(cd), 1))
+        out.append(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, 0xFFFF, 0xFFFF, len(cd), offset, 0))
+    else:
+        out.append(cd)
+        out.append(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, len(cd), offset, 0))
+    return b"".join(out)
+
+def build_bundle(objects: Sequence[ObjectRecord], deps: Dict[str, Set[str]], cycles: List[List[str]],
+                 database: str, workers: int = COMPRESS_WORKERS, generated_at: Optional[str] = None) -> bytes:
+    # The zipped bundle of objects already in dependency order: their files plus manifest.json.
+    paths = object_paths(objects)
+    waves = deploy_waves(objects, deps, cycles)
+    bundled = {o.canon_fqn for o in objects}
+    files: List[Tuple[str, bytes]] = []
+    entries = []
+    for i, (o, path, wave) in enumerate(zip(objects, paths, waves)):
+        data = (o.ddl + ";\n").encode("utf-8")
+        files.append((path, data))
+        entries.append({
+            "order": i + 1, "path": path, "type": o.object_type, "schema": o.schema, "name": o.object_name,
+            "fqn": o.canon_fqn, "sha256": hashlib.sha256(data).hexdigest(), "wave": wave,
+            "depends_on": sorted(d for d in deps.get(o.canon_fqn, ()) if d in bundled),
+        })
+    manifest = {
+        "database": database,
+        "generated_at": generated_at or datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "objects": len(entries),
+        "waves": max(waves, default=0),
+        "cycles": [c for c in cycles if any(m in bundled for m in c)],
+        "deploy_order": entries,
+    }
+    files.append((MANIFEST_NAME, json.dumps(manifest, indent=1).encode("utf-8")))
+    return write_zip(files, workers)
@@ -2,7 +2,8 @@
 
 import streamlit as st
 from pyvis.network import Network
-from typing import Dict, Set, List, Any
+from typing import Dict, Set, List
+from utils.sql_parser import ObjectRecord
 import base64
 import os
 
@@ -76,7 +77,7 @@ def _generate_legend_html(schema_colors: Dict[str, str], object_color_map: Dict[
     '''
     return legend_html
 
-def create_dependency_graph_figure(objects: List[Dict[str, Any]], deps: Dict[str, Set[str]], selected_schemas: List[str]):
+def create_dependency_graph_figure(objects: List[ObjectRecord], deps: Dict[str, Set[str]], selected_schemas: List[str]):
     # Generates an interactive dependency graph using pyvis.
     net = Network(
         height="750px", 
@@ -98,9 +99,9 @@ def create_dependency_graph_figure(objects: List[Dict[str, Any]], deps: Dict[str
 
     # Filter objects based on selected schemas
     selected_nodes = {
-        obj["_CANON_FQN"]
+        obj.canon_fqn
         for obj in objects
-        if obj.get("schema") in selected_schemas and obj.get("_CANON_FQN")
+        if obj.schema in selected_schemas and obj.canon_fqn
     }
 
     # Define color and icon maps
@@ -122,6 +123,12 @@ def create_dependency_graph_figure(objects: List[Dict[str, Any]], deps: Dict[str
         "TASK": "#78909C",
         "MASKING POLICY": "#9E9E9E",
         "TAG": "#E91E63",
+        "ALERT": "#F44336",
+        "SECRET": "#795548",
+        "NETWORK RULE": "#5C6BC0",
+        "EVENT TABLE": "#26A69A",
+        "ICEBERG TABLE": "#81D4FA",
+        "HYBRID TABLE": "#7986CB",
     }
     
     object_icon_map = {
@@ -142,13 +149,19 @@ def create_dependency_graph_figure(objects: List[Dict[str, Any]], deps: Dict[str
         "TASK": get_icon_data_uri("clipboard-check.svg"),
         "MASKING POLICY": get_icon_data_uri("shield-half-full.svg"),
         "TAG": get_icon_data_uri("tag-multiple.svg"),
+        "ALERT": get_icon_data_uri("bell-ring.svg"),
+        "SECRET": get_icon_data_uri("key-variant.svg"),
+        "NETWORK RULE": get_icon_data_uri("lan.svg"),
+        "EVENT TABLE": get_icon_data_uri("table-clock.svg"),
+        "ICEBERG TABLE": get_icon_data_uri("snowflake.svg"),
+        "HYBRID TABLE": get_icon_data_uri("table.svg"),
     }
 
     # Get the set of object types present in the current selection
     present_object_types = {
-        obj.get("object_type", "UNKNOWN")
+        obj.object_type or "UNKNOWN"
         for obj in objects
-        if obj.get("_CANON_FQN") in selected_nodes
+        if obj.canon_fqn in selected_nodes
     }
 
     # Filter the object color and icon maps for the legend
@@ -161,10 +174,10 @@ def create_dependency_graph_figure(objects: List[Dict[str, Any]], deps: Dict[str
 
     # Add nodes to the graph
     for obj in objects:
-        fqn = obj.get("_CANON_FQN")
+        fqn = obj.canon_fqn
         if fqn in selected_nodes:
-            obj_type = obj.get("object_type", "UNKNOWN")
-            schema_name = obj.get("schema")
+            obj_type = obj.object_type or "UNKNOWN"
+            schema_name = obj.schema
 
             color = object_color_map.get(obj_type, "#90A4AE")
             icon_url = object_icon_map.get(obj_type, get_icon_data_uri("help-circle.svg"))
@@ -178,8 +191,8 @@ def create_dependency_graph_figure(objects: List[Dict[str, Any]], deps: Dict[str
             
             net.add_node(
                 fqn, 
-                label=obj.get("object_name"), 
-                title=f"{obj_type}\n{obj['schema']}.{obj['object_name']}", 
+                label=obj.object_name, 
+                title=f"{obj_type}\n{obj.schema}.{obj.object_name}", 
                 shape="circularImage", 
                 image=icon_url,
                 color=node_color, # type: ignore
@@ -0,0 +1,207 @@
+# Incremental re-extraction: keeps the raw GET_DDL text of a database as a snapshot, split per object, together with a
+# manifest of each object's last DDL change, and patches it with object-level GET_DDL for only the objects created,
+# altered or dropped since. The patched text goes through the normal parse pipeline (and its parse cache).
+
+import io
+import time
+import zlib
+import marshal
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import utils.ddl_spool as ddl_spool
+import utils.parse_cache as parse_cache
+import utils.sql_parser as sql_parser
+from utils.metadata_cache import Scope
+
+SNAPSHOT_FORMAT = 2
+FULL_REFRESH_AFTER_SECONDS = 24 * 3600  # Untracked object types are only picked up by a full extraction
+INCREMENTAL_MAX_CHANGES = 500           # Above this many changed objects, one database GET_DDL is cheaper
+
+# (kind, schema, name): tables and views share one namespace, as in INFORMATION_SCHEMA.TABLES.
+ObjectKey = Tuple[str, str, str]
+# key -> version: the last DDL timestamp, or the sorted (signature, timestamp) pairs of all overloads of a routine.
+Manifest = Dict[ObjectKey, str]
+
+# Parsed object types whose changes can be detected, and the manifest kind each one is listed under.
+TRACKED_KINDS = {
+    "TABLE": "TABLE", "DYNAMIC TABLE": "TABLE", "EXTERNAL TABLE": "TABLE", "EVENT TABLE": "TABLE",
+    "ICEBERG TABLE": "TABLE", "HYBRID TABLE": "TABLE", "VIEW": "TABLE", "MATERIALIZED VIEW": "TABLE",
+    "FUNCTION": "FUNCTION", "PROCEDURE": "PROCEDURE", "SEQUENCE": "SEQUENCE", "FILE FORMAT": "FILE FORMAT",
+    "PIPE": "PIPE", "STREAM": "STREAM", "TASK": "TASK", "SCHEMA": "SCHEMA",
+}
+
+# GET_DDL object type per manifest kind (tables are refined to VIEW through TABLE_TYPE).
+GET_DDL_TYPES = {
+    "TABLE": "TABLE", "FUNCTION": "FUNCTION", "PROCEDURE": "PROCEDURE", "SEQUENCE": "SEQUENCE",
+    "FILE FORMAT": "FILE_FORMAT", "PIPE": "PIPE", "STREAM": "STREAM", "TASK": "TASK",
+}
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+def manifest_queries(db_name: str) -> List[str]:
+    # One INFORMATION_SCHEMA query for the objects that record their last change, plus SHOW for streams and tasks.
+    # Every row reads (KIND, SCHEMA_NAME, OBJECT_NAME, DETAIL, VERSION). LAST_DDL is used for tables and views, so
+    # DML on a busy table does not count as a change.
+    isc = f"{quote(db_name)}.INFORMATION_SCHEMA"
+    return [
+        f"""SELECT 'TABLE', TABLE_SCHEMA, TABLE_NAME, TABLE_TYPE, TO_VARCHAR(COALESCE(LAST_DDL, LAST_ALTERED))
+              FROM {isc}.TABLES WHERE TABLE_SCHEMA <> 'INFORMATION_SCHEMA'
+        UNION ALL SELECT 'FUNCTION', FUNCTION_SCHEMA, FUNCTION_NAME, ARGUMENT_SIGNATURE, TO_VARCHAR(LAST_ALTERED) FROM {isc}.FUNCTIONS
+        UNION ALL SELECT 'PROCEDURE', PROCEDURE_SCHEMA, PROCEDURE_NAME, ARGUMENT_SIGNATURE, TO_VARCHAR(LAST_ALTERED) FROM {isc}.PROCEDURES
+        UNION ALL SELECT 'SEQUENCE', SEQUENCE_SCHEMA, SEQUENCE_NAME, NULL, TO_VARCHAR(LAST_ALTERED) FROM {isc}.SEQUENCES
+        UNION ALL SELECT 'FILE FORMAT', FILE_FORMAT_SCHEMA, FILE_FORMAT_NAME, NULL, TO_VARCHAR(LAST_ALTERED) FROM {isc}.FILE_FORMATS
+        UNION ALL SELECT 'PIPE', PIPE_SCHEMA, PIPE_NAME, NULL, TO_VARCHAR(LAST_ALTERED) FROM {isc}.PIPES
+        UNION ALL SELECT 'SCHEMA', SCHEMA_NAME, SCHEMA_NAME, NULL, TO_VARCHAR(LAST_ALTERED)
+              FROM {isc}.SCHEMATA WHERE SCHEMA_NAME <> 'INFORMATION_SCHEMA'""",
+        f"SHOW STREAMS IN DATABASE {quote(db_name)}",
+        f"SHOW TASKS IN DATABASE {quote(db_name)}",
+    ]
+
+def build_manifest(info_rows, stream_rows, task_rows) -> Tuple[Manifest, Dict[ObjectKey, List[str]]]:
+    # Returns (manifest, details): details holds the argument signatures of routines and the TABLE_TYPE of tables.
+    # Streams and tasks have no change timestamp; their creation time (for tasks, the last committed version) is used.
+    versions: Dict[ObjectKey, List[Tuple[str, str]]] = {}
+    for kind, schema, name, detail, version in info_rows:
+        versions.setdefault((kind, schema, name), []).append((detail or "", version or ""))
+    for kind, rows in (("STREAM", stream_rows), ("TASK", task_rows)):
+        for r in rows:
+            d = r.as_dict()
+            version = d.get("last_committed_on") or d.get("created_on")
+            versions.setdefault((kind, d["schema_name"], d["name"]), []).append(("", str(version or "")))
+    manifest = {key: "|".join(f"{d}@{v}" for d, v in sorted(pairs)) for key, pairs in versions.items()}
+    details = {key: sorted(d for d, _ in pairs) for key, pairs in versions.items()}
+    return manifest, details
+
+def statement_key(stmt: str) -> Optional[ObjectKey]:
+    # The manifest key of a CREATE statement from GET_DDL(..., TRUE), or None for untracked types.
+    meta = sql_parser.extract_object_metadata(stmt)
+    if not meta: return None
+    kind = TRACKED_KINDS.get(meta["object_type"])
+    if kind is None: return None
+    if kind == "SCHEMA":  # DB.SCHEMA: the parser reads the two parts as schema and name
+        return kind, meta["object_name"], meta["object_name"]
+    return kind, meta["schema"], meta["object_name"]
+
+def split_snapshot(ddl_text: Union[str, ddl_spool.SpooledText]) -> Iterator[Tuple[Optional[ObjectKey], str]]:
+    # Splits GET_DDL output into (key, statement) pairs, one at a time. Statements that create nothing
+    # (e.g. ALTER ... ADD CONSTRAINT) stay with the object before them, so they are replaced or dropped together with it.
+    key: Optional[ObjectKey] = None
+    for stmt in sql_parser.iter_sql_statements(ddl_spool.text_chunks(ddl_text)):
+        if sql_parser.extract_object_metadata(stmt):
+            key = statement_key(stmt)
+        yield key, stmt
+
+def join_statements(statements: Iterable[Tuple[Optional[ObjectKey], str]]) -> str:
+    return "".join(f"{stmt};\n" for _, stmt in statements)
+
+def diff_manifests(old: Manifest, new: Manifest) -> Tuple[List[ObjectKey], List[ObjectKey]]:
+    # Returns (created or altered, dropped) keys, each sorted for a stable fetch and patch order.
+    # An existing schema is never re-fetched: its objects are tracked one by one, and GET_DDL('SCHEMA') would return them all.
+    changed = sorted(k for k, v in new.items() if old.get(k) != v and not (k[0] == "SCHEMA" and k in old))
+    dropped = sorted(k for k in old if k not in new)
+    return changed, dropped
+
+def argument_types(signature: str) -> str:
+    # "(A NUMBER, B ARRAY)" -> "NUMBER, ARRAY": GET_DDL identifies an overload by its argument types only.
+    inner = signature.strip()[1:-1] if signature.strip().startswith("(") else signature
+    args, depth, buf = [], 0, []
+    for ch in inner + ",":
+        if ch == "," and depth == 0:
+            arg = "".join(buf).strip()
+            if arg: args.append(arg.split(None, 1)[-1] if " " in arg else arg)
+            buf = []
+            continue
+        depth += (ch == "(") - (ch == ")")
+        buf.append(ch)
+    return ", ".join(args)
+
+def object_ddl_queries(db_name: str, key: ObjectKey, details: List[str]) -> List[str]:
+    # GET_DDL queries for one changed object (one per overload for routines), or [] if it has no object-level DDL.
+    kind, schema, name = key
+    path = f"{quote(db_name)}.{quote(schema)}.{quote(name)}"
+    if kind in ("FUNCTION", "PROCEDURE"):
+        return [f"SELECT GET_DDL('{kind}', {literal(f'{path}({argument_types(sig)})')}, TRUE)" for sig in details]
+    ddl_type = GET_DDL_TYPES.get(kind)
+    if ddl_type is None: return []
+    if kind == "TABLE" and any("VIEW" in d for d in details):
+        ddl_type = "VIEW"
+    return [f"SELECT GET_DDL('{ddl_type}', {literal(path)}, TRUE)"]
+
+def schema_statement(db_name: str, schema: str) -> str:
+    # GET_DDL('SCHEMA') would return every object of the schema; a new schema only needs its CREATE.
+    return f"create or replace schema {quote(db_name)}.{quote(schema)}"
+
+def patch_statements(statements: List[Tuple[Optional[ObjectKey], str]], changed: Dict[ObjectKey, List[str]],
+                     dropped: Set[ObjectKey]) -> List[Tuple[Optional[ObjectKey], str]]:
+    # Replaces the statements of each changed object in place (new objects go after the last statement of their schema,
+    # or at the end), and removes the statements of dropped objects.
+    out: List[Tuple[Optional[ObjectKey], str]] = []
+    placed: Set[ObjectKey] = set()
+    for key, stmt in statements:
+        if key in dropped: continue
+        if key in changed:
+            if key not in placed:
+                placed.add(key)
+                out.extend((key, s) for s in changed[key])
+            continue
+        out.append((key, stmt))
+    for key in sorted(k for k in changed if k not in placed):
+        schema = key[1]
+        pos = next((i + 1 for i in range(len(out) - 1, -1, -1) if out[i][0] and out[i][0][1] == schema), len(out))
+        out[pos:pos] = [(key, s) for s in changed[key]]
+    return out
+
+def snapshot_scope(scope: Scope, db_name: str) -> str:
+    # GET_DDL output depends on what the session may see, so snapshots are kept per (account, user, role) scope, as
+    # read by metadata_cache.session_scope (the user matters too, through secondary roles), and database.
+    return "|".join((*scope, db_name))
+
+def load_snapshot(scope: str) -> Optional[Tuple[float, List[Tuple[Optional[ObjectKey], str]], Manifest, str]]:
+    # Returns (taken_at, statements, manifest, stage_ddls) of the stored snapshot, or None. Problems count as a miss.
+    # The payload is a marshalled header followed by one marshalled (key, statement) pair per statement, zlib'd.
+    try:
+        with parse_cache.connect() as conn:
+            row = conn.execute("SELECT payload FROM snapshots WHERE scope = ?", (scope,)).fetchone()
+            if row is None: return None
+            conn.execute("UPDATE snapshots SET last_used = ? WHERE scope = ?", (time.time(), scope))
+        data = io.BytesIO(zlib.decompress(row[0]))
+        version, taken_at, manifest, stage_ddls = marshal.load(data)
+        if version != SNAPSHOT_FORMAT: return None
+        end = len(data.getbuffer())
+        statements = []
+        while data.tell() < end:
+            k, s = marshal.load(data)
+            statements.append((tuple(k) if k else None, s))
+        return taken_at, statements, {tuple(k): v for k, v in manifest}, stage_ddls
+    except (sqlite3.Error, OSError, ValueError, EOFError, TypeError, zlib.error):
+        return None
+
+def store_snapshot(scope: str, statements: Iterable[Tuple[Optional[ObjectKey], str]], manifest: Manifest,
+                   stage_ddls: str, taken_at: Optional[float] = None, max_bytes: int = parse_cache.CACHE_MAX_BYTES) -> bool:
+    # Saves the latest snapshot of a database, compressing the statements as they come (e.g. from split_snapshot).
+    # taken_at is kept from the last full extraction when patching. Snapshots share the parse cache's size budget and
+    # LRU eviction; one larger than the whole budget is not stored.
+    try:
+        compressor = zlib.compressobj(1)
+        parts = [compressor.compress(marshal.dumps((
+            SNAPSHOT_FORMAT, time.time() if taken_at is None else taken_at, list(manifest.items()), stage_ddls,
+        )))]
+        for statement in statements:
+            parts.append(compressor.compress(marshal.dumps(statement)))
+        parts.append(compressor.flush())
+        payload = b"".join(parts)
+        if len(payload) > max_bytes: return False
+        with parse_cache.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (scope, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                (scope, payload, len(payload), time.time()),
+            )
+            parse_cache.evict(conn, max_bytes, ("snapshots", scope))
+        return True
+    except (sqlite3.Error, OSError, ValueError):
+        return False
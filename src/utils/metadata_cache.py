@@ -0,0 +1,146 @@
+# Process-wide cache of Snowflake metadata (database, schema, warehouse and role lists, user details, fetched DDL),
+# shared by every Streamlit session of the server.
+# Entries are keyed by (account, user, role) scope plus the object asked for, so what one user or role may see is
+# never served to another. Listings are served stale for a while after they expire and refreshed in the background
+# (stale-while-revalidate); the cache is bounded in entries and in bytes, evicting least recently used entries.
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import utils.ddl_spool as ddl_spool
+
+MAX_ENTRIES = int(os.environ.get("SNOWDL_METADATA_CACHE_ENTRIES") or 2048)
+MAX_BYTES = int(os.environ.get("SNOWDL_METADATA_CACHE_MAX_BYTES") or 256 * 1024 * 1024)
+FRESH_SECONDS = 900         # Served as is
+STALE_SECONDS = 3600        # Served while a background refresh runs; older entries are fetched again in the foreground
+REFRESH_WORKERS = 2
+
+# (account, user, role): the user matters too, since secondary roles can widen what a session sees.
+Scope = Tuple[str, str, str]
+Key = Tuple[Scope, str, Hashable]
+
+MISSING = object()
+logger = logging.getLogger(__name__)
+
+def session_scope(session) -> Scope:
+    # Read from the session's own context, so it always matches what the next query would run as.
+    return tuple((getter() or "").strip('"').upper() for getter in (
+        session.get_current_account, session.get_current_user, session.get_current_role,
+    ))
+
+def estimate_size(value: Any) -> int:
+    # Rough retained size: string lengths (a spooled text's size on disk) plus a small constant per container item.
+    if isinstance(value, str): return len(value) + 50
+    if isinstance(value, ddl_spool.SpooledText): return value.size + 50
+    if isinstance(value, (list, tuple, set)): return 60 + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict): return 100 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return 50
+
+class MetadataCache:
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self.entries: "OrderedDict[Key, Tuple[Any, float, int]]" = OrderedDict()  # key -> (value, fetched_at, size)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.refreshing: Set[Key] = set()
+        self.refresher = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="metadata-refresh")
+        self.stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+
+    def lookup(self, scope: Scope, kind: str, arg: Hashable, refresh: Optional[Callable[[], Any]] = None,
+               fresh_seconds: float = FRESH_SECONDS, stale_seconds: float = STALE_SECONDS,
+               current_scope: Optional[Callable[[], Scope]] = None) -> Any:
+        # Returns the cached value, or MISSING. A stale value is still returned when refresh is given,
+        # and refresh() is then run once in the background to replace it. When refresh() runs on a session whose scope
+        # can change, current_scope reads that scope: the refreshed value is only stored if it still equals scope.
+        key = (scope, kind, arg)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            age = time.time() - entry[1]
+            if age < fresh_seconds:
+                self.stats["hits"] += 1
+                return entry[0]
+            if refresh is None or age >= stale_seconds:
+                self.stats["misses"] += 1
+                return MISSING
+            self.stats["stale_hits"] += 1
+            if key not in self.refreshing:
+                self.refreshing.add(key)
+                self.refresher.submit(self.run_refresh, key, refresh, current_scope)
+            return entry[0]
+
+    def run_refresh(self, key: Key, refresh: Callable[[], Any], current_scope: Optional[Callable[[], Scope]] = None) -> None:
+        # Background refresh: on failure the stale value stays until it expires. The scope is checked before and after
+        # refresh(), so a value fetched while (or after) the session switched role is never stored under the old key.
+        try:
+            if current_scope is not None and current_scope() != key[0]: return
+            value = refresh()
+            if current_scope is not None and current_scope() != key[0]:
+                logger.info("Dropped the background refresh of %s: the session's scope changed", key[1:])
+                return
+            self.put(*key, value)
+            with self.lock:
+                self.stats["refreshes"] += 1
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", key[1:], e)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def put(self, scope: Scope, kind: str, arg: Hashable, value: Any) -> None:
+        key = (scope, kind, arg)
+        size = estimate_size(value)
+        if size > self.max_bytes: return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self.entries[key] = (value, time.time(), size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted
+                self.stats["evictions"] += 1
+
+    def get(self, scope: Scope, kind: str, arg: Hashable, fetch: Callable[[], Any],
+            fresh_seconds: float = FRESH_SECONDS, stale_seconds: float = STALE_SECONDS,
+            current_scope: Optional[Callable[[], Scope]] = None) -> Any:
+        # Cached value if fresh (or stale, refreshing it in the background); otherwise fetch() now and cache the result.
+        # Exceptions from fetch() propagate and nothing is cached.
+        value = self.lookup(scope, kind, arg, fetch, fresh_seconds, stale_seconds, current_scope)
+        if value is MISSING:
+            value = fetch()
+            self.put(scope, kind, arg, value)
+        return value
+
+    def invalidate(self, account: Optional[str] = None, user: Optional[str] = None, role: Optional[str] = None,
+                   kinds: Optional[Set[str]] = None) -> int:
+        # Drops the entries matching every given scope part (and kind); with no arguments, everything. Returns the count.
+        wanted = [(i, v.strip('"').upper()) for i, v in enumerate((account, user, role)) if v]
+        with self.lock:
+            keys = [k for k in self.entries
+                    if all(k[0][i] == v for i, v in wanted) and (kinds is None or k[1] in kinds)]
+            for k in keys:
+                self.total_bytes -= self.entries.pop(k)[2]
+        return len(keys)
+
+    def info(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.total_bytes, **self.stats}
+
+# The cache shared by all sessions of this server process.
+cache = MetadataCache()
+
+def get_for_session(session, kind: str, arg: Hashable, fetch: Callable[[], Any], **kwargs) -> Any:
+    # cache.get in the session's current scope. A background refresh re-reads the session's scope around fetch() and
+    # drops its result if the session switched role (or user) meanwhile, since fetch() then ran as another scope.
+    return cache.get(session_scope(session), kind, arg, fetch, current_scope=lambda: session_scope(session), **kwargs)
@@ -0,0 +1,145 @@
+# Persistent, content-addressed cache of parsed databases (records, dependency edges, cycles and topological order).
+# Entries live in a local SQLite file, keyed by a hash of the fetched DDL text, so an unchanged database is
+# restored without any parsing or dependency work, across reruns and process restarts.
+# The same file holds the raw snapshots of utils.incremental; both tables share one size budget and LRU eviction.
+
+import os
+import sys
+import time
+import zlib
+import marshal
+import sqlite3
+import hashlib
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import utils.ddl_spool as ddl_spool
+from utils.sql_parser import ObjectRecord
+
+FORMAT_VERSION = 3      # Bump whenever parsing or ordering changes what a cached entry would contain
+CACHE_DIR = os.environ.get("SNOWDL_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "snowdl_genie")
+CACHE_MAX_BYTES = int(os.environ.get("SNOWDL_CACHE_MAX_BYTES") or 512 * 1024 * 1024)
+HASH_CHUNK_CHARS = 1 << 20
+ENTRY_TABLES = {"parsed": "key", "snapshots": "scope"}  # Evictable table -> its key column
+
+def cache_path() -> str:
+    return os.path.join(CACHE_DIR, "parsed_ddl.sqlite")
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    # Opens the cache database in a transaction, creating it on first use.
+    # One short-lived connection per call keeps it safe to use from several Streamlit sessions at once.
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(cache_path(), timeout=10)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, payload BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS parsed_last_used ON parsed (last_used)")
+            # Latest raw DDL snapshot per database, for incremental re-extraction (see utils.incremental).
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots (scope TEXT PRIMARY KEY, payload BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_last_used ON snapshots (last_used)")
+            yield conn
+    finally:
+        conn.close()
+
+def cache_key(ddl_text: Union[str, ddl_spool.SpooledText, None], stage_ddls: Optional[str], selected_db: str,
+              db_map: Optional[Dict[str, Optional[str]]] = None) -> str:
+    # Hashes everything the parsed result depends on: the fetched text, the database and the rewrite mapping.
+    # The text is hashed in slices so that no encoded copy of the whole DDL is ever built; a spooled text hashes
+    # the same as the equal string.
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"v{FORMAT_VERSION}|m{marshal.version}|{selected_db}|{sorted((db_map or {}).items(), key=str)}".encode())
+    for text in (ddl_text, "\0", stage_ddls):
+        for chunk in ddl_spool.text_chunks(text):
+            for i in range(0, len(chunk), HASH_CHUNK_CHARS):
+                h.update(chunk[i:i + HASH_CHUNK_CHARS].encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+def encode(records: List[ObjectRecord], deps: Dict[str, Set[str]], cycles: List[List[str]]) -> bytes:
+    # Packs records in their sorted order plus the dependency edges and cycles (as indexes into a name table) into zlib'd marshal.
+    source = records[0].source if records else ""
+    names: Dict[str, int] = {}
+    def name_id(n: str) -> int:
+        return names.setdefault(n, len(names))
+    rows = [
+        (r.object_type, r.database, r.schema, r.object_name, r.fully_qualified_name, r.index, r.start, r.end, r.canon_fqn)
+        for r in records
+    ]
+    edges = [(name_id(k), [name_id(d) for d in v]) for k, v in deps.items()]
+    cycle_ids = [[name_id(n) for n in cycle] for cycle in cycles]
+    return zlib.compress(marshal.dumps((FORMAT_VERSION, source, rows, list(names), edges, cycle_ids)), 1)
+
+def decode(payload: bytes) -> Tuple[List[ObjectRecord], Dict[str, Set[str]], List[List[str]]]:
+    version, *body = marshal.loads(zlib.decompress(payload))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported cache format {version}")
+    source, rows, names, edges, cycle_ids = body
+    records = []
+    for obj_type, db, schema, name, fqn, index, start, end, canon in rows:
+        rec = ObjectRecord(obj_type, db, schema, name, fqn, source=source, start=start, end=end, index=index)
+        rec.canon_fqn = canon
+        records.append(rec)
+    names = [sys.intern(n) for n in names]
+    deps: Dict[str, Set[str]] = defaultdict(set)
+    for k, vs in edges:
+        deps[names[k]] = {names[v] for v in vs}
+    return records, deps, [[names[i] for i in cycle] for cycle in cycle_ids]
+
+def load(key: str) -> Optional[Tuple[List[ObjectRecord], Dict[str, Set[str]], List[List[str]]]]:
+    # Returns the cached (sorted records, deps, cycles) for key, or None. Any cache problem is treated as a miss.
+    try:
+        with connect() as conn:
+            row = conn.execute("SELECT payload FROM parsed WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE parsed SET last_used = ? WHERE key = ?", (time.time(), key))
+        return decode(row[0])
+    except (sqlite3.Error, OSError, ValueError, EOFError, TypeError, zlib.error):
+        return None
+
+def store(key: str, records: List[ObjectRecord], deps: Dict[str, Set[str]], cycles: List[List[str]],
+          max_bytes: int = CACHE_MAX_BYTES) -> bool:
+    # Saves a parsed result, then evicts least recently used entries until the cache fits in max_bytes.
+    # Returns False (and leaves the app unaffected) if the cache cannot be written, e.g. on a read-only filesystem.
+    try:
+        payload = encode(records, deps, cycles)
+        if len(payload) > max_bytes:
+            return False
+        with connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            evict(conn, max_bytes, ("parsed", key))
+        return True
+    except (sqlite3.Error, OSError, ValueError):
+        return False
+
+def evict(conn: sqlite3.Connection, max_bytes: int, keep: Tuple[str, str]) -> None:
+    # Deletes least recently used entries of every table in ENTRY_TABLES (parsed results and incremental snapshots)
+    # until together they fit in max_bytes. keep is the (table, key) just written, which is never evicted.
+    total = sum(conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0] for table in ENTRY_TABLES)
+    if total <= max_bytes: return
+    entries = " UNION ALL ".join(f"SELECT '{table}', {column}, size, last_used FROM {table}" for table, column in ENTRY_TABLES.items())
+    for table, old_key, size, _ in conn.execute(f"SELECT * FROM ({entries}) ORDER BY last_used").fetchall():
+        if (table, old_key) == keep: continue
+        conn.execute(f"DELETE FROM {table} WHERE {ENTRY_TABLES[table]} = ?", (old_key,))
+        total -= size
+        if total <= max_bytes:
+            break
+
+def clear() -> None:
+    # Drops every cached entry, incremental snapshots included.
+    try:
+        with connect() as conn:
+            for table in ENTRY_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+    except (sqlite3.Error, OSError):
+        pass
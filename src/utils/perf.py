@@ -0,0 +1,96 @@
+# Lightweight phase timing for the app: named spans per rerun, with object counts and bytes processed.
+# The spans of the last PERF_HISTORY_RUNS reruns are kept in the session state for the Performance dialog,
+# and a single rerun can optionally be captured with cProfile.
+
+import io
+import json
+import time
+import pstats
+import cProfile
+import functools
+import streamlit as st
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+PERF_HISTORY_RUNS = 20      # Reruns kept for the Performance dialog and the JSON export
+PROFILE_TOP_N = 40          # Functions listed in a cProfile report
+PERF_STATE_KEYS = {'perf_runs', 'perf_current', 'perf_profile_next', 'perf_profile_report'}
+
+def start_run() -> None:
+    # Opens the span list of a new rerun; call first thing in main().
+    st.session_state['perf_current'] = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "t0": time.perf_counter(), "depth": 0, "spans": [],
+    }
+
+def finish_run() -> None:
+    # Closes the current rerun and adds it to the bounded history.
+    run = st.session_state.pop('perf_current', None)
+    if run is None: return
+    t0 = run.pop("t0")
+    run.pop("depth")
+    run["total_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    run["spans"].sort(key=lambda s: s["start_ms"])
+    runs = st.session_state.setdefault('perf_runs', [])
+    runs.append(run)
+    del runs[:-PERF_HISTORY_RUNS]
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    # Times the enclosed block under `name`. attrs (e.g. objects=..., bytes=...) are recorded with the span;
+    # counts only known inside the block can be added to the yielded dict.
+    info: Dict[str, Any] = dict(attrs)
+    run = st.session_state.get('perf_current')
+    if run is None:
+        yield info
+        return
+    depth = run["depth"]
+    run["depth"] = depth + 1
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        end = time.perf_counter()
+        run["depth"] = depth
+        run["spans"].append({
+            "name": name, "depth": depth,
+            "start_ms": round((start - run["t0"]) * 1000, 3), "ms": round((end - start) * 1000, 3), **info,
+        })
+
+def timed(fn: Callable) -> Callable:
+    # Decorator: records every call of fn as a span named after the function.
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def start_profile() -> Optional[cProfile.Profile]:
+    # Starts cProfile for this rerun if one was requested from the Performance dialog.
+    if not st.session_state.get('perf_profile_next'): return None
+    st.session_state['perf_profile_next'] = False
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Another profiler is already active in this thread
+        return None
+    return profiler
+
+def stop_profile(profiler: Optional[cProfile.Profile]) -> None:
+    # Stops the profiler and keeps its report, sorted by cumulative time.
+    if profiler is None: return
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    st.session_state['perf_profile_report'] = out.getvalue()
+
+def span_rows(run: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Table rows for one rerun, nested spans indented under their parent.
+    return [
+        {"Phase": " " * s["depth"] + s["name"], "ms": s["ms"], "Objects": s.get("objects"), "Bytes": s.get("bytes")}
+        for s in run["spans"]
+    ]
+
+def export_json() -> str:
+    return json.dumps(st.session_state.get('perf_runs', []), indent=2, default=str)
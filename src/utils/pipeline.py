@@ -0,0 +1,129 @@
+# Runs the DDL parse -> dependency-order pipeline, serially or across a process pool for very large databases.
+
+import os
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Set, Tuple
+
+import utils.sql_parser as sql_parser
+import utils.dependencies as dependencies
+import utils.parse_cache as parse_cache
+import utils.ddl_spool as ddl_spool
+from utils.sql_parser import ObjectRecord
+
+PARALLEL_THRESHOLD_CHARS = 8_000_000    # DDL size above which parallel mode switches on by default
+SHARDS_PER_WORKER = 4                   # More shards than workers, so one slow shard does not stall the pool
+
+# One parsed object as returned by a worker: (statement index, type, database, schema, name, fqn, ddl, references)
+ParsedStatement = Tuple[int, str, str, str, str, str, str, List[dependencies.Reference]]
+
+def ddl_chunks(ddl_text, stage_ddls):
+    # The fetched text as one stream of chunks; ddl_text may be a string or a ddl_spool.SpooledText.
+    return itertools.chain(ddl_spool.text_chunks(ddl_text), ddl_spool.text_chunks(stage_ddls))
+
+def parse_ddl_statements(ddl_text, stage_ddls, selected_db, db_map: Optional[Dict[str, Optional[str]]] = None) -> List[ObjectRecord]:
+    # Serial path: a single streaming scan that splits, rewrites and classifies.
+    # db_map retargets database references (source -> target, or None to drop the database part);
+    # by default references to the selected database are removed.
+    return sql_parser.parse_object_records(ddl_chunks(ddl_text, stage_ddls), selected_db, db_map or {selected_db: None})
+
+def parse_statement_shard(shard: Tuple[int, List[str], Dict[str, Optional[str]]]) -> List[ParsedStatement]:
+    # Worker entry point: rewrites, classifies and extracts the references of a contiguous run of statements.
+    first_idx, statements, db_map = shard
+    parsed: List[ParsedStatement] = []
+    for i, stmt in enumerate(statements):
+        cleaned = sql_parser.rewrite_database_references(stmt, db_map)
+        meta = sql_parser.extract_object_metadata(cleaned)
+        if meta:
+            parsed.append((
+                first_idx + i, meta["object_type"], meta["database"], meta["schema"], meta["object_name"],
+                meta["fully_qualified_name"], cleaned, dependencies.find_qualified_references(cleaned),
+            ))
+    return parsed
+
+def balanced_shards(statements: List[str], n_shards: int) -> List[Tuple[int, List[str]]]:
+    # Cuts the statement list into contiguous runs of roughly equal total length, as (first index, statements).
+    # Contiguous runs keep the merged output in statement order without any re-sorting.
+    total = sum(len(s) for s in statements)
+    target = max(1, total // max(1, n_shards))
+    shards, start, size = [], 0, 0
+    for i, stmt in enumerate(statements):
+        size += len(stmt)
+        if size >= target:
+            shards.append((start, statements[start:i + 1]))
+            start, size = i + 1, 0
+    if start < len(statements):
+        shards.append((start, statements[start:]))
+    return shards
+
+def parse_ddl_parallel(ddl_text, stage_ddls, selected_db, db_map: Optional[Dict[str, Optional[str]]] = None,
+                       workers: Optional[int] = None) -> Tuple[List[ObjectRecord], List[List[dependencies.Reference]]]:
+    # Parallel path: statement boundaries are found once here, then classification, reference rewriting and
+    # reference extraction run in worker processes. Records and references come back in statement order.
+    db_map = db_map or {selected_db: None}
+    workers = workers or os.cpu_count() or 1
+    statements = list(sql_parser.iter_sql_statements(ddl_chunks(ddl_text, stage_ddls)))
+    shards = [(first, stmts, db_map) for first, stmts in balanced_shards(statements, workers * SHARDS_PER_WORKER)]
+    del statements
+
+    # spawn rather than fork: the Streamlit server is multi-threaded.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(parse_statement_shard, shards))
+    del shards
+
+    records: List[ObjectRecord] = []
+    references: List[List[dependencies.Reference]] = []
+    texts: List[str] = []
+    offset = 0
+    for parsed in results:
+        for idx, obj_type, db, schema, name, fqn, ddl, refs in parsed:
+            records.append(ObjectRecord(obj_type, db or selected_db, schema, name, fqn, start=offset, end=offset + len(ddl), index=idx))
+            references.append(refs)
+            texts.append(ddl)
+            offset += len(ddl)
+    del results
+    source = "".join(texts)
+    for rec in records:
+        rec.source = source
+    return records, references
+
+def parse_and_order(ddl_text, stage_ddls, selected_db, db_map: Optional[Dict[str, Optional[str]]] = None,
+                    parallel: Optional[bool] = None, workers: Optional[int] = None,
+                    use_cache: bool = True) -> Tuple[List[ObjectRecord], Dict[str, Set[str]], List[List[str]]]:
+    # Parses the fetched DDL and orders the objects by dependency; returns (sorted objects, deps, cycles).
+    # With use_cache, a result previously computed for the same DDL text is loaded from parse_cache instead.
+    # parallel=None picks the process pool automatically for DDL above PARALLEL_THRESHOLD_CHARS on multi-core hosts.
+    # Both paths return the same records in the same order; if worker processes cannot be started, the serial path is used.
+    # ddl_text may be a ddl_spool.SpooledText: it is then streamed from disk, never loaded whole.
+    key = parse_cache.cache_key(ddl_text, stage_ddls, selected_db, db_map) if use_cache else None
+    if key:
+        cached = parse_cache.load(key)
+        if cached is not None:
+            return cached
+
+    if parallel is None:
+        size = len(ddl_text or "") + len(stage_ddls or "")
+        parallel = size >= PARALLEL_THRESHOLD_CHARS and (os.cpu_count() or 1) > 1
+    references = None
+    if parallel:
+        try:
+            records, references = parse_ddl_parallel(ddl_text, stage_ddls, selected_db, db_map, workers)
+        except (OSError, BrokenProcessPool):
+            parallel = False
+    if not parallel:
+        records = parse_ddl_statements(ddl_text, stage_ddls, selected_db, db_map)
+    sorted_objects, deps, cycles = dependencies.order_objects_by_dependencies(records, references)
+    if key:
+        parse_cache.store(key, sorted_objects, deps, cycles)
+    return sorted_objects, deps, cycles
+
+def build_script(objects: List[ObjectRecord], include_schema_ddl: bool = False) -> str:
+    # The deployment script for objects already in dependency order, optionally preceded by CREATE SCHEMA statements.
+    script = ";\n\n".join([o.ddl for o in objects]) + ";"
+    if include_schema_ddl:
+        distinct_schemas = sorted(set(o.schema for o in objects))
+        schema_ddls = [f'CREATE SCHEMA IF NOT EXISTS "{schema}";' for schema in distinct_schemas]
+        script = "\n".join(schema_ddls) + f"\n\n{script}"
+    return script
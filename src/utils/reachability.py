@@ -0,0 +1,163 @@
+# Answers transitive dependency queries ("everything X needs", "everything that breaks if X is dropped") on the
+# graph returned by dependencies.order_objects_by_dependencies.
+# Cycles are condensed into strongly connected components (Tarjan), the condensed graph is stored in compressed
+# sparse row (CSR) arrays, and the closure of every component is precomputed as integer bitsets.
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BITSET_MAX_COMPONENTS = 20_000  # Above this, closures are computed on first use from the CSR arrays and memoised
+CLOSURE_CACHE_SIZE = 4096       # Memoised closures kept per direction when bitsets are not precomputed
+
+def build_csr(n: int, edges: Iterable[Tuple[int, int]]) -> Tuple[array, array]:
+    # Packs (source, target) pairs into CSR form: the targets of node i are targets[offsets[i]:offsets[i + 1]].
+    buckets: List[List[int]] = [[] for _ in range(n)]
+    for a, b in edges:
+        buckets[a].append(b)
+    offsets, targets = array("i", [0]), array("i")
+    for bucket in buckets:
+        targets.extend(bucket)
+        offsets.append(len(targets))
+    return offsets, targets
+
+def strongly_connected_components(n: int, offsets: array, targets: array) -> Tuple[array, int]:
+    # Iterative Tarjan's algorithm over a CSR graph. Returns (component of each node, number of components).
+    # Components are numbered in the order Tarjan completes them, i.e. every component's successors get lower numbers.
+    index = array("i", [-1]) * n
+    low = array("i", [0]) * n
+    comp = array("i", [-1]) * n
+    on_stack = bytearray(n)
+    stack: List[int] = []
+    counter = n_comps = 0
+    for root in range(n):
+        if index[root] >= 0: continue
+        index[root] = low[root] = counter; counter += 1
+        stack.append(root); on_stack[root] = 1
+        work = [(root, offsets[root])]
+        while work:
+            v, e = work[-1]
+            if e < offsets[v + 1]:
+                work[-1] = (v, e + 1)
+                w = targets[e]
+                if index[w] < 0:
+                    index[w] = low[w] = counter; counter += 1
+                    stack.append(w); on_stack[w] = 1
+                    work.append((w, offsets[w]))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work and low[v] < low[work[-1][0]]:
+                low[work[-1][0]] = low[v]
+            if low[v] == index[v]:  # v roots a component: pop it off the stack
+                while True:
+                    w = stack.pop(); on_stack[w] = 0
+                    comp[w] = n_comps
+                    if w == v: break
+                n_comps += 1
+    return comp, n_comps
+
+def bitset_positions(bits: int) -> List[int]:
+    # Positions of the set bits of a (possibly very long) integer, lowest first.
+    s = bin(bits)[:1:-1]
+    out, i = [], s.find("1")
+    while i >= 0:
+        out.append(i)
+        i = s.find("1", i + 1)
+    return out
+
+class ReachabilityIndex:
+    # Transitive closure over a dependency map (node -> the nodes it depends on), built once per database.
+    # upstream()/downstream() cost one bitset lookup plus the size of the answer.
+
+    def __init__(self, deps: Dict[str, Set[str]], nodes: Optional[Iterable[str]] = None):
+        self.names: List[str] = []
+        self.node_id: Dict[str, int] = {}
+        for name in list(nodes or ()) + list(deps):
+            if name and name not in self.node_id:
+                self.node_id[name] = len(self.names)
+                self.names.append(name)
+        for targets in deps.values():
+            for name in targets:
+                if name and name not in self.node_id:
+                    self.node_id[name] = len(self.names)
+                    self.names.append(name)
+        n = len(self.names)
+        node_id = self.node_id
+        edge_list = [(node_id[a], node_id[b]) for a, bs in deps.items() if a for b in bs if b]
+
+        # Condense cycles, then store the component graph in both directions.
+        offsets, targets = build_csr(n, edge_list)
+        self.comp_of, self.n_comps = strongly_connected_components(n, offsets, targets)
+        comp_of = self.comp_of
+        comp_edges = {(comp_of[a], comp_of[b]) for a, b in edge_list if comp_of[a] != comp_of[b]}
+        self.up_offsets, self.up_targets = build_csr(self.n_comps, comp_edges)
+        self.down_offsets, self.down_targets = build_csr(self.n_comps, ((b, a) for a, b in comp_edges))
+        self.member_offsets, self.member_nodes = build_csr(self.n_comps, ((comp_of[v], v) for v in range(n)))
+
+        self.up_bits: Optional[List[int]] = None
+        self.down_bits: Optional[List[int]] = None
+        self.closure_cache: Dict[Tuple[bool, int], List[int]] = {}
+        if self.n_comps <= BITSET_MAX_COMPONENTS:
+            self.up_bits, self.down_bits = self.build_bitsets()
+
+    def build_bitsets(self) -> Tuple[List[int], List[int]]:
+        # One pass per direction in component order: successors always have lower numbers than their predecessors.
+        up: List[int] = [0] * self.n_comps
+        for c in range(self.n_comps):
+            bits = 1 << c
+            for d in self.up_targets[self.up_offsets[c]:self.up_offsets[c + 1]]:
+                bits |= up[d]
+            up[c] = bits
+        down: List[int] = [0] * self.n_comps
+        for c in range(self.n_comps - 1, -1, -1):
+            bits = 1 << c
+            for d in self.down_targets[self.down_offsets[c]:self.down_offsets[c + 1]]:
+                bits |= down[d]
+            down[c] = bits
+        return up, down
+
+    def closure(self, comp: int, upstream: bool) -> List[int]:
+        # Components reachable from comp (itself included) in one direction.
+        bits = self.up_bits if upstream else self.down_bits
+        if bits is not None:
+            return bitset_positions(bits[comp])
+        key = (upstream, comp)
+        cached = self.closure_cache.get(key)
+        if cached is not None: return cached
+        offsets, targets = (self.up_offsets, self.up_targets) if upstream else (self.down_offsets, self.down_targets)
+        seen, todo = {comp}, [comp]
+        while todo:
+            c = todo.pop()
+            for d in targets[offsets[c]:offsets[c + 1]]:
+                if d not in seen:
+                    seen.add(d); todo.append(d)
+        result = sorted(seen)
+        if len(self.closure_cache) >= CLOSURE_CACHE_SIZE:
+            self.closure_cache.clear()
+        self.closure_cache[key] = result
+        return result
+
+    def members(self, comp: int) -> List[str]:
+        return [self.names[v] for v in self.member_nodes[self.member_offsets[comp]:self.member_offsets[comp + 1]]]
+
+    def reachable(self, name: str, upstream: bool) -> Set[str]:
+        if name not in self.node_id: return set()
+        result: Set[str] = set()
+        for c in self.closure(self.comp_of[self.node_id[name]], upstream):
+            result.update(self.members(c))
+        result.discard(name)
+        return result
+
+    def upstream(self, name: str) -> Set[str]:
+        # Everything name needs, directly or indirectly (other members of its cycle included).
+        return self.reachable(name, True)
+
+    def downstream(self, name: str) -> Set[str]:
+        # Everything that breaks if name is dropped, directly or indirectly.
+        return self.reachable(name, False)
+
+    def cycle_of(self, name: str) -> List[str]:
+        # The other objects name forms a dependency cycle with, if any.
+        if name not in self.node_id: return []
+        return [m for m in self.members(self.comp_of[self.node_id[name]]) if m != name]
@@ -0,0 +1,241 @@
+# Record/replay stand-in for a Snowpark session, for profiling the app offline.
+# RecordingSession wraps a live session and appends every query and its result set to a JSONL fixture;
+# ReplaySession serves those result sets back with no network, optionally adding latency per query (fixed, jittered,
+# or as recorded), so round-trip-heavy paths can be reproduced on a laptop.
+# Start the app against a fixture with:  streamlit run src/app.py -- --replay fixture.jsonl [--replay-latency 80|recorded]
+# and record one with:                   streamlit run src/app.py -- --record fixture.jsonl
+
+import re
+import json
+import time
+import random
+import argparse
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+class ReplayMissError(Exception):
+    # Raised for a query the fixture has no result set for.
+    pass
+
+def normalize_sql(query: str) -> str:
+    # Queries are matched with whitespace collapsed and any trailing ';' removed.
+    return WHITESPACE_REGEX.sub(" ", query).strip().rstrip(";").rstrip()
+
+class ReplayRow(tuple):
+    # Tuple of values that, like snowpark.Row, can also be read by column name and converted with as_dict().
+    def __new__(cls, values: Sequence[Any], fields: Sequence[str]):
+        row = super().__new__(cls, values)
+        row._fields = list(fields)
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key in self._fields:
+                return tuple.__getitem__(self, self._fields.index(key))
+            upper = [f.upper() for f in self._fields]
+            if key.upper() in upper:
+                return tuple.__getitem__(self, upper.index(key.upper()))
+            raise KeyError(key)
+        return tuple.__getitem__(self, key)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+class ReplayJob:
+    # Async job stand-in: done once its latency has elapsed, so concurrent submissions overlap as they would on a server.
+    def __init__(self, rows: Optional[List[ReplayRow]], error: Optional[Exception], ready_at: float):
+        self.rows, self.error, self.ready_at = rows, error, ready_at
+
+    def is_done(self) -> bool:
+        return time.perf_counter() >= self.ready_at
+
+    def result(self, result_type: Optional[str] = None):
+        # Rows, or an iterator over them for result_type="row_iterator" (the only other type replayed).
+        wait = self.ready_at - time.perf_counter()
+        if wait > 0: time.sleep(wait)
+        if self.error is not None: raise self.error
+        return iter(self.rows) if result_type == "row_iterator" else self.rows
+
+    def cancel(self) -> None:
+        pass
+
+class ReplayDataFrame:
+    def __init__(self, session: "ReplaySession", query: str):
+        self.session, self.query = session, query
+
+    def collect(self) -> List[ReplayRow]:
+        return self.collect_nowait().result()
+
+    def collect_nowait(self) -> ReplayJob:
+        return self.session.submit(self.query)
+
+    def to_local_iterator(self):
+        return self.collect_nowait().result("row_iterator")
+
+class ReplaySession:
+    # Serves recorded result sets for sql(...).collect() / collect_nowait(), and the session context
+    # (get_current_*, use_role, use_warehouse) from the fixture's "session" record.
+    # A query recorded under several roles replays the result recorded under the current role, if there is one.
+
+    def __init__(self, records: List[Dict[str, Any]], latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 recorded_latency: bool = False, seed: Optional[int] = None):
+        self.context: Dict[str, Optional[str]] = {}
+        self.results: Dict[Tuple[Optional[str], str], Dict[str, Any]] = {}
+        for rec in records:
+            if rec.get("type") == "session":
+                self.context.update({k: v for k, v in rec.items() if k != "type"})
+            elif rec.get("type") == "query":
+                sql = normalize_sql(rec["sql"])
+                self.results[(rec.get("role"), sql)] = rec
+                self.results[(None, sql)] = rec
+        self.latency_ms, self.jitter_ms, self.recorded_latency = latency_ms, jitter_ms, recorded_latency
+        self.random = random.Random(seed)
+        self.queries_served = 0
+
+    @classmethod
+    def load(cls, path: str, latency: Optional[str] = None, jitter_ms: float = 0.0) -> "ReplaySession":
+        # latency is a number of milliseconds per query, or "recorded" to replay each query's recorded duration.
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if latency == "recorded":
+            return cls(records, jitter_ms=jitter_ms, recorded_latency=True)
+        return cls(records, latency_ms=float(latency or 0), jitter_ms=jitter_ms)
+
+    def sql(self, query: str) -> ReplayDataFrame:
+        return ReplayDataFrame(self, query)
+
+    def submit(self, query: str) -> ReplayJob:
+        self.queries_served += 1
+        sql = normalize_sql(query)
+        rec = self.results.get((self.context.get("role"), sql)) or self.results.get((None, sql))
+        delay = (rec or {}).get("elapsed_ms", 0.0) if self.recorded_latency else self.latency_ms
+        delay += self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        ready_at = time.perf_counter() + delay / 1000
+        if rec is None:
+            return ReplayJob(None, ReplayMissError(f"No recorded result for query: {sql[:200]}"), ready_at)
+        if rec.get("error"):
+            return ReplayJob(None, Exception(rec["error"]), ready_at)
+        fields = rec.get("columns") or []
+        return ReplayJob([ReplayRow(values, fields) for values in rec.get("rows", [])], None, ready_at)
+
+    def quoted(self, key: str) -> Optional[str]:
+        value = self.context.get(key)
+        return None if value is None else f'"{value}"'
+
+    def get_current_account(self) -> Optional[str]: return self.quoted("account")
+    def get_current_user(self) -> Optional[str]: return self.quoted("user")
+    def get_current_role(self) -> Optional[str]: return self.quoted("role")
+    def get_current_warehouse(self) -> Optional[str]: return self.quoted("warehouse")
+    def get_current_database(self) -> Optional[str]: return self.quoted("database")
+    def get_current_schema(self) -> Optional[str]: return self.quoted("schema")
+
+    def use_role(self, role: str) -> None:
+        # Only roles listed in the fixture (if it lists any) can be used, as on a real account.
+        self.use("role", "roles", role)
+
+    def use_warehouse(self, warehouse: str) -> None:
+        self.use("warehouse", "warehouses", warehouse)
+
+    def use(self, key: str, allowed_key: str, name: str) -> None:
+        name = name.strip('"')
+        allowed = self.context.get(allowed_key)
+        if allowed and name not in allowed:
+            raise ReplayMissError(f"{key.capitalize()} '{name}' is not available in the replay fixture.")
+        self.context[key] = name
+
+    def close(self) -> None:
+        pass
+
+class RecordingSession:
+    # Wraps a live session and appends each query run through sql(...).collect() / collect_nowait() to a JSONL fixture.
+    # Everything else is passed through to the wrapped session.
+
+    def __init__(self, session, path: str):
+        self.session, self.path = session, path
+        self.write({
+            "type": "session",
+            **{k: (getattr(session, f"get_current_{k}")() or "").strip('"') or None
+               for k in ("account", "user", "role", "warehouse", "database", "schema")},
+        })
+
+    def __getattr__(self, name: str):
+        return getattr(self.session, name)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def record(self, query: str, started: float, rows: Optional[list], error: Optional[Exception]) -> None:
+        rec: Dict[str, Any] = {
+            "type": "query", "sql": query, "role": (self.session.get_current_role() or "").strip('"') or None,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        if error is not None:
+            rec["error"] = str(error)
+        else:
+            rec["columns"] = list(rows[0].as_dict()) if rows else []
+            rec["rows"] = [list(r) for r in rows]
+        self.write(rec)
+
+    def sql(self, query: str):
+        return RecordingDataFrame(self, query)
+
+    def use_role(self, role: str) -> None:
+        self.session.use_role(role)
+        self.write({"type": "session", "role": (self.session.get_current_role() or "").strip('"') or None})
+
+    def use_warehouse(self, warehouse: str) -> None:
+        self.session.use_warehouse(warehouse)
+        self.write({"type": "session", "warehouse": (self.session.get_current_warehouse() or "").strip('"') or None})
+
+class RecordingDataFrame:
+    def __init__(self, recorder: RecordingSession, query: str):
+        self.recorder, self.query = recorder, query
+        self.df = recorder.session.sql(query)
+
+    def __getattr__(self, name: str):
+        return getattr(self.df, name)
+
+    def collect(self):
+        started = time.perf_counter()
+        try:
+            rows = self.df.collect()
+        except Exception as e:
+            self.recorder.record(self.query, started, None, e)
+            raise
+        self.recorder.record(self.query, started, rows, None)
+        return rows
+
+    def collect_nowait(self):
+        return RecordingJob(self, self.df.collect_nowait(), time.perf_counter())
+
+    def to_local_iterator(self):
+        # Recorded as a whole result set, so this is only as lazy as collect().
+        return iter(self.collect())
+
+class RecordingJob:
+    def __init__(self, frame: RecordingDataFrame, job, started: float):
+        self.frame, self.job, self.started = frame, job, started
+
+    def __getattr__(self, name: str):
+        return getattr(self.job, name)
+
+    def result(self, result_type: Optional[str] = None):
+        # A row iterator is materialized once to be recorded, then handed back as an iterator.
+        try:
+            rows = self.job.result()
+        except Exception as e:
+            self.frame.recorder.record(self.frame.query, self.started, None, e)
+            raise
+        self.frame.recorder.record(self.frame.query, self.started, rows, None)
+        return iter(rows) if result_type == "row_iterator" else rows
+
+def parse_app_args(argv: Sequence[str]) -> argparse.Namespace:
+    # The app's own flags, given after "--" on the streamlit command line.
+    parser = argparse.ArgumentParser(prog="app.py", add_help=False)
+    parser.add_argument("--replay", help="Run against a recorded JSONL fixture instead of Snowflake.")
+    parser.add_argument("--replay-latency", help="Added latency per replayed query, in ms, or 'recorded'.")
+    parser.add_argument("--replay-jitter", type=float, default=0.0, help="Random extra latency per query, up to this many ms.")
+    parser.add_argument("--record", help="Append every query of the live session and its result to this JSONL fixture.")
+    return parser.parse_known_args(list(argv))[0]
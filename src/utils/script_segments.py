@@ -0,0 +1,213 @@
+# The generated deployment script as ordered per-object segments, updated incrementally as the selection changes.
+# Segments are the selected ObjectRecords themselves (their DDL is sliced from the shared source only when written),
+# ordered by position in the dependency-ordered object list. Each object's line count is kept in a Fenwick tree, so
+# adding or removing one object updates every later object's script line in O(log n) instead of rebuilding the script;
+# hardcoded database references are located once per object and shifted to script lines on demand.
+# The script text and its gzip form are built straight from the segments, and only when asked for.
+
+import re
+import zlib
+import bisect
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import utils.sql_parser as sql_parser
+import utils.export_bundle as export_bundle
+from utils.sql_parser import ObjectRecord
+
+GZIP_LEVEL = 6
+SEPARATOR = ";\n\n"
+
+class ScriptSegments:
+
+    def __init__(self, objects: List[ObjectRecord]):
+        # objects: every selectable object in dependency order (the script follows this order).
+        self.objects = objects
+        self.position = {o.obj_key: i for i, o in enumerate(objects)}
+        self.selected: List[int] = []           # Sorted positions of the selected objects
+        self.tree = [0] * (len(objects) + 1)    # Fenwick tree of selected objects' line counts (DDL lines + blank)
+        self.schemas: Counter = Counter()       # Selected objects per schema, for the CREATE SCHEMA header
+        self.include_schema_ddl = False
+        self.db_name: Optional[str] = None
+        self.references: Dict[int, Optional["References"]] = {}  # Position -> its mentions of db_name, once scanned
+        self.formatted: Dict[int, Tuple[int, Dict[str, Any]]] = {}  # Position -> (first line, warning) last formatted
+        self.text_cache: Optional[str] = None
+        self.gzip_cache: Optional[bytes] = None
+        self.bundle_cache: Optional[bytes] = None
+        self.warnings_cache: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self.selected)
+
+    def __repr__(self) -> str:
+        return f"ScriptSegments(selected={len(self.selected)} of {len(self.objects)}, include_schema_ddl={self.include_schema_ddl})"
+
+    # --- Selection ---
+
+    def tree_add(self, pos: int, delta: int) -> None:
+        i = pos + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def lines_before(self, pos: int) -> int:
+        # Script lines taken by the selected objects before position pos.
+        total, i = 0, pos
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def line_count(self, pos: int) -> int:
+        o = self.objects[pos]
+        return o.source.count("\n", o.start, o.end) + 2
+
+    def add(self, pos: int) -> None:
+        i = bisect.bisect_left(self.selected, pos)
+        if i < len(self.selected) and self.selected[i] == pos: return
+        self.selected.insert(i, pos)
+        self.tree_add(pos, self.line_count(pos))
+        self.schemas[self.objects[pos].schema] += 1
+
+    def remove(self, pos: int) -> None:
+        i = bisect.bisect_left(self.selected, pos)
+        if i == len(self.selected) or self.selected[i] != pos: return
+        del self.selected[i]
+        self.tree_add(pos, -self.line_count(pos))
+        schema = self.objects[pos].schema
+        self.schemas[schema] -= 1
+        if not self.schemas[schema]: del self.schemas[schema]
+
+    def update(self, keys: Set[str], include_schema_ddl: bool) -> bool:
+        # Brings the segments to the given selection (obj_keys) and schema option, touching only what changed.
+        # Returns whether anything changed.
+        wanted = {self.position[k] for k in keys if k in self.position}
+        current = set(self.selected)
+        added, removed = wanted - current, current - wanted
+        if not added and not removed and include_schema_ddl == self.include_schema_ddl:
+            return False
+        if len(added) + len(removed) > len(wanted) // 2:
+            self.rebuild(wanted)  # Cheaper than as many single updates
+        else:
+            for pos in removed: self.remove(pos)
+            for pos in added: self.add(pos)
+        self.include_schema_ddl = include_schema_ddl
+        self.text_cache = self.gzip_cache = self.bundle_cache = self.warnings_cache = None
+        return True
+
+    def rebuild(self, positions: Iterable[int]) -> None:
+        self.selected = sorted(positions)
+        self.tree = [0] * (len(self.objects) + 1)
+        for pos in self.selected:
+            self.tree[pos + 1] = self.line_count(pos)
+        for i in range(1, len(self.tree)):  # Linear-time Fenwick construction
+            j = i + (i & -i)
+            if j < len(self.tree): self.tree[j] += self.tree[i]
+        self.schemas = Counter(self.objects[pos].schema for pos in self.selected)
+
+    # --- Script ---
+
+    def header(self) -> str:
+        if not self.include_schema_ddl or not self.selected: return ""
+        schema_ddls = [f'CREATE SCHEMA IF NOT EXISTS "{schema}";' for schema in sorted(self.schemas)]
+        return "\n".join(schema_ddls) + "\n\n"
+
+    def first_line(self, pos: int) -> int:
+        # The (1-based) script line on which the object at pos starts.
+        header_lines = len(self.schemas) + 1 if self.include_schema_ddl and self.selected else 0
+        return 1 + header_lines + self.lines_before(pos)
+
+    def iter_chunks(self) -> Iterator[str]:
+        # The script as a stream of pieces, identical once joined to pipeline.build_script over the selection.
+        yield self.header()
+        for i, pos in enumerate(self.selected):
+            if i: yield SEPARATOR
+            yield self.objects[pos].ddl
+        yield ";"
+
+    def text(self) -> str:
+        if self.text_cache is None:
+            self.text_cache = "".join(self.iter_chunks())
+        return self.text_cache
+
+    def gzip(self) -> bytes:
+        # The script gzip-compressed segment by segment, without building its encoded form.
+        if self.gzip_cache is None:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            parts = [compressor.compress(chunk.encode("utf-8")) for chunk in self.iter_chunks()]
+            parts.append(compressor.flush())
+            self.gzip_cache = b"".join(parts)
+        return self.gzip_cache
+
+    def bundle(self, deps: Dict[str, Set[str]], cycles: List[List[str]], database: str) -> bytes:
+        # The per-object zip bundle of the selection (see utils.export_bundle); the schema option does not apply.
+        if self.bundle_cache is None:
+            self.bundle_cache = export_bundle.build_bundle([self.objects[pos] for pos in self.selected], deps, cycles, database)
+        return self.bundle_cache
+
+    # --- Hardcoded database references ---
+
+    def reference_warnings(self, db_name: str) -> List[Dict[str, Any]]:
+        # One warning per selected object whose DDL mentions db_name (case-insensitively): its type and name, the
+        # matches (line in the object's DDL, line in the script, line text) and a snippet of the matched lines with
+        # one line of context, numbered by script line. Each object's DDL is scanned once per database name; after a
+        # selection change only the warnings of objects whose first line moved are formatted again.
+        if db_name != self.db_name:
+            self.db_name, self.references, self.formatted, self.warnings_cache = db_name, {}, {}, None
+        if self.warnings_cache is None:
+            pattern = re.compile(re.escape(db_name), re.IGNORECASE) if db_name else None
+            warnings = []
+            for pos in self.selected:
+                if pos not in self.references:
+                    self.references[pos] = find_references(self.objects[pos], pattern)
+                refs = self.references[pos]
+                if refs:
+                    first, cached = self.first_line(pos), self.formatted.get(pos)
+                    if cached is None or cached[0] != first:
+                        cached = self.formatted[pos] = (first, reference_warning(self.objects[pos], refs, first))
+                    warnings.append(cached[1])
+            self.warnings_cache = warnings
+        return self.warnings_cache
+
+# Database mentions in one object: (matched DDL lines, snippet blocks of (line, is_match), text of those lines), all 0-based.
+References = Tuple[List[int], List[List[Tuple[int, bool]]], Dict[int, str]]
+
+def find_references(obj: ObjectRecord, pattern: Optional[re.Pattern]) -> Optional[References]:
+    # Scans the object's DDL (in place, in the shared source) for pattern; None if it does not match.
+    if pattern is None: return None
+    ddl_lines: List[int] = []
+    line, pos = 0, obj.start
+    for m in pattern.finditer(obj.source, obj.start, obj.end):
+        line += obj.source.count("\n", pos, m.start())
+        pos = m.start()
+        if not ddl_lines or ddl_lines[-1] != line: ddl_lines.append(line)
+    if not ddl_lines: return None
+
+    # Matched lines with one line of context, merged into blocks of consecutive lines.
+    obj_ddl_lines = (obj.ddl + ";").split("\n")
+    matched = set(ddl_lines)
+    blocks: List[List[Tuple[int, bool]]] = [[]]
+    last_end = -2
+    for k in ddl_lines:
+        if k - last_end > 1 and blocks[-1]:
+            blocks.append([])
+        for c in range(max(0, k - 1, last_end + 1), min(len(obj_ddl_lines), k + 2)):
+            blocks[-1].append((c, c in matched))
+        last_end = max(last_end, k + 1)
+    texts = {c: obj_ddl_lines[c] for block in blocks for c, _ in block}
+    return ddl_lines, blocks, texts
+
+def reference_warning(obj: ObjectRecord, refs: References, first: int) -> Dict[str, Any]:
+    # Formats the warning of one object whose DDL starts on script line first.
+    ddl_lines, blocks, texts = refs
+    parts = []
+    for b, block in enumerate(blocks):
+        parts.append(sql_parser.build_block_snippet([(c, is_match, first + c) for c, is_match in block], texts))
+        if b < len(blocks) - 1:
+            parts.append("\n" if blocks[b + 1][0][0] - block[-1][0] <= 1 else "\n...\n")
+    return {
+        "object_type": obj.object_type or "Object",
+        "fully_qualified_name": obj.fully_qualified_name or "Unknown",
+        "matches": [{"ddl_line_number": k + 1, "script_line_number": first + k, "line_content": texts[k].strip()} for k in ddl_lines],
+        "snippet": "".join(parts),
+    }
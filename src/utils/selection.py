@@ -0,0 +1,95 @@
+# Checkbox selection of a parsed database, built once per database: a flag per object in a bytearray, a schema ->
+# children index, and a running count of ticked children per schema, from which the schema and database checkboxes
+# are derived without rescanning the objects. Ticking an object costs O(1), a schema O(its objects), and the whole
+# database O(objects in the selected schemas). The app writes Streamlit widget keys from this model only for the
+# checkboxes it renders, and its checkbox callbacks write back into it.
+
+import itertools
+from typing import Dict, Iterable, List, Set
+
+from utils.sql_parser import ObjectRecord
+
+class SelectionModel:
+
+    def __init__(self, objects: List[ObjectRecord]):
+        # objects: the selectable objects, with their widget keys (obj_key, sch_key) already set.
+        self.objects = objects
+        self.position = {o.obj_key: i for i, o in enumerate(objects)}
+        self.fqn_positions: Dict[str, List[int]] = {}  # canon_fqn -> positions (overloads share one name)
+        self.schema_id: Dict[str, int] = {}     # sch_key -> schema id
+        self.schema_names: List[str] = []       # Schema id -> name as listed in the sidebar selection
+        self.children: List[List[int]] = []     # Schema id -> positions of its objects
+        self.schema_of: List[int] = []          # Position -> schema id
+        for i, o in enumerate(objects):
+            s = self.schema_id.get(o.sch_key)
+            if s is None:
+                s = self.schema_id[o.sch_key] = len(self.children)
+                self.schema_names.append(o.schema or 'N/A')
+                self.children.append([])
+            self.children[s].append(i)
+            self.schema_of.append(s)
+            self.fqn_positions.setdefault(o.canon_fqn, []).append(i)
+        self.selected = bytearray(len(objects))  # 1 per ticked object
+        self.counts = [0] * len(self.children)   # Ticked objects per schema
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __repr__(self) -> str:
+        return f"SelectionModel(selected={self.total} of {len(self.objects)}, schemas={len(self.children)})"
+
+    # --- Updates ---
+
+    def set(self, pos: int, value: bool) -> bool:
+        # Ticks or unticks the object at pos; returns whether its state changed.
+        if self.selected[pos] == value: return False
+        self.selected[pos] = value
+        delta = 1 if value else -1
+        self.counts[self.schema_of[pos]] += delta
+        self.total += delta
+        return True
+
+    def set_key(self, obj_key: str, value: bool) -> bool:
+        pos = self.position.get(obj_key)
+        return pos is not None and self.set(pos, value)
+
+    def set_fqns(self, fqns: Iterable[str], value: bool) -> Set[int]:
+        # Ticks or unticks every object with one of the canonical names (e.g. a dependency closure); returns their positions.
+        positions = {pos for fqn in fqns for pos in self.fqn_positions.get(fqn, ())}
+        for pos in positions:
+            self.set(pos, value)
+        return positions
+
+    def set_schema(self, sch_key: str, value: bool) -> None:
+        s = self.schema_id.get(sch_key)
+        if s is None or self.counts[s] == (len(self.children[s]) if value else 0): return
+        for pos in self.children[s]:
+            self.set(pos, value)
+
+    def set_schemas(self, schema_names: Iterable[str], value: bool) -> None:
+        # Ticks or unticks every object of the named schemas (the database checkbox, over the schemas in view).
+        names = set(schema_names)
+        for sch_key, s in self.schema_id.items():
+            if self.schema_names[s] in names: self.set_schema(sch_key, value)
+
+    # --- Derived states ---
+
+    def is_selected(self, obj_key: str) -> bool:
+        pos = self.position.get(obj_key)
+        return pos is not None and bool(self.selected[pos])
+
+    def schema_selected(self, sch_key: str) -> bool:
+        # Whether every object of the schema is ticked.
+        s = self.schema_id.get(sch_key)
+        return s is not None and self.counts[s] == len(self.children[s])
+
+    def all_selected(self, schema_names: Iterable[str]) -> bool:
+        # Whether every object of the named schemas is ticked (False if they hold no objects).
+        names = set(schema_names)
+        scoped = [s for s, name in enumerate(self.schema_names) if name in names]
+        return bool(scoped) and all(self.counts[s] == len(self.children[s]) for s in scoped)
+
+    def selected_objects(self) -> List[ObjectRecord]:
+        # The ticked objects, in the objects' (dependency) order.
+        return list(itertools.compress(self.objects, self.selected))
@@ -0,0 +1,231 @@
+# Versioned local history of extracted databases, browsable without querying Snowflake.
+# Each extraction is saved as a timestamped version: the list of its statements' content hashes plus its stage DDL.
+# Versions belong to the (account, user, role) scope that extracted them and are only listed and opened in that scope,
+# since the store is shared by every user of the server; the last KEEP_VERSIONS per database and scope are kept.
+# Statement texts are stored once per distinct content (zlib'd, keyed by hash), shared across versions and databases,
+# so months of mostly unchanged extractions cost little more than one. Each version also records a hash of its whole
+# text, so saving an unchanged extraction again costs one hashing pass, with no statement splitting. Every statement
+# text counts the versions referring to it, so expiring a version only reads that version's manifest.
+
+import os
+import time
+import zlib
+import marshal
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import utils.ddl_spool as ddl_spool
+import utils.parse_cache as parse_cache
+import utils.sql_parser as sql_parser
+from utils.metadata_cache import Scope
+
+SQLITE_MAX_PARAMS = 900  # Stay below SQLite's bound-parameter limit in IN (...) lookups
+HASH_BYTES = 16
+KEEP_VERSIONS = int(os.environ.get("SNOWDL_SNAPSHOT_KEEP") or 20)  # Versions kept per database and scope
+
+def store_path() -> str:
+    return os.path.join(parse_cache.CACHE_DIR, "snapshots.sqlite")
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    # Opens the store in a transaction, creating it on first use (same conventions as parse_cache.connect).
+    os.makedirs(parse_cache.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(store_path(), timeout=10)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ddl_blobs (hash BLOB PRIMARY KEY, ddl BLOB NOT NULL, refs INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions (id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT NOT NULL, "
+                "user TEXT NOT NULL DEFAULT '', role TEXT NOT NULL DEFAULT '', database TEXT NOT NULL, "
+                "taken_at REAL NOT NULL, objects INTEGER NOT NULL, manifest BLOB NOT NULL, text_hash BLOB)"
+            )
+            # Stores created before versions had a user, role or whole-text hash. Their versions keep an empty
+            # user and role, so they are not listed in any scope.
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(versions)")}
+            for column, definition in (("user", "TEXT NOT NULL DEFAULT ''"), ("role", "TEXT NOT NULL DEFAULT ''"), ("text_hash", "BLOB")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE versions ADD COLUMN {column} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS versions_scope ON versions (account, user, role, database, taken_at)")
+            if "refs" not in {r[1] for r in conn.execute("PRAGMA table_info(ddl_blobs)")}:
+                # Stores created before reference counts: count them once from every manifest.
+                conn.execute("ALTER TABLE ddl_blobs ADD COLUMN refs INTEGER NOT NULL DEFAULT 0")
+                for (manifest,) in conn.execute("SELECT manifest FROM versions").fetchall():
+                    add_references(conn, manifest_hashes(manifest)[0], 1)
+            yield conn
+    finally:
+        conn.close()
+
+def add_references(conn: sqlite3.Connection, hashes: Iterable[bytes], delta: int) -> int:
+    # Adds delta to the reference count of each distinct hash; returns how many statement texts were found.
+    cur = conn.executemany("UPDATE ddl_blobs SET refs = refs + ? WHERE hash = ?", ((delta, h) for h in set(hashes)))
+    return cur.rowcount
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=HASH_BYTES).digest()
+
+def text_hash(ddl_text: Union[str, ddl_spool.SpooledText, None], stage_ddls: Optional[str]) -> bytes:
+    # Hash of a whole extraction, computed in slices like parse_cache.cache_key (no encoded copy of the whole text).
+    h = hashlib.blake2b(digest_size=HASH_BYTES)
+    for text in (ddl_text, "\0", stage_ddls):
+        for chunk in ddl_spool.text_chunks(text):
+            for i in range(0, len(chunk), parse_cache.HASH_CHUNK_CHARS):
+                h.update(chunk[i:i + parse_cache.HASH_CHUNK_CHARS].encode("utf-8", "surrogatepass"))
+    return h.digest()
+
+def manifest_hashes(manifest: bytes) -> Tuple[List[bytes], str]:
+    # (statement hashes, stage DDL) of a stored manifest; the hashes are stored concatenated.
+    hashes, stage_ddls = marshal.loads(zlib.decompress(manifest))
+    if isinstance(hashes, bytes):
+        hashes = [hashes[i:i + HASH_BYTES] for i in range(0, len(hashes), HASH_BYTES)]
+    return hashes, stage_ddls
+
+def known_hashes(conn: sqlite3.Connection, hashes: Set[bytes]) -> Set[bytes]:
+    # The hashes whose statement text is stored.
+    wanted, known = list(hashes), set()
+    for i in range(0, len(wanted), SQLITE_MAX_PARAMS):
+        batch = wanted[i:i + SQLITE_MAX_PARAMS]
+        known.update(h for (h,) in conn.execute(f"SELECT hash FROM ddl_blobs WHERE hash IN ({','.join('?' * len(batch))})", batch))
+    return known
+
+def compress_statements(ddl_text: Union[str, ddl_spool.SpooledText, None], wanted: Set[bytes]) -> Dict[bytes, bytes]:
+    # Streams the statements again and compresses those whose hash is wanted.
+    blobs: Dict[bytes, bytes] = {}
+    for stmt in sql_parser.iter_sql_statements(ddl_spool.text_chunks(ddl_text)):
+        h = content_hash(stmt)
+        if h in wanted and h not in blobs:
+            blobs[h] = zlib.compress(stmt.encode("utf-8", "surrogatepass"), 6)
+    return blobs
+
+def save_version(scope: Scope, database: str, ddl_text: Union[str, ddl_spool.SpooledText, None],
+                 stage_ddls: Optional[str], keep: int = KEEP_VERSIONS) -> Optional[int]:
+    # Saves one extraction in scope (account, user, role) and returns its version id. If it is identical to the latest
+    # version of the same database in that scope, no new version is added and that version's id is returned.
+    # Versions beyond the newest keep of the database are then deleted. Returns None if the store cannot be written.
+    # Splitting, hashing and compressing run outside any transaction (statements are streamed twice: to hash them, then
+    # to compress the ones not stored yet), so the write transaction only inserts rows and never blocks other sessions
+    # for the length of a split.
+    try:
+        whole = text_hash(ddl_text, stage_ddls)
+        with connect() as conn:
+            latest = conn.execute(
+                "SELECT id, text_hash, manifest FROM versions WHERE account = ? AND user = ? AND role = ? AND database = ? "
+                "ORDER BY taken_at DESC LIMIT 1",
+                (*scope, database),
+            ).fetchone()
+        if latest and latest[1] == whole:
+            return latest[0]
+        hashes = bytearray()
+        count = 0
+        for stmt in sql_parser.iter_sql_statements(ddl_spool.text_chunks(ddl_text)):
+            hashes += content_hash(stmt)
+            count += 1
+        manifest = zlib.compress(marshal.dumps((bytes(hashes), stage_ddls or "")), 1)
+        if latest and latest[2] == manifest:
+            # Same statements, laid out differently: remember this text too.
+            with connect() as conn:
+                conn.execute("UPDATE versions SET text_hash = ? WHERE id = ?", (whole, latest[0]))
+            return latest[0]
+        distinct = {bytes(hashes[i:i + HASH_BYTES]) for i in range(0, len(hashes), HASH_BYTES)}
+        del hashes
+        with connect() as conn:
+            new = distinct - known_hashes(conn, distinct)
+        blobs = compress_statements(ddl_text, new) if new else {}
+
+        with connect() as conn:
+            if not conn.in_transaction:  # Already open if connect() just upgraded the store
+                conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR IGNORE INTO ddl_blobs (hash, ddl) VALUES (?, ?)", blobs.items())
+            if add_references(conn, distinct, 1) < len(distinct):
+                # Texts expired by another session since they were looked up: store them again.
+                missing = distinct - known_hashes(conn, distinct)
+                late = {h: b for h, b in blobs.items() if h in missing}
+                late.update(compress_statements(ddl_text, missing - late.keys()))
+                conn.executemany("INSERT INTO ddl_blobs (hash, ddl, refs) VALUES (?, ?, 1)", late.items())
+            version_id = conn.execute(
+                "INSERT INTO versions (account, user, role, database, taken_at, objects, manifest, text_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*scope, database, time.time(), count, manifest, whole),
+            ).lastrowid
+            expired = [i for (i,) in conn.execute(
+                "SELECT id FROM versions WHERE account = ? AND user = ? AND role = ? AND database = ? "
+                "ORDER BY taken_at DESC LIMIT -1 OFFSET ?",
+                (*scope, database, max(keep, 1)),
+            )]
+            if expired:
+                delete_versions(conn, expired)
+            return version_id
+    except (sqlite3.Error, OSError, ValueError, EOFError, TypeError, zlib.error):
+        return None
+
+def list_versions(scope: Scope, database: Optional[str] = None) -> List[Dict[str, object]]:
+    # Saved versions of scope (account, user, role), newest first: id, account, database, taken_at (epoch seconds)
+    # and statement count.
+    try:
+        with connect() as conn:
+            rows = conn.execute(
+                "SELECT id, account, database, taken_at, objects FROM versions WHERE account = ? AND user = ? AND role = ? "
+                + ("AND database = ? " if database else "") + "ORDER BY taken_at DESC",
+                (*scope, database) if database else scope,
+            ).fetchall()
+    except (sqlite3.Error, OSError):
+        return []
+    return [dict(zip(("id", "account", "database", "taken_at", "objects"), r)) for r in rows]
+
+def list_scopes() -> List[Scope]:
+    # The (account, user, role) scopes that saved versions on this machine, for offline browsing without a session.
+    try:
+        with connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT account, user, role FROM versions WHERE user <> '' ORDER BY user, role, account"
+            ).fetchall()
+    except (sqlite3.Error, OSError):
+        return []
+    return [tuple(r) for r in rows]
+
+def load_version(version_id: int, scope: Scope) -> Optional[Tuple[str, str, str]]:
+    # Rebuilds (database, ddl_text, stage_ddls) of a saved version, or None if it cannot be read or is not in scope.
+    try:
+        with connect() as conn:
+            row = conn.execute(
+                "SELECT database, manifest FROM versions WHERE id = ? AND account = ? AND user = ? AND role = ?",
+                (version_id, *scope),
+            ).fetchone()
+            if row is None: return None
+            hashes, stage_ddls = manifest_hashes(row[1])
+            texts: Dict[bytes, str] = {}
+            distinct = list(set(hashes))
+            for i in range(0, len(distinct), SQLITE_MAX_PARAMS):
+                batch = distinct[i:i + SQLITE_MAX_PARAMS]
+                for h, ddl in conn.execute(f"SELECT hash, ddl FROM ddl_blobs WHERE hash IN ({','.join('?' * len(batch))})", batch):
+                    texts[h] = zlib.decompress(ddl).decode("utf-8", "surrogatepass")
+        return row[0], "".join(f"{texts[h]};\n" for h in hashes), stage_ddls
+    except (sqlite3.Error, OSError, ValueError, EOFError, TypeError, KeyError, zlib.error):
+        return None
+
+def delete_versions(conn: sqlite3.Connection, version_ids: List[int]) -> None:
+    # Removes versions, releasing their statement texts' references and deleting the texts no version refers to any
+    # more (inside the caller's transaction). Costs the size of the removed versions, not of the store.
+    for i in range(0, len(version_ids), SQLITE_MAX_PARAMS):
+        batch = version_ids[i:i + SQLITE_MAX_PARAMS]
+        placeholders = ",".join("?" * len(batch))
+        for (manifest,) in conn.execute(f"SELECT manifest FROM versions WHERE id IN ({placeholders})", batch).fetchall():
+            hashes = set(manifest_hashes(manifest)[0])
+            add_references(conn, hashes, -1)
+            conn.executemany("DELETE FROM ddl_blobs WHERE hash = ? AND refs <= 0", ((h,) for h in hashes))
+        conn.execute(f"DELETE FROM versions WHERE id IN ({placeholders})", batch)
+
+def store_stats(scope: Scope) -> Dict[str, int]:
+    # Number of versions of scope, and number of distinct statements and size of the whole (shared) store file.
+    try:
+        with connect() as conn:
+            versions = conn.execute(
+                "SELECT COUNT(*) FROM versions WHERE account = ? AND user = ? AND role = ?", scope
+            ).fetchone()[0]
+            blobs = conn.execute("SELECT COUNT(*) FROM ddl_blobs").fetchone()[0]
+        return {"versions": versions, "statements": blobs, "bytes": os.path.getsize(store_path())}
+    except (sqlite3.Error, OSError):
+        return {"versions": 0, "statements": 0, "bytes": 0}
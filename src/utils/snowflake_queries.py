@@ -0,0 +1,76 @@
+# Snowflake queries that take the session as an argument and never touch Streamlit, shared by the app
+# (through snowflake_utils) and the headless batch exporter.
+
+from collections import deque
+from typing import Iterable, List, Optional
+
+import utils.ddl_spool as ddl_spool
+
+MAX_CONCURRENT_QUERIES = 8      # Async queries kept in flight at once on the session
+DDL_SLICE_CHARS = 1_000_000     # GET_DDL output is returned as rows of at most this many characters
+
+DATABASES_QUERY = "SHOW DATABASES"
+
+def database_ddl_queries(db_name: str) -> List[str]:
+    # GET_DDL is powerful but doesn't include stages, so they are listed separately (and can run in parallel with it).
+    # The DDL is cut into ordered (PART, DDL) slices server-side, so it can be streamed to disk (see spool_ddl_rows)
+    # instead of arriving as one value that must fit in memory several times over.
+    return [
+        f"WITH d AS (SELECT GET_DDL('DATABASE', '\"{db_name}\"', TRUE) AS ddl) "
+        f"SELECT s.index AS part, SUBSTR(d.ddl, s.index * {DDL_SLICE_CHARS} + 1, {DDL_SLICE_CHARS}) AS ddl "
+        f"FROM d, LATERAL FLATTEN(ARRAY_GENERATE_RANGE(0, CEIL(LENGTH(d.ddl) / {DDL_SLICE_CHARS}))) s ORDER BY part",
+        f"SHOW STAGES IN DATABASE \"{db_name}\"",
+    ]
+
+def spool_ddl_rows(rows: Iterable) -> ddl_spool.SpooledText:
+    # Writes the slices of a database_ddl_queries() result to a temporary file, one row at a time.
+    # Pass a row iterator (job.result("row_iterator") or to_local_iterator()) to keep a single slice in memory.
+    return ddl_spool.spool_chunks(str(r[1]) for r in rows)
+
+def collect_concurrently(session, queries: List[str], max_in_flight: int = MAX_CONCURRENT_QUERIES,
+                         return_exceptions: bool = False) -> List[list]:
+    # Runs independent queries as async jobs (collect_nowait) with at most max_in_flight running at once,
+    # so a batch costs about one round trip instead of one per query. Returns their rows in query order.
+    # If any query fails, the jobs still running are cancelled and the error is raised, unless return_exceptions
+    # is set: then the failed query's exception is returned in its place and the others are still collected.
+    results: List[list] = [[] for _ in queries]
+    pending = deque()
+
+    def finish(j, job):
+        try:
+            results[j] = job.result()
+        except Exception as e:
+            if not return_exceptions: raise
+            results[j] = e
+
+    try:
+        for i, query in enumerate(queries):
+            if len(pending) >= max_in_flight:
+                finish(*pending.popleft())
+            try:
+                pending.append((i, session.sql(query).collect_nowait()))
+            except Exception as e:
+                if not return_exceptions: raise
+                results[i] = e
+        while pending:
+            finish(*pending.popleft())
+    except Exception:
+        for _, job in pending:
+            try:
+                job.cancel()
+            except Exception:
+                pass
+        raise
+    return results
+
+def databases_from_rows(rows) -> List[str]:
+    # Explicitly cast to string to satisfy the type checker
+    return sorted([str(r["name"]) for r in rows if r["kind"].lower() == "standard"])
+
+def stages_from_rows(rows, schemas: Optional[set] = None) -> str:
+    # Construct a simple CREATE STAGE statement per SHOW STAGES row, as GET_DDL doesn't cover them.
+    stage_ddls = ""
+    for r in rows:
+        if schemas is None or r['schema_name'] in schemas:
+            stage_ddls += f"\nCREATE STAGE \"{r['database_name']}\".\"{r['schema_name']}\".\"{r['name']}\";"
+    return stage_ddls
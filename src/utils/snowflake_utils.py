@@ -1,8 +1,25 @@
 # Handles all direct interactions with Snowflake, such as fetching database lists and retrieving DDLs.
 
 import json
+import time
 import streamlit as st
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
+
+import utils.ddl_spool as ddl_spool
+import utils.incremental as incremental
+import utils.sql_parser as sql_parser
+import utils.metadata_cache as metadata_cache
+from utils.snowflake_queries import (
+    DATABASES_QUERY, collect_concurrently, database_ddl_queries, databases_from_rows, spool_ddl_rows, stages_from_rows,
+)
+
+# Results are cached in metadata_cache per (account, user, role), instead of st.cache_data keyed by arguments only.
+# Fetched DDL is never served stale; listings are, for up to STALE_SECONDS, while they are refreshed in the background.
+DDL_STALE_SECONDS = metadata_cache.FRESH_SECONDS
+
+# Metadata queries shared by the single-query helpers below and the batched load_session_listings().
+ROLES_QUERY = "SELECT PARSE_JSON(CURRENT_AVAILABLE_ROLES())"
+WAREHOUSES_QUERY = "SHOW WAREHOUSES"
 
 def list_databases() -> List[str]:
     # Fetches a list of all databases the current role has access to.
@@ -13,38 +30,149 @@ def list_databases() -> List[str]:
         return []
     
     try:
-        rows = session.sql("SHOW DATABASES").collect()
-        # Explicitly cast to string to satisfy the type checker
-        return sorted([str(r["name"]) for r in rows if r["kind"].lower() == "standard"])
+        fetch = lambda: databases_from_rows(session.sql(DATABASES_QUERY).collect())
+        return list(metadata_cache.get_for_session(session, "databases", None, fetch))
     except Exception as e:
         st.error(f"Failed to list databases: {e}")
         return []
 
-@st.cache_data(show_spinner=False, ttl=900)
-def get_database_ddl(db_name: str) -> Tuple[Optional[str], Optional[str]]:
+def get_database_ddl(db_name: str) -> Tuple[Optional[ddl_spool.SpooledText], Optional[str]]:
     # Fetches the DDL for an entire database and its stages.
+    # The DDL is spooled to a temporary file as it streams in and handed over as a SpooledText, which the pipeline,
+    # parse cache and snapshot store read back in bounded chunks; stages are small and stay a string.
     session = st.session_state.get('snowflake_session')
     if not session:
         st.error(f"No active Snowflake session. Cannot fetch DDL for {db_name}.")
         return None, None
         
+    def fetch():
+        # GET_DDL is powerful but doesn't include stages, so we fetch them separately, in parallel with it.
+        ddl_job, stage_job = (session.sql(q).collect_nowait() for q in database_ddl_queries(db_name))
+        try:
+            return spool_ddl_rows(ddl_job.result("row_iterator")), stages_from_rows(stage_job.result())
+        except Exception:
+            stage_job.cancel()
+            raise
+
     try:
-        # GET_DDL is powerful but doesn't include stages, so we fetch them separately.
-        # Explicitly cast the result to a string
-        ddl_texts = str(session.sql(f"SELECT GET_DDL('DATABASE', '\"{db_name}\"', TRUE)").collect()[0][0])
-        
-        stage_ddls = ""
-        stage_rows = session.sql(f"SHOW STAGES IN DATABASE \"{db_name}\"").collect()
-        for r in stage_rows:
-            # Construct a simple CREATE STAGE statement as GET_DDL doesn't cover them.
-            stage_ddls += f"\nCREATE STAGE \"{r['database_name']}\".\"{r['schema_name']}\".\"{r['name']}\";"
-        
-        return ddl_texts, stage_ddls
+        return metadata_cache.get_for_session(
+            session, "database_ddl", db_name, fetch, stale_seconds=DDL_STALE_SECONDS
+        )
     except Exception as e:
         st.error(f"Error fetching DDL for database '{db_name}': {e}")
         return None, None
 
-@st.cache_data(show_spinner=False, ttl=900)
+def get_database_ddl_incremental(db_name: str, scope: str) -> Tuple[Union[str, ddl_spool.SpooledText, None], Optional[str], Dict[str, object]]:
+    # Like get_database_ddl, but starts from the stored snapshot of the database and fetches object-level GET_DDL only
+    # for the objects created or altered since (dropped ones are removed). Returns (ddl_texts, stage_ddls, summary):
+    # the patched text as a string, or the full extraction spooled like get_database_ddl's.
+    # Falls back to a full GET_DDL without a snapshot, when the snapshot is older than FULL_REFRESH_AFTER_SECONDS,
+    # when more than INCREMENTAL_MAX_CHANGES objects changed, or when an object-level GET_DDL fails; the summary of a
+    # full extraction says why in "reason".
+    # Not cached: the change check itself is what keeps the result fresh.
+    session = st.session_state.get('snowflake_session')
+    if not session:
+        st.error(f"No active Snowflake session. Cannot fetch DDL for {db_name}.")
+        return None, None, {}
+
+    try:
+        # The manifest is read before any DDL, so a change made during the extraction is seen again next time.
+        *manifest_rows, stage_rows = collect_concurrently(
+            session, incremental.manifest_queries(db_name) + [f"SHOW STAGES IN DATABASE \"{db_name}\""]
+        )
+        manifest, details = incremental.build_manifest(*manifest_rows)
+        stage_ddls = stages_from_rows(stage_rows)
+
+        snapshot = incremental.load_snapshot(scope)
+        if snapshot is None:
+            reason = "no snapshot"
+        elif time.time() - snapshot[0] >= incremental.FULL_REFRESH_AFTER_SECONDS:
+            reason = "snapshot out of date"
+        else:
+            taken_at, statements, old_manifest, _ = snapshot
+            changed, dropped = incremental.diff_manifests(old_manifest, manifest)
+            reason = f"{len(changed) + len(dropped)} changed objects"
+            if len(changed) + len(dropped) <= incremental.INCREMENTAL_MAX_CHANGES:
+                queries = {key: incremental.object_ddl_queries(db_name, key, details[key]) for key in changed}
+                fetched: Optional[Dict[tuple, List[str]]] = {}
+                try:
+                    results = iter(collect_concurrently(session, [q for qs in queries.values() for q in qs]))
+                    for key, qs in queries.items():
+                        if key[0] == "SCHEMA":
+                            fetched[key] = [incremental.schema_statement(db_name, key[1])]
+                        elif qs:
+                            fetched[key] = [stmt for _ in qs for stmt in sql_parser.split_sql_statements(str(next(results)[0][0]))]
+                except Exception as e:
+                    # e.g. an object dropped between the manifest and its GET_DDL: extract everything instead
+                    fetched, reason = None, f"object-level GET_DDL failed: {e}"
+                if fetched is not None:
+                    statements = incremental.patch_statements(statements, fetched, set(dropped))
+                    incremental.store_snapshot(scope, statements, manifest, stage_ddls, taken_at)
+                    summary = {"mode": "incremental", "changed": len(changed), "dropped": len(dropped), "snapshot_taken_at": taken_at}
+                    return incremental.join_statements(statements), stage_ddls, summary
+
+        ddl_texts = spool_ddl_rows(session.sql(database_ddl_queries(db_name)[0]).to_local_iterator())
+        incremental.store_snapshot(scope, incremental.split_snapshot(ddl_texts), manifest, stage_ddls)
+        return ddl_texts, stage_ddls, {"mode": "full", "objects": len(manifest), "reason": reason}
+    except Exception as e:
+        st.error(f"Error fetching DDL for database '{db_name}': {e}")
+        return None, None, {}
+
+def list_schemas(db_name: str) -> List[str]:
+    # Fetches the schemas of a database (INFORMATION_SCHEMA excluded), for the per-schema extraction mode.
+    session = st.session_state.get('snowflake_session')
+    if not session:
+        st.error(f"No active Snowflake session. Cannot list schemas for {db_name}.")
+        return []
+
+    def fetch():
+        rows = session.sql(f"SHOW SCHEMAS IN DATABASE \"{db_name}\"").collect()
+        return sorted([str(r["name"]) for r in rows if str(r["name"]).upper() != "INFORMATION_SCHEMA"])
+
+    try:
+        return list(metadata_cache.get_for_session(session, "schemas", db_name, fetch))
+    except Exception as e:
+        st.error(f"Failed to list schemas for database '{db_name}': {e}")
+        return []
+
+def get_schema_ddls(db_name: str, schemas: Tuple[str, ...]) -> Optional[Dict[str, Tuple[str, str]]]:
+    # Fetches the DDL of the given schemas with one GET_DDL('SCHEMA') per schema, run concurrently, plus their stages.
+    # Returns schema -> (ddl_text, stage_ddls), or None on failure. Each schema is cached on its own, so a change of
+    # the schema selection only fetches the schemas added to it; like database DDL, it is never served stale.
+    session = st.session_state.get('snowflake_session')
+    if not session:
+        st.error(f"No active Snowflake session. Cannot fetch DDL for {db_name}.")
+        return None
+
+    try:
+        scope = metadata_cache.session_scope(session)
+        fetched: Dict[str, Tuple[str, str]] = {}
+        missing = []
+        for schema in schemas:
+            cached = metadata_cache.cache.lookup(scope, "schema_ddl", (db_name, schema))
+            if cached is metadata_cache.MISSING:
+                missing.append(schema)
+            else:
+                fetched[schema] = cached
+        if missing:
+            queries = [f"SELECT GET_DDL('SCHEMA', '\"{db_name}\".\"{schema}\"', TRUE)" for schema in missing]
+            queries.append(f"SHOW STAGES IN DATABASE \"{db_name}\"")
+            results = collect_concurrently(session, queries)
+            for schema, rows in zip(missing, results):
+                fetched[schema] = (str(rows[0][0]), stages_from_rows(results[-1], {schema}))
+                metadata_cache.cache.put(scope, "schema_ddl", (db_name, schema), fetched[schema])
+        return fetched
+    except Exception as e:
+        st.error(f"Error fetching schema DDL for database '{db_name}': {e}")
+        return None
+
+def merge_schema_ddls(db_name: str, schemas: Tuple[str, ...], schema_ddls: Dict[str, Tuple[str, str]]) -> Tuple[str, str]:
+    # Joins per-schema DDL (from get_schema_ddls) in schema order, into the same (ddl_texts, stage_ddls) shape as
+    # get_database_ddl. Schemas missing from schema_ddls are skipped.
+    parts = [schema_ddls[s] for s in schemas if s in schema_ddls]
+    ddl_texts = "\n".join([f"create or replace database \"{db_name}\";\n"] + [ddl for ddl, _ in parts])
+    return ddl_texts, "".join(stages for _, stages in parts)
+
 def get_user():
     # Fetches the current active User name.
     session = st.session_state.get('snowflake_session')
@@ -53,23 +181,30 @@ def get_user():
         return ""
         
     try:
-        current_user = str(session.sql("select CURRENT_USER()").collect()[0][0])
-        user = {row['property']: row['value'] for row in 
-                        session.sql(f"DESC USER {current_user}").collect()
-                    }
-
-        username = user["DISPLAY_NAME"] or user["NAME"]
-        
-        return username
+        # The session already knows its (quoted) user name, so describing it is the only round trip.
+        fetch = lambda: user_from_rows(session.sql(user_query(session)).collect())
+        return metadata_cache.get_for_session(session, "user", None, fetch)
         
     except Exception as e:
         st.error(f"Error getting user: {e}")
         return ""
 
-@st.cache_data(show_spinner=False, ttl=900)
+def user_query(session) -> str:
+    return f"DESC USER {session.get_current_user()}"
+
+def user_from_rows(rows) -> str:
+    user = {row['property']: row['value'] for row in rows}
+    return user["DISPLAY_NAME"] or user["NAME"]
+
+def current_first(names: List[str], current: str) -> List[str]:
+    # Moves the current role/warehouse (case-insensitive) to the top of a sorted list.
+    if current in names:
+        names = [n for n in names if n.lower() != current.lower()]
+        names.insert(0, current)
+    return names
+
 def list_roles(curr_role: str) -> List[str]:
     # Fetches a list of all roles the current user has access to.
-    # Caches the result for 15 minutes.
     curr_role = curr_role.strip('"')
     session = st.session_state.get('snowflake_session')
     if not session:
@@ -77,25 +212,23 @@ def list_roles(curr_role: str) -> List[str]:
         return []
     
     try:
-        row = session.sql("SELECT PARSE_JSON(CURRENT_AVAILABLE_ROLES())").collect()[0][0]
-        roles = sorted([str(r) for r in json.loads(row) if isinstance(r, str)])
-        
-        if curr_role in roles:
-            # Remove the current WH (case-insensitive)
-            roles = [r for r in roles if r.lower() != curr_role.lower()]
-            # Add current WH at the beginning
-            roles.insert(0, curr_role)
-        
-        return roles
+        fetch = lambda: roles_from_rows(session.sql(ROLES_QUERY).collect(), "")
+        return current_first(list(metadata_cache.get_for_session(session, "roles", None, fetch)), curr_role)
 
     except Exception as e:
         st.error(f"Failed to list roles: {e}")
         return []
+
+def roles_from_rows(rows, curr_role: str) -> List[str]:
+    roles = sorted([str(r) for r in json.loads(rows[0][0]) if isinstance(r, str)])
+    return current_first(roles, curr_role)
+
+def warehouses_from_rows(rows, curr_wh: str) -> List[str]:
+    return current_first(sorted([str(r["name"]) for r in rows]), curr_wh)
     
 
 def list_warehouses(curr_wh: str) -> List[str]:
     # Fetches a list of all Warehouses the current user has access to.
-    # Caches the result for 15 minutes.
     curr_wh = curr_wh.strip('"')
     session = st.session_state.get('snowflake_session')
     if not session:
@@ -103,17 +236,64 @@ def list_warehouses(curr_wh: str) -> List[str]:
         return []
     
     try:
-        rows = session.sql("SHOW WAREHOUSES").collect()
-        wh = sorted([str(r["name"]) for r in rows])
-        
-        if curr_wh in wh:
-            # Remove the current WH (case-insensitive)
-            wh = [w for w in wh if w.lower() != curr_wh.lower()]
-            # Add current WH at the beginning
-            wh.insert(0, curr_wh)
-        
-        return wh
+        fetch = lambda: warehouses_from_rows(session.sql(WAREHOUSES_QUERY).collect(), "")
+        return current_first(list(metadata_cache.get_for_session(session, "warehouses", None, fetch)), curr_wh)
         
     except Exception as e:
         st.error(f"Failed to list warehouses: {e}")
-        return [] 
\ No newline at end of file
+        return [] 
+
+def load_session_listings(curr_role: str, curr_wh: str, keys: List[str]) -> Dict[str, object]:
+    # Cold-start metadata for initialize_session: whatever metadata_cache does not hold is submitted together as async
+    # queries, so it costs one round trip instead of four (and none when everything is cached).
+    # keys selects what to load among 'user', 'role_list', 'wh_list' and 'db_list'; the result maps each to its value.
+    # A query that fails is reported like its single-query counterpart and yields an empty value.
+    session = st.session_state.get('snowflake_session')
+    if not session:
+        st.error("No active Snowflake session. Cannot load session metadata.")
+        return {}
+
+    curr_role, curr_wh = curr_role.strip('"'), curr_wh.strip('"')
+    # key -> (cache kind, query, parse rows into the cached value, finish the cached value, error message, empty value)
+    loaders = {
+        'user': ("user", user_query, user_from_rows, lambda v: v, "Error getting user", ""),
+        'role_list': ("roles", lambda _: ROLES_QUERY, lambda rows: roles_from_rows(rows, ""),
+                      lambda v: current_first(list(v), curr_role), "Failed to list roles", []),
+        'wh_list': ("warehouses", lambda _: WAREHOUSES_QUERY, lambda rows: warehouses_from_rows(rows, ""),
+                    lambda v: current_first(list(v), curr_wh), "Failed to list warehouses", []),
+        'db_list': ("databases", lambda _: DATABASES_QUERY, databases_from_rows, list, "Failed to list databases", []),
+    }
+    try:
+        scope = metadata_cache.session_scope(session)
+    except Exception:
+        scope = None
+
+    listings: Dict[str, object] = {}
+    missing = []
+    for k in (k for k in keys if k in loaders):
+        kind, query, parse, finish, _, _ = loaders[k]
+        refresh = lambda query=query, parse=parse: parse(session.sql(query(session)).collect())
+        cached = metadata_cache.cache.lookup(
+            scope, kind, None, refresh, current_scope=lambda: metadata_cache.session_scope(session)
+        ) if scope else metadata_cache.MISSING
+        if cached is metadata_cache.MISSING:
+            missing.append(k)
+        else:
+            listings[k] = finish(cached)
+
+    try:
+        results = collect_concurrently(session, [loaders[k][1](session) for k in missing], return_exceptions=True)
+    except Exception as e:
+        results = [e] * len(missing)
+
+    for k, rows in zip(missing, results):
+        kind, _, parse, finish, message, empty = loaders[k]
+        try:
+            if isinstance(rows, Exception): raise rows
+            value = parse(rows)
+            if scope: metadata_cache.cache.put(scope, kind, None, value)
+            listings[k] = finish(value)
+        except Exception as e:
+            st.error(f"{message}: {e}")
+            listings[k] = empty
+    return listings
@@ -1,7 +1,11 @@
 # Contains all the sophisticated logic for parsing raw DDL text into structured Python objects.
 
 import re
-from typing import List, Dict, Optional
+import sys
+import hashlib
+from collections import defaultdict
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
 def strip_identifier_quotes(ident: Optional[str]) -> str:
     # Removes surrounding double quotes from a SQL identifier and un-escapes internal quotes.
@@ -49,97 +53,190 @@ def split_qualified_name(name: str) -> List[str]:
         parts.append(''.join(buf).strip())
     return [p for p in parts if p]
 
+# Scanner for the only characters that can change the splitter's context: comment openers, quotes,
+# dollar tags ($$ or $tag$) and the statement terminator. Everything in between is skipped in C.
+STATEMENT_TOKEN_REGEX = re.compile(r"--|/\*|'|\"|\$(?:[a-zA-Z_][a-zA-Z0-9_]*)?\$|;")
+
+def strip_span(s: str, start: int, end: int) -> Tuple[int, int]:
+    # Narrows [start, end) so that s[start:end] == s[start:end].strip(), without slicing.
+    while start < end and s[start].isspace(): start += 1
+    while end > start and s[end - 1].isspace(): end -= 1
+    return start, end
+
+def scan_token_end(s: str, pos: int, opener: str, final: bool = True) -> Tuple[int, int]:
+    # Finds the end of the comment, quoted string or dollar-quoted body opened by `opener`, searching from pos.
+    # Returns (end, resume): end is the offset just past the closer, or -1 if it is not in s yet, in which case
+    # resume is where the search can safely continue once more text is appended (used by the streaming splitter).
+    n = len(s)
+    if opener == '--':
+        k = s.find('\n', pos)
+        return (-1, n) if k < 0 else (k + 1, k + 1)
+    if opener == '/*':
+        k = s.find('*/', pos)
+        return (-1, max(pos, n - 1)) if k < 0 else (k + 2, k + 2)
+    if opener == "'" or opener == '"':
+        while True:
+            k = s.find(opener, pos)
+            if k < 0: return -1, n
+            if k + 1 == n and not final: return -1, k  # Could still be the first half of an escaped quote
+            if s.startswith(opener, k + 1):  # Escaped quote, keep going
+                pos = k + 2; continue
+            return k + 1, k + 1
+    k = s.find(opener, pos)  # Dollar-quoted body ends at the same tag
+    return (-1, max(pos, n - len(opener) + 1)) if k < 0 else (k + len(opener), k + len(opener))
+
+def iter_statement_spans(ddl_text: str) -> Iterator[Tuple[int, int]]:
+    # Yields (start, end) offsets of each statement in ddl_text, with surrounding whitespace excluded.
+    # Jumps from one interesting token to the next, so the cost is linear in the text length.
+    s, n = ddl_text, len(ddl_text)
+    search = STATEMENT_TOKEN_REGEX.search
+    start = pos = 0
+    while pos < n:
+        m = search(s, pos)
+        if not m: break
+        tok = m.group()
+        if tok == ';':
+            a, b = strip_span(s, start, m.start())
+            if a < b: yield a, b
+            start = pos = m.end()
+            continue
+        pos = scan_token_end(s, m.end(), tok)[0]
+        if pos < 0: break  # Unterminated comment, string or body runs to the end of the text
+    a, b = strip_span(s, start, n)
+    if a < b: yield a, b
+
+def split_sql_statement_spans(ddl_text: str) -> List[Tuple[int, int]]:
+    # Returns the (start, end) offsets of each statement, leaving slicing to the caller.
+    return list(iter_statement_spans(ddl_text))
+
 def split_sql_statements(ddl_text: str) -> List[str]:
     # Splits a block of SQL text into individual statements, correctly handling comments, strings, and procedure bodies.
-    stmts, buf, s = [], [], ddl_text
-    n = len(s); i = 0
-    in_sq = in_dq = in_line_c = in_block_c = False
-    dollar_tag = None
-
-    while i < n:
-        # State machine to handle different SQL contexts
-        if in_line_c:
-            buf.append(s[i])
-            if s[i] == '\n': in_line_c = False
-            i += 1; continue
-        if in_block_c:
-            if i + 1 < n and s[i] == '*' and s[i+1] == '/':
-                buf.append('*/'); i += 2; in_block_c = False; continue
-            buf.append(s[i]); i += 1; continue
-        if in_sq:
-            buf.append(s[i])
-            if s[i] == "'":
-                if i + 1 < n and s[i+1] == "'": buf.append("'"); i += 2; continue
-                in_sq = False
-            i += 1; continue
-        if in_dq:
-            buf.append(s[i])
-            if s[i] == '"':
-                if i + 1 < n and s[i+1] == '"': buf.append('"'); i += 2; continue
-                in_dq = False
-            i += 1; continue
-        if dollar_tag is not None:
-            end_tag = f'${dollar_tag}$'
-            if s.startswith(end_tag, i):
-                buf.append(end_tag)
-                i += len(end_tag)
-                dollar_tag = None
-                continue
-            buf.append(s[i]); i += 1; continue
-
-        # Not in any special context, check for context entry or semicolon
-        if i + 1 < n and s[i] == '-' and s[i+1] == '-': buf.append('--'); i += 2; in_line_c = True; continue
-        if i + 1 < n and s[i] == '/' and s[i+1] == '*': buf.append('/*'); i += 2; in_block_c = True; continue
-        if s[i] == "'": in_sq = True; buf.append(s[i]); i += 1; continue
-        if s[i] == '"': in_dq = True; buf.append(s[i]); i += 1; continue
-        
-        # Check for dollar-quoted string start
-        if s[i] == '$':
-            # Try to match a tag: $tag$
-            match = re.match(r'\$([a-zA-Z_][a-zA-Z0-9_]*)\$', s[i:])
-            if match:
-                dollar_tag = match.group(1)
-                start_tag = f'${dollar_tag}$'
-                buf.append(start_tag)
-                i += len(start_tag)
-                continue
-            # Check for empty tag: $$
-            elif i + 1 < n and s[i+1] == '$':
-                dollar_tag = ""
-                buf.append('$$')
-                i += 2
-                continue
-
-        if s[i] == ';':
-            stmt = ''.join(buf).strip()
-            if stmt: stmts.append(stmt)
-            buf = []; i += 1
-            while i < n and s[i].isspace(): i += 1 # Skip whitespace after semicolon
+    return [ddl_text[a:b] for a, b in iter_statement_spans(ddl_text)]
+
+def iter_sql_statements(chunks: Iterable[str], db_map: Optional[Dict[str, Optional[str]]] = None) -> Iterator[str]:
+    # Streaming form of split_sql_statements over an iterable of text chunks (file object, result rows, decoded socket reads).
+    # Each statement is yielded as soon as its terminating ';' arrives. Only the unfinished statement is buffered, and the
+    # comment, quote and dollar-tag state is carried across chunk boundaries, so the output matches split_sql_statements
+    # on the concatenated text.
+    # With db_map, database references are rewritten in the same pass (see rewrite_database_references).
+    regex, replace = compile_reference_rewriter(db_map) if db_map else (STATEMENT_TOKEN_REGEX, None)
+    search = regex.search
+    buf, start, pos, opener = "", 0, 0, None
+    copy_from, pieces = 0, []  # Rewritten text of the current statement is pieces + buf[copy_from:]
+    safe_end, final = 0, False
+    chunks = iter(chunks)
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final, safe_end = True, len(buf)
+        elif not chunk:
             continue
-        
-        buf.append(s[i]); i += 1
-        
-    tail = ''.join(buf).strip()
-    if tail: stmts.append(tail)
-    return stmts
+        else:
+            if start:
+                # Drop the statements already yielded before growing the buffer.
+                buf, pos, copy_from, safe_end, start = buf[start:], pos - start, copy_from - start, safe_end - start, 0
+            k = chunk.rfind('\n')
+            if k >= 0: safe_end = len(buf) + k + 1
+            buf += chunk
+        # Tokens and references never span a newline, so everything up to the last complete line can be scanned now.
+        while True:
+            if opener is not None:
+                end, resume = scan_token_end(buf, pos, opener, final)
+                if end < 0:
+                    pos = resume; break
+                opener, pos = None, end
+            m = search(buf, pos, safe_end) if pos < safe_end else None
+            if not m:
+                pos = max(pos, safe_end); break
+            tok = m.group()
+            if tok == ';':
+                if pieces:
+                    pieces.append(buf[copy_from:m.start()])
+                    stmt = "".join(pieces).strip()
+                    if stmt: yield stmt
+                    pieces = []
+                else:
+                    a, b = strip_span(buf, start, m.start())
+                    if a < b: yield buf[a:b]
+                start = pos = copy_from = m.end()
+            elif replace is not None and m.lastgroup == "ref":
+                pieces.append(buf[copy_from:m.start()])
+                pieces.append(replace(m))
+                pos = copy_from = m.end()
+            else:
+                opener, pos = tok, m.end()
+    pieces.append(buf[copy_from:])
+    tail = "".join(pieces).strip()
+    if tail: yield tail
+
+# Object types recognised in CREATE statements, in their canonical spelling.
+OBJECT_TYPES = (
+    "DATABASE", "SCHEMA", "TABLE", "VIEW", "SEQUENCE", "PIPE", "TASK", "STAGE", "STREAM", "FUNCTION", "PROCEDURE",
+    "TAG", "ALERT", "SECRET", "STREAMLIT", "NOTEBOOK", "SERVICE", "DYNAMIC TABLE", "EXTERNAL TABLE", "EVENT TABLE",
+    "ICEBERG TABLE", "HYBRID TABLE", "MATERIALIZED VIEW", "SEMANTIC VIEW", "FILE FORMAT", "NETWORK RULE",
+    "GIT REPOSITORY", "IMAGE REPOSITORY", "MASKING POLICY", "ROW ACCESS POLICY", "PASSWORD POLICY", "SESSION POLICY",
+    "AGGREGATION POLICY", "PROJECTION POLICY", "AUTHENTICATION POLICY", "PACKAGES POLICY", "DATA METRIC FUNCTION",
+    "CORTEX SEARCH SERVICE",
+)
+
+# Leading comments, CREATE [OR REPLACE], any modifiers that do not change the object type, then the first type keyword.
+CREATE_HEADER_REGEX = re.compile(r"""
+    # Each repetition must match one way only, or a statement that is not a CREATE backtracks exponentially: one
+    # whitespace character (not \s+), and block comments unrolled so they cannot run past their own */ (not .*?).
+    (?:\s|--[^\n]*(?:\n|\Z)|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)*
+    CREATE\s+(?:OR\s+REPLACE\s+)?
+    (?:(?:SECURE|TRANSIENT|TEMPORARY|TEMP|VOLATILE|LOCAL|GLOBAL|RECURSIVE)\s+)*
+    ([A-Za-z_]+)(?![\w$])
+    """, re.IGNORECASE | re.VERBOSE | re.DOTALL)
+
+# Optional IF NOT EXISTS followed by an up to three part name, each part captured separately.
+NAME_PART = r'"(?:[^"]|"")+"|[A-Za-z_][\w$]*'
+OBJECT_NAME_REGEX = re.compile(rf'\s+(?:IF\s+NOT\s+EXISTS\s+)?({NAME_PART})(?:\.({NAME_PART}))?(?:\.({NAME_PART}))?', re.IGNORECASE)
+
+def build_type_dispatch(type_names) -> Dict[str, List[Tuple[Optional[re.Pattern], str]]]:
+    # Indexes object types by their first keyword. Each entry carries a compiled matcher for the remaining
+    # keywords (None for one-word types), ordered so that longer types are tried first.
+    dispatch: Dict[str, List[Tuple[Optional[re.Pattern], str, int]]] = defaultdict(list)
+    def add(type_name: str, canonical: str):
+        first, *rest = type_name.split()
+        tail = re.compile("".join(rf"\s+{w}" for w in rest) + r"(?![\w$])", re.IGNORECASE) if rest else None
+        dispatch[first].append((tail, canonical, len(rest)))
+    for type_name in type_names:
+        add(type_name, type_name)
+    # GET_DDL emits external functions as CREATE EXTERNAL FUNCTION; they are listed with the other functions.
+    add("EXTERNAL FUNCTION", "FUNCTION")
+    return {k: [(tail, name) for tail, name, _ in sorted(v, key=lambda c: -c[2])] for k, v in dispatch.items()}
+
+OBJECT_TYPE_DISPATCH = build_type_dispatch(OBJECT_TYPES)
+
+def classify_create_statement(stmt: str) -> Optional[Tuple[str, List[str]]]:
+    # Reads only the leading tokens of a CREATE statement and returns (object_type, name_parts), or None.
+    # Dispatches on the first type keyword through OBJECT_TYPE_DISPATCH and stops as soon as the name is read,
+    # so the cost does not depend on the length of the statement body.
+    m = CREATE_HEADER_REGEX.match(stmt)
+    if not m: return None
+    candidates = OBJECT_TYPE_DISPATCH.get(m.group(1).upper())
+    if not candidates: return None
+    pos = m.end()
+    for tail, type_name in candidates:
+        if tail is None:
+            break
+        tm = tail.match(stmt, pos)
+        if tm:
+            pos = tm.end()
+            break
+    else:
+        return None
+    nm = OBJECT_NAME_REGEX.match(stmt, pos)
+    if not nm: return None
+    return type_name, [p for p in nm.groups() if p]
 
 def extract_object_metadata(stmt: str) -> Optional[Dict[str, str]]:
     # Parses a CREATE statement to extract its type, name, and components.
-    # Regex to capture CREATE [MODIFIERS] [PREFIX] TYPE <name> ...
-    pattern = re.compile(r"""
-        ^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:SECURE\s+|TRANSIENT\s+|TEMPORARY\s+|EXTERNAL\s+)*
-        (?:(?P<prefix>MATERIALIZED|DYNAMIC)\s+)?
-        (?P<type>FILE\s+FORMAT|MASKING\s+POLICY|ROW\s+ACCESS\s+POLICY|DATABASE|SCHEMA|TABLE|VIEW|SEQUENCE|PIPE|TASK|STAGE|STREAM|FUNCTION|PROCEDURE|TAG)\s+
-        (?:IF\s+NOT\s+EXISTS\s+)?
-        (?P<name>(?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*)){0,2})
-        """, re.IGNORECASE | re.VERBOSE | re.DOTALL)
-    
-    m = pattern.search(stmt)
-    if not m: return None
-    
-    obj_type = normalize_type(m.group("prefix"), m.group("type"))
-    raw_name = m.group("name")
-    parts = split_qualified_name(raw_name)
+    classified = classify_create_statement(stmt)
+    if not classified: return None
+
+    obj_type, parts = classified
     
     db, schema, obj = None, None, None
     if len(parts) == 3:
@@ -157,39 +254,192 @@ def extract_object_metadata(stmt: str) -> Optional[Dict[str, str]]:
         "fully_qualified_name": ".".join([strip_identifier_quotes(p) for p in parts]),
     }
 
+# One identifier part of a database reference. Quoted parts may not span lines, so references stay on one line.
+# Unquoted parts may contain '$' after the first character (TAB$1), except a '$' that opens a dollar tag ($$ or
+# $tag$) for the statement tokenizer: such a name is left alone, so rewriting never moves a statement boundary.
+REFERENCE_NAME_PART = r'"(?:[^"\n]|"")+"(?!")|[A-Za-z_](?:[A-Za-z0-9_]|\$(?!\$|[A-Za-z_][A-Za-z0-9_]*\$))*(?![\w$])'
+UNQUOTED_IDENTIFIER_REGEX = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+
+@lru_cache(maxsize=32)
+def build_reference_regex(source_dbs: Tuple[str, ...]) -> re.Pattern:
+    # Extends the statement token scanner with a named 'ref' alternative for <db>.<schema>.<object> references
+    # to any of source_dbs (case-insensitive, quoted or not). It is tried first so that "DB"."SCH"."OBJ" is not
+    # taken for a quoted-identifier token, and its lookbehind keeps it from starting mid-identifier or mid-path.
+    names = sorted(source_dbs, key=len, reverse=True)
+    quoted = "|".join(re.escape(d.replace('"', '""')) for d in names)
+    bare = "|".join(re.escape(d) for d in names if UNQUOTED_IDENTIFIER_REGEX.fullmatch(d)) or "(?!)"
+    ref = (
+        rf'(?P<ref>(?<![\w$.])(?P<db>"(?:{quoted})"(?!")|(?:{bare})(?![\w$]))'
+        rf'[ \t]*\.[ \t]*(?P<sch>{REFERENCE_NAME_PART})[ \t]*\.[ \t]*(?P<obj>{REFERENCE_NAME_PART}))'
+    )
+    return re.compile(f"{ref}|{STATEMENT_TOKEN_REGEX.pattern}", re.IGNORECASE)
+
+def compile_reference_rewriter(db_map: Dict[str, Optional[str]]):
+    # Returns (regex, replace) for rewrite_database_references and iter_sql_statements.
+    # db_map maps source database names to a target database, or to None/"" to drop the database part.
+    targets = {strip_identifier_quotes(k).upper(): v for k, v in db_map.items() if k}
+    regex = build_reference_regex(tuple(sorted({strip_identifier_quotes(k) for k in db_map if k})))
+
+    def replace(m: re.Match) -> str:
+        db_part = m.group("db")
+        target = targets.get(strip_identifier_quotes(db_part).upper())
+        if not target:
+            return f'{m.group("sch")}.{m.group("obj")}'
+        if db_part.startswith('"'):
+            target = '"' + target.replace('"', '""') + '"'
+        return f'{target}.{m.group("sch")}.{m.group("obj")}'
+
+    return regex, replace
+
+def rewrite_database_references(ddl: str, db_map: Dict[str, Optional[str]]) -> str:
+    # Rewrites <db>.<schema>.<object> references whose database is a key of db_map, either to the mapped target
+    # database or, when the target is None or empty, to <schema>.<object>.
+    # Runs on the statement tokenizer, so string literals, comments and quoted or dollar-quoted bodies are left untouched.
+    if not db_map:
+        return ddl
+    regex, replace = compile_reference_rewriter(db_map)
+    search = regex.search
+    pieces, copy_from, pos, n = [], 0, 0, len(ddl)
+    while pos < n:
+        m = search(ddl, pos)
+        if not m: break
+        if m.lastgroup == "ref":
+            pieces.append(ddl[copy_from:m.start()])
+            pieces.append(replace(m))
+            pos = copy_from = m.end()
+        elif m.group() == ';':
+            pos = m.end()
+        else:
+            pos = scan_token_end(ddl, m.end(), m.group())[0]
+            if pos < 0: break
+    if not pieces:
+        return ddl
+    pieces.append(ddl[copy_from:])
+    return "".join(pieces)
+
 def remove_database_references(ddl: str, db_name: str) -> str:
-    # Removes references to a specific database in the create line of a DDL statement, if the reference matches the provided db_name.
-    # Handles various quoting styles and avoids replacement in string literals.
+    # Removes references to a specific database from a DDL statement, if the reference matches the provided db_name.
+    # Handles various quoting styles and leaves string literals, comments and procedure bodies untouched.
     if not db_name:
         return ddl
+    return rewrite_database_references(ddl, {db_name: None})
 
-    # Un-quote an identifier
-    def unquote(s):
-        return s.strip('"')
+FINGERPRINT_PUNCTUATION = "(),;.="  # Spaces next to these are dropped by normalize_ddl
 
-    # Regex for a single identifier (quoted or not)
-    ID = r'"(?:[^"]|"")*"|[a-zA-Z_][a-zA-Z0-9_$]*'
-    # Regex for a 3-part FQN: db.schema.object
-    FQN_REGEX = re.compile(rf'({ID})\s*\.\s*({ID})\s*\.\s*({ID})')
+@lru_cache(maxsize=32)
+def database_prefix_regex(db_name: str) -> re.Pattern:
+    # "<db_name>." (quoted or not, any case) in front of another name part, wherever it appears. Each form checks
+    # what precedes it with a lookbehind placed after the name, so the search can still skip ahead to the name.
+    name = strip_identifier_quotes(db_name)
+    forms = ['"' + name.replace('"', '""') + '"']
+    if UNQUOTED_IDENTIFIER_REGEX.fullmatch(name): forms.append(name)
+    alternatives = "|".join(rf'{re.escape(f)}(?<![\w$."]{re.escape(f)})' for f in forms)
+    return re.compile(rf'(?:{alternatives})(?![\w$])[ \t]*\.[ \t]*(?=["A-Za-z_])', re.IGNORECASE)
 
-    def replacer(match):
-        db_part, schema_part, object_part = match.groups()
-        if unquote(db_part).lower() == db_name.lower():
-            return f'{schema_part}.{object_part}'
+def collapse_code(code: str) -> str:
+    # Whitespace runs become one space, dropped next to punctuation (str methods: far faster than a regex here).
+    code = " ".join(code.split())
+    for p in FINGERPRINT_PUNCTUATION:
+        if p in code: code = code.replace(" " + p, p).replace(p + " ", p)
+    return code
+
+def normalize_ddl(ddl: str, db_name: Optional[str] = None) -> str:
+    # The DDL reduced to what matters when comparing environments: references to db_name lose their database part
+    # (everywhere, bodies and literals included), then comments are removed and whitespace is collapsed, and
+    # dropped around punctuation, outside literals, quoted identifiers and bodies, which are kept verbatim.
+    if db_name:
+        ddl = database_prefix_regex(db_name).sub("", ddl)
+    search, n = STATEMENT_TOKEN_REGEX.search, len(ddl)
+    pieces: List[str] = []
+    code: List[str] = []  # Code since the last literal, collapsed in one go when the next literal (or the end) is reached
+
+    def flush():
+        if code:
+            pieces.append(collapse_code("".join(code)))
+            code.clear()
+
+    pos = 0
+    while pos < n:
+        m = search(ddl, pos)
+        if not m: break
+        code.append(ddl[pos:m.start()])
+        tok = m.group()
+        if tok == ";":
+            code.append(tok)
+            pos = m.end()
+            continue
+        end = scan_token_end(ddl, m.end(), tok)[0]
+        if end < 0: end = n
+        if tok in ("--", "/*"):
+            code.append(" ")
         else:
-            return match.group(0)
-
-    # Avoid replacing inside string literals by splitting the string
-    # This is a simplified approach and may not handle all edge cases
-    # like escaped single quotes within string literals.
-    parts = ddl.split("'")
-    result = []
-    for i, part in enumerate(parts):
-        if i % 2 == 0: # Outside of single quotes
-            result.append(FQN_REGEX.sub(replacer, part))
-        else: # Inside single quotes
-            result.append(part)
-    return "'".join(result)
+            flush()
+            pieces.append(ddl[m.start():end])
+        pos = end
+    code.append(ddl[pos:])
+    flush()
+    return "".join(pieces).strip()
+
+def ddl_fingerprint(ddl: str, db_name: Optional[str] = None) -> bytes:
+    # 16-byte digest of normalize_ddl(ddl, db_name): equal for DDL that differs only in comments, layout or
+    # references to its own database, so objects can be compared across environments without their text.
+    return hashlib.blake2b(normalize_ddl(ddl, db_name).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+class ObjectRecord:
+    # Compact record for one parsed database object.
+    # Schema, database and type strings are interned so that thousands of records share one copy of each, and the
+    # DDL is kept as an offset range into a source buffer shared by all records of a database, sliced only on access.
+    __slots__ = (
+        "object_type", "database", "schema", "object_name", "fully_qualified_name", "index",
+        "source", "start", "end", "canon_fqn", "db_key", "sch_key", "obj_key", "fingerprint",
+    )
+
+    def __init__(self, object_type: str, database: str, schema: str, object_name: str, fully_qualified_name: str,
+                 source: str = "", start: int = 0, end: Optional[int] = None, index: int = 0):
+        self.object_type = sys.intern(object_type)
+        self.database = sys.intern(database)
+        self.schema = sys.intern(schema)
+        self.object_name = object_name
+        self.fully_qualified_name = fully_qualified_name
+        self.index = index
+        self.source, self.start, self.end = source, start, len(source) if end is None else end
+        self.canon_fqn: Optional[str] = None  # Set by dependencies.order_objects_by_dependencies
+        self.db_key = self.sch_key = self.obj_key = ""  # Widget keys, set by the app when grouping for display
+        self.fingerprint: Optional[bytes] = None  # ddl_fingerprint of the DDL, computed on first use (see object_fingerprint)
+
+    @property
+    def ddl(self) -> str:
+        return self.source[self.start:self.end]
+
+    def __repr__(self) -> str:
+        return f"ObjectRecord({self.object_type} {self.fully_qualified_name}, index={self.index}, ddl_chars={self.end - self.start})"
+
+def object_fingerprint(rec: ObjectRecord) -> bytes:
+    # The record's DDL fingerprint, with references to its own database ignored; computed once per record.
+    if rec.fingerprint is None:
+        rec.fingerprint = ddl_fingerprint(rec.ddl, rec.database)
+    return rec.fingerprint
+
+def parse_object_records(chunks: Iterable[str], default_db: str, db_map: Optional[Dict[str, Optional[str]]] = None) -> List[ObjectRecord]:
+    # Splits, rewrites and classifies a stream of DDL text into ObjectRecords in source order.
+    # Only the statements that define an object are kept, concatenated into one buffer that every record slices.
+    records: List[ObjectRecord] = []
+    texts: List[str] = []
+    offset = 0
+    for idx, stmt in enumerate(iter_sql_statements(chunks, db_map)):
+        meta = extract_object_metadata(stmt)
+        if not meta: continue
+        records.append(ObjectRecord(
+            meta["object_type"], meta["database"] or default_db, meta["schema"], meta["object_name"],
+            meta["fully_qualified_name"], start=offset, end=offset + len(stmt), index=idx,
+        ))
+        texts.append(stmt)
+        offset += len(stmt)
+    source = "".join(texts)
+    del texts
+    for rec in records:
+        rec.source = source
+    return records
 
 def get_material_icon(obj_type: Optional[str]) -> str:
     # Returns a Material icon name string for a given Snowflake object type.
@@ -216,13 +466,19 @@ def get_material_icon(obj_type: Optional[str]) -> str:
         "TASK": "check_circle",
         "MASKING POLICY": "visibility_off",
         "TAG": "label",
+        "ALERT": "notifications",
+        "SECRET": "key",
+        "NETWORK RULE": "lan",
+        "EVENT TABLE": "event_note",
+        "ICEBERG TABLE": "ac_unit",
+        "HYBRID TABLE": "table",
         "UNKNOWN": "view_object_track",
     }
 
     return f':material/{icon_map.get(obj_type, "view_object_track")}:'
 
 # Helper function to build snippet for a block
-def build_block_snippet(block, obj_ddl_lines, final_script_lines):
+def build_block_snippet(block, obj_ddl_lines, final_script_lines=None):
     # Build formatted snippet for a block of lines.
     lines = []
     for k, is_match, final_k in block:  # Sort by k (line in DDL)